@@ -0,0 +1,538 @@
+"""Synthetic-house benchmark for the Grok Automation Suggester coordinator pipeline.
+
+Builds a Home Assistant instance in a temporary config directory, fills its
+state machine and area/device/entity registries with a synthetic house, writes
+a matching automations.yaml and points the coordinator at a local stub Grok
+server. Reports wall time, event-loop blocking, peak memory and prompt size as
+JSON so results can be compared between commits.
+
+    python benchmarks/bench_coordinator.py --entities 1000 10000 50000 --output bench.json
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiohttp import web
+from homeassistant.config_entries import ConfigEntries, ConfigEntry
+from homeassistant.const import __version__ as HA_VERSION
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import area_registry as ar, device_registry as dr, entity_registry as er
+import yaml
+from custom_components.grok_automation_suggester.const import (
+    CONF_GROK_API_KEY,
+    CONF_GROK_ENDPOINT,
+    CONF_REQUESTS_PER_MINUTE,
+    CONF_MAX_SHARDS,
+    CONF_RESPONSE_CACHE_TTL,
+    CONF_SHARDED_MODE,
+    CONF_STREAMING,
+    CONF_TOKENS_PER_MINUTE,
+    CONF_TRIAGE_ENDPOINT,
+    CONF_TRIAGE_MIN_ENTITIES,
+    CONF_TRIAGE_MODE,
+    DOMAIN,
+    SCAN_MODE_ALL,
+    STREAM_UPDATE_INTERVAL,
+    TRIAGE_MAX_IDEAS,
+)
+from custom_components.grok_automation_suggester.coordinator import (
+    MAX_ATTR,
+    MAX_AUTOM,
+    GrokAutomationCoordinator,
+)
+from custom_components.grok_automation_suggester.jobs import SuggestionRequest
+from custom_components.grok_automation_suggester.shared import async_get_domain_data
+from custom_components.grok_automation_suggester.streaming import YAML_FENCE_RE
+
+_LOGGER = logging.getLogger(__name__)
+DOMAINS = {
+    "light": lambda i: ("on" if i % 2 else "off", {"brightness": i % 256, "color_mode": "brightness", "supported_color_modes": ["brightness"]}),
+    "switch": lambda i: ("on" if i % 3 else "off", {}),
+    "sensor": lambda i: (str(round(15 + i % 100 / 10, 1)), {"unit_of_measurement": "°C", "device_class": "temperature", "state_class": "measurement"}),
+    "binary_sensor": lambda i: ("off", {"device_class": "motion"}),
+    "cover": lambda i: ("open", {"current_position": i % 101, "device_class": "shutter"}),
+    "climate": lambda i: ("heat", {"temperature": 20, "current_temperature": 19.5, "hvac_modes": ["off", "heat"]}),
+    "media_player": lambda i: ("idle", {"volume_level": 0.3, "source_list": ["TV", "Radio"]}),
+}
+# Noise real integrations add, which the compact prompt format filters out.
+NOISE_ATTRIBUTES = {
+    "light": lambda i: {"supported_features": 44, "icon": "mdi:lightbulb", "min_color_temp_kelvin": 2000, "max_color_temp_kelvin": 6500},
+    "cover": lambda i: {"supported_features": 15},
+    "climate": lambda i: {"supported_features": 401, "min_temp": 7, "max_temp": 35, "target_temp_step": 0.5},
+    "media_player": lambda i: {"supported_features": 152463, "entity_picture": f"/api/media_player_proxy/media_player.bench_{i}?token=abcdef0123456789"},
+    "sensor": lambda i: {"icon": "mdi:thermometer"},
+}
+ENTITIES_PER_DEVICE = 4
+ENTITIES_PER_AREA = 40
+LOOP_PROBE_INTERVAL = 0.005  # seconds between event-loop probes
+LOOP_BLOCK_THRESHOLD = 0.010  # probe lag counted as blocking
+COMPACT_ROW_RE = re.compile(r"^([a-z_]+\.[a-z0-9_]+)\|", flags=re.MULTILINE)
+STREAM_BLOCKS = 3  # YAML blocks in a streamed answer
+
+class LoopMonitor:
+    """Measure how long the event loop is blocked by probing it at a fixed interval."""
+    def __init__(self):
+        """Initialize the monitor."""
+        self.blocked = 0.0
+        self.max_block = 0.0
+        self._task: asyncio.Task | None = None
+
+    async def _probe(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LOOP_PROBE_INTERVAL)
+            lag = loop.time() - start - LOOP_PROBE_INTERVAL
+            if lag > LOOP_BLOCK_THRESHOLD:
+                self.blocked += lag
+                self.max_block = max(self.max_block, lag)
+
+    def start(self) -> None:
+        self.blocked = self.max_block = 0.0
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+class StubGrok:
+    """Local chat-completions endpoint with configurable latency and error rate.
+
+    With triage=True it answers like a triage model, with idea lines over the
+    first entities of the prompt's compact tables. Prompt tokens shared with the
+    previous prompt are reported as cached, like a provider-side prefix cache.
+    Requests with "stream": true get chunked server-sent events instead: small
+    deltas that split the YAML fences, each event written in two halves, then a
+    usage chunk and "data: [DONE]".
+    """
+    def __init__(
+        self,
+        latency: float,
+        error_rate: float,
+        seed: int,
+        triage: bool = False,
+        chunk_chars: int = 16,
+        chunk_delay: float = 0.0,
+    ):
+        """Initialize the stub."""
+        self.latency = latency
+        self.error_rate = error_rate
+        self.triage = triage
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.streamed: list[str] = []
+        self.prompts: list[str] = []
+        self._random = random.Random(seed)
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        await asyncio.sleep(self.latency * (0.5 + self._random.random()))
+        if self._random.random() < self.error_rate:
+            return web.Response(status=503, text="stub overloaded")
+        prompt = body["messages"][-1]["content"]
+        cached = len(os.path.commonprefix([prompt, self.prompts[-1]])) // 4 if self.prompts else 0
+        self.prompts.append(prompt)
+        if self.triage:
+            rows = COMPACT_ROW_RE.findall(prompt)
+            content = "".join(f"- Idea {i} | {', '.join(rows[i * 3:i * 3 + 3])}\n" for i in range(min(TRIAGE_MAX_IDEAS, len(rows) // 3)))
+        elif body.get("stream"):
+            # A long preamble so the first block arrives after STREAM_UPDATE_INTERVAL at the default pace.
+            content = "Suggestions :\n" + "Here is what I found in your house. " * 7 + "\n" + "".join(
+                f"Idea {i} :\n```yaml\n- alias: Bench stream {len(self.streamed)} {i}\n  trigger: []\n  action: []\n```\n"
+                for i in range(STREAM_BLOCKS)
+            )
+        else:
+            content = "Suggestion :\n```yaml\n- alias: Bench\n  trigger: []\n  action: []\n```\n"
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(content) // 4,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+        if body.get("stream"):
+            return await self._stream(request, body["model"], content, usage)
+        return web.json_response({
+            "choices": [{"message": {"content": content}}],
+            "usage": usage,
+            "model": body["model"],
+        })
+
+    async def _stream(self, request: web.Request, model: str, content: str, usage: dict) -> web.StreamResponse:
+        self.streamed.append(content)
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        await resp.write(b": keep-alive\n\n")
+        chunks = [
+            {"model": model, "choices": [{"delta": {"content": content[i:i + self.chunk_chars]}}]}
+            for i in range(0, len(content), self.chunk_chars)
+        ]
+        chunks.append({"model": model, "choices": [], "usage": usage})
+        for chunk in chunks:
+            event = f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+            # Two writes per event, so the client also reassembles lines split across packets.
+            await resp.write(event[: len(event) // 2])
+            await resp.write(event[len(event) // 2:])
+            await asyncio.sleep(self.chunk_delay)
+        await resp.write(b"data: [DONE]\n\n")
+        await resp.write_eof()
+        return resp
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/v1/chat/completions"
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+
+def write_automations(path: str, entity_ids: list[str], count: int, rng: random.Random) -> None:
+    """Write an automations.yaml whose triggers and actions use the synthetic entities."""
+    automations = []
+    for i in range(count):
+        trigger_eid, action_eid = rng.choice(entity_ids), rng.choice(entity_ids)
+        automations.append({
+            "id": f"bench_{i}",
+            "alias": f"Bench automation {i}",
+            "description": "Generated by the benchmark",
+            "trigger": [{"platform": "state", "entity_id": trigger_eid, "to": "on"}],
+            "condition": [],
+            "action": [{"service": "homeassistant.toggle", "target": {"entity_id": action_eid}}],
+            "mode": "single",
+        })
+    with open(path, "w", encoding="utf-8") as file:
+        yaml.safe_dump(automations, file, sort_keys=False)
+
+def populate(hass: HomeAssistant, entry: ConfigEntry, count: int, prefix: str, rng: random.Random) -> list[str]:
+    """Register entities on devices spread across areas and set their states."""
+    area_reg, device_reg, entity_reg = ar.async_get(hass), dr.async_get(hass), er.async_get(hass)
+    domains = list(DOMAINS)
+    entity_ids: list[str] = []
+    device_id = None
+    for i in range(count):
+        if i % ENTITIES_PER_DEVICE == 0:
+            area = area_reg.async_get_or_create(f"Area {rng.randrange(max(1, count // ENTITIES_PER_AREA))}")
+            device = device_reg.async_get_or_create(
+                config_entry_id=entry.entry_id, identifiers={("bench", f"{prefix}{i}")}, name=f"Device {prefix}{i}"
+            )
+            device_reg.async_update_device(device.id, area_id=area.id)
+            device_id = device.id
+        domain = domains[i % len(domains)]
+        registry_entry = entity_reg.async_get_or_create(
+            domain, "bench", f"{prefix}{i}", suggested_object_id=f"bench_{prefix}{i}", device_id=device_id
+        )
+        state, attributes = DOMAINS[domain](i)
+        noise = NOISE_ATTRIBUTES[domain](i) if domain in NOISE_ATTRIBUTES else {}
+        hass.states.async_set(
+            registry_entry.entity_id, state, {"friendly_name": f"Bench {prefix}{i}", **attributes, **noise}
+        )
+        entity_ids.append(registry_entry.entity_id)
+    return entity_ids
+
+async def measure(
+    name: str, func: Callable[[], Awaitable[Any]], rounds: int, trace_memory: bool, between: Callable[[], Awaitable[None]] | None = None
+) -> dict:
+    """Run func several times and collect wall time, loop blocking and peak memory."""
+    monitor = LoopMonitor()
+    walls, blocked, max_blocks, peaks = [], [], [], []
+    for _ in range(rounds):
+        if between:
+            await between()
+        if trace_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        monitor.start()
+        start = time.perf_counter()
+        await func()
+        walls.append((time.perf_counter() - start) * 1000)
+        await monitor.stop()
+        blocked.append(monitor.blocked * 1000)
+        max_blocks.append(monitor.max_block * 1000)
+        if trace_memory:
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    _LOGGER.info(f"{name}: median {statistics.median(walls):.1f} ms")
+    return {
+        "rounds": rounds,
+        "wall_ms": [round(w, 3) for w in walls],
+        "wall_ms_median": round(statistics.median(walls), 3),
+        "wall_ms_min": round(min(walls), 3),
+        "loop_blocked_ms_median": round(statistics.median(blocked), 3),
+        "loop_max_block_ms": round(max(max_blocks), 3),
+        "peak_memory_bytes": max(peaks) if peaks else None,
+    }
+
+async def run_size(args: argparse.Namespace, entities: int) -> dict:
+    """Benchmark one synthetic house size."""
+    rng = random.Random(args.seed)
+    config_dir = tempfile.mkdtemp(prefix="grok_bench_")
+    hass = HomeAssistant(config_dir)
+    await ar.async_load(hass)
+    await dr.async_load(hass)
+    await er.async_load(hass)
+    stub = StubGrok(args.latency, args.error_rate, args.seed)
+    await stub.start()
+    entry = ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title="bench",
+        data={CONF_GROK_API_KEY: "bench"},
+        source="user",
+        options={
+            CONF_GROK_ENDPOINT: stub.url,
+            CONF_REQUESTS_PER_MINUTE: 1_000_000,
+            CONF_TOKENS_PER_MINUTE: 1_000_000_000,
+        },
+    )
+    hass.config_entries = ConfigEntries(hass, {})
+    # Registered without being set up, like MockConfigEntry.add_to_hass, so devices can link to it.
+    hass.config_entries._entries[entry.entry_id] = entry
+    setup_start = time.perf_counter()
+    entity_ids = populate(hass, entry, entities, "e", rng)
+    automation_count = args.automations if args.automations is not None else max(1, entities // 10)
+    write_automations(os.path.join(config_dir, "automations.yaml"), entity_ids, automation_count, rng)
+    for i in range(min(automation_count, 1000)):
+        hass.states.async_set(f"automation.bench_{i}", "on", {"friendly_name": f"Bench automation {i}", "id": f"bench_{i}"})
+    await hass.async_block_till_done()
+    populate_ms = (time.perf_counter() - setup_start) * 1000
+
+    setup_start = time.perf_counter()
+    shared = await async_get_domain_data(hass)
+    coordinator = GrokAutomationCoordinator(hass, entry, shared)
+    await coordinator.async_setup()
+    shared.coordinators[entry.entry_id] = coordinator
+    setup_ms = (time.perf_counter() - setup_start) * 1000
+    churn = max(1, int(entities * args.churn))
+    churn_round = 0
+
+    async def add_new_entities() -> None:
+        nonlocal churn_round
+        churn_round += 1
+        populate(hass, entry, churn, f"r{churn_round}_", rng)
+        await hass.async_block_till_done()
+
+    results: dict[str, dict] = {}
+    results["_async_update_data (cold)"] = await measure(
+        "_async_update_data cold", coordinator._async_update_data, 1, args.trace_memory
+    )
+    results["_async_update_data (cold)"]["prompt_chars"] = len(stub.prompts[-1]) if stub.prompts else None
+    results["_async_update_data (incremental)"] = await measure(
+        "_async_update_data incremental", coordinator._async_update_data, args.rounds, args.trace_memory, add_new_entities
+    )
+    snapshot = coordinator._snapshot(entity_ids)
+
+    async def build_prompt() -> None:
+        prompt, _ = await coordinator._build_prompt(snapshot)
+        build_prompt.prompt = prompt
+
+    results["_build_prompt"] = await measure("_build_prompt", build_prompt, args.rounds, args.trace_memory)
+    results["_build_prompt"]["prompt_chars"] = len(build_prompt.prompt)
+    results["_build_prompt"]["prompt_tokens_estimated"] = coordinator.last_pack.tokens if coordinator.last_pack else None
+
+    verbose_tokens = sum(coordinator.estimator.count(coordinator._entity_fragment(eid, meta)) for eid, meta in snapshot.items())
+    _, compact_sections, _ = coordinator._compact_sections(list(snapshot.items()))
+    compact_tokens = coordinator.estimator.count("".join(compact_sections))
+    tokens_per_entity = {
+        "estimator": coordinator.estimator.name,
+        "verbose": round(verbose_tokens / len(snapshot), 2),
+        "compact": round(compact_tokens / len(snapshot), 2),
+        "ratio": round(verbose_tokens / compact_tokens, 2) if compact_tokens else None,
+    }
+    selected = coordinator.ranker.top_k(entity_ids, coordinator.entity_limit)
+
+    async def read_automations() -> None:
+        relevant = await coordinator._relevant_automations(selected, MAX_AUTOM)
+        coordinator._read_automations_file_method(relevant, MAX_ATTR)
+
+    async def invalidate_automations() -> None:
+        # Touch the file so the parse cache misses.
+        os.utime(coordinator.automations.path, ns=(time.time_ns(), time.time_ns()))
+
+    results["_read_automations_file_method (cold)"] = await measure(
+        "_read_automations_file_method cold", read_automations, args.rounds, args.trace_memory, invalidate_automations
+    )
+    results["_read_automations_file_method (warm)"] = await measure(
+        "_read_automations_file_method warm", read_automations, args.rounds, args.trace_memory
+    )
+    if args.triage:
+        results.update(await measure_tiers(args, hass, entry, coordinator, stub))
+    if args.stream:
+        results.update(await measure_streaming(args, hass, entry, coordinator))
+    summary = {
+        "entities": entities,
+        "automations": automation_count,
+        "populate_ms": round(populate_ms, 3),
+        "coordinator_setup_ms": round(setup_ms, 3),
+        "api_calls": len(stub.prompts),
+        "tokens_per_entity": tokens_per_entity,
+        "metrics": coordinator.metrics.summary(),
+        "results": results,
+    }
+    await coordinator.async_shutdown()
+    shared.async_stop()
+    await stub.stop()
+    await hass.async_stop(force=True)
+    return summary
+
+async def measure_tiers(
+    args: argparse.Namespace, hass: HomeAssistant, entry: ConfigEntry, coordinator: GrokAutomationCoordinator, stub: StubGrok
+) -> dict[str, dict]:
+    """Compare a full scan covered by premium-model shards with a triage + premium run."""
+    triage_stub = StubGrok(args.triage_latency, 0.0, args.seed, triage=True)
+    await triage_stub.start()
+    base_options = {**entry.options, CONF_RESPONSE_CACHE_TTL: 0}
+    modes = {
+        "full scan (sharded, premium only)": {CONF_SHARDED_MODE: True, CONF_MAX_SHARDS: 1000},
+        "full scan (triage + premium)": {CONF_TRIAGE_MODE: True, CONF_TRIAGE_ENDPOINT: triage_stub.url, CONF_TRIAGE_MIN_ENTITIES: 1},
+    }
+    results: dict[str, dict] = {}
+    for name, options in modes.items():
+        hass.config_entries.async_update_entry(entry, options={**base_options, **options})
+        before = {tier: dict(totals) for tier, totals in coordinator.metrics.tiers.items()}
+        calls = len(stub.prompts) + len(triage_stub.prompts)
+
+        async def full_scan() -> None:
+            await coordinator._async_generate(SuggestionRequest(scan_mode=SCAN_MODE_ALL))
+
+        results[name] = await measure(name, full_scan, args.rounds, args.trace_memory)
+        results[name]["api_calls_per_run"] = (len(stub.prompts) + len(triage_stub.prompts) - calls) / args.rounds
+        results[name]["tiers_per_run"] = {
+            tier: {
+                key: round((totals[key] - before.get(tier, {}).get(key, 0)) / args.rounds, 6)
+                for key in ("input_tokens", "output_tokens", "cost_usd")
+            }
+            for tier, totals in coordinator.metrics.tiers.items()
+        }
+    hass.config_entries.async_update_entry(entry, options={key: value for key, value in base_options.items() if key != CONF_RESPONSE_CACHE_TTL})
+    await triage_stub.stop()
+    return results
+
+async def measure_streaming(
+    args: argparse.Namespace, hass: HomeAssistant, entry: ConfigEntry, coordinator: GrokAutomationCoordinator
+) -> dict[str, dict]:
+    """Stream answers from a chunked SSE stub and check what the coordinator reassembles.
+
+    Raises when the text or the YAML blocks differ from what was sent, or when
+    progress updates are not one per completed block plus at most one per
+    STREAM_UPDATE_INTERVAL.
+    """
+    stub = StubGrok(0.0, 0.0, args.seed, chunk_chars=args.stream_chunk_chars, chunk_delay=args.stream_chunk_delay)
+    await stub.start()
+    previous = dict(entry.options)
+    hass.config_entries.async_update_entry(
+        entry, options={**previous, CONF_GROK_ENDPOINT: stub.url, CONF_STREAMING: True, CONF_RESPONSE_CACHE_TTL: 0}
+    )
+    premium = coordinator._tiers()[1]
+    updates: list[tuple[str, int]] = []
+    durations: list[float] = []
+
+    async def stream() -> None:
+        updates.clear()
+        start = time.monotonic()
+        data = await coordinator._grok("Bench streaming prompt", lambda text, blocks: updates.append((text, len(blocks))), premium)
+        durations.append(time.monotonic() - start)
+        sent = stub.streamed[-1]
+        expected_blocks = [block.strip() for block in YAML_FENCE_RE.findall(sent)]
+        received_blocks = [block.strip() for block in YAML_FENCE_RE.findall(data["content"])] if data else []
+        if not data or data["content"] != sent or received_blocks != expected_blocks:
+            raise RuntimeError(f"Streamed answer reassembled incorrectly: {data}")
+        if any(not sent.startswith(text) for text, _ in updates) or [n for _, n in updates] != sorted(n for _, n in updates):
+            raise RuntimeError("Streaming progress went backwards or published text that was not sent")
+        block_updates = len({n for _, n in updates if n})
+        timed_max = int(durations[-1] / STREAM_UPDATE_INTERVAL) + 1
+        if block_updates != STREAM_BLOCKS or not STREAM_BLOCKS <= len(updates) <= STREAM_BLOCKS + timed_max:
+            raise RuntimeError(f"{len(updates)} progress updates for {STREAM_BLOCKS} blocks in {durations[-1]:.2f}s")
+        stream.updates = len(updates)
+        stream.timed_updates = len(updates) - block_updates
+
+    results = {"streaming (chunked SSE)": await measure("streaming", stream, args.rounds, args.trace_memory)}
+    results["streaming (chunked SSE)"].update({
+        "chunk_chars": args.stream_chunk_chars,
+        "chunk_delay_s": args.stream_chunk_delay,
+        "blocks": STREAM_BLOCKS,
+        "progress_updates_last_run": stream.updates,
+        "throttled_updates_last_run": stream.timed_updates,
+        "stream_seconds_median": round(statistics.median(durations), 3),
+    })
+    hass.config_entries.async_update_entry(entry, options=previous)
+    await stub.stop()
+    return results
+
+async def async_main(args: argparse.Namespace) -> dict:
+    if args.trace_memory:
+        tracemalloc.start()
+    runs = [await run_size(args, entities) for entities in args.entities]
+    return {
+        "benchmark": "coordinator_pipeline",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "homeassistant": HA_VERSION,
+            "platform": platform.platform(),
+        },
+        "config": {
+            "latency_s": args.latency,
+            "error_rate": args.error_rate,
+            "rounds": args.rounds,
+            "churn": args.churn,
+            "seed": args.seed,
+            "trace_memory": args.trace_memory,
+            "triage": args.triage,
+            "triage_latency_s": args.triage_latency,
+            "stream": args.stream,
+        },
+        "runs": runs,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, nargs="+", default=[1000], help="house sizes to run, e.g. 1000 10000 50000")
+    parser.add_argument("--automations", type=int, default=None, help="automations per house (default: entities / 10)")
+    parser.add_argument("--latency", type=float, default=0.2, help="mean stub API latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub API calls answered with 503")
+    parser.add_argument("--rounds", type=int, default=5, help="repetitions per measurement")
+    parser.add_argument("--churn", type=float, default=0.01, help="fraction of new entities added before each incremental run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--triage", action="store_true", help="also compare sharded full scans with triage + premium runs")
+    parser.add_argument("--triage-latency", type=float, default=0.05, help="mean stub latency of the triage model in seconds")
+    parser.add_argument("--stream", action="store_true", help="also stream answers from a chunked SSE stub and check the reassembly")
+    parser.add_argument("--stream-chunk-chars", type=int, default=16, help="characters per streamed delta")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.1, help="seconds between streamed deltas (long enough to exercise the update throttling)")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false", help="skip tracemalloc (faster, no peak memory)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    report = asyncio.run(async_main(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,215 @@
 from __future__ import annotations
 import logging
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 import voluptuous as vol
-from .const import DOMAIN, SERVICE_GENERATE_SUGGESTIONS, ATTR_CUSTOM_PROMPT
-from .coordinator import GrokAutomationCoordinator, SYSTEM_PROMPT
+from .const import (
+    DOMAIN,
+    CONF_GROK_API_KEY,
+    CONF_GROK_ENDPOINT,
+    ENDPOINT_GROK,
+    SERVICE_GENERATE_SUGGESTIONS,
+    SERVICE_GET_HISTORY,
+    SERVICE_GET_JOB,
+    SERVICE_PROFILE_RUN,
+    ATTR_ALL_ENTITIES,
+    ATTR_BLOCK_THRESHOLD_MS,
+    ATTR_BYPASS_CACHE,
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_CUSTOM_PROMPT,
+    ATTR_END,
+    ATTR_ENTITY_ID,
+    ATTR_JOB_ID,
+    ATTR_LIMIT,
+    ATTR_SCAN_MODE,
+    ATTR_START,
+    ATTR_TOP,
+    ATTR_WAIT,
+    DEFAULT_BLOCK_THRESHOLD_MS,
+    DEFAULT_PROFILE_TOP,
+    SCAN_MODE_ALL,
+    SCAN_MODE_NEW,
+    SCAN_MODES,
+)
+from .coordinator import GrokAutomationCoordinator
+from .fingerprints import EntityFingerprintStore
+from .history import SuggestionHistory
+from .jobs import JOB_FAILED, SuggestionRequest
+from .metrics import RunMetrics
+from .model_catalog import async_remove_model_catalog
+from .profiling import RunProfiler
+from .response_cache import ResponseCache
+from .shared import GrokDomainData, async_get_domain_data
+from .suggestion_index import SuggestionIndex
+from .websocket_api import async_register_websocket_commands
 
 _LOGGER = logging.getLogger(__name__)
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Set up Grok Automation Suggester from a config entry."""
-    _LOGGER.debug(f"Configuring entry {entry.entry_id} with data: {entry.data}")
-    coordinator = GrokAutomationCoordinator(hass, entry)
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
-    await hass.config_entries.async_forward_entry_setups(entry, ["sensor"])
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Register the WebSocket commands, which outlive config entry reloads."""
+    async_register_websocket_commands(hass)
+    return True
 
-    async def handle_generate_suggestions(call: ServiceCall) -> None:
+def _async_register_services(hass: HomeAssistant) -> None:
+    """Register the services once for every entry; calls are routed by config_entry_id."""
+    async def handle_generate_suggestions(call: ServiceCall) -> ServiceResponse:
         """Handle the generate_suggestions service call."""
-        _LOGGER.info(f"Service called with all_entities={call.data.get('all_entities')}, custom_prompt={call.data.get(ATTR_CUSTOM_PROMPT)}")
-        try:
-            coordinator.scan_all = call.data.get("all_entities", False)
-            custom_prompt = call.data.get(ATTR_CUSTOM_PROMPT)
-            if custom_prompt:
-                coordinator.SYSTEM_PROMPT += f"\n\nCustom Prompt: {custom_prompt}"
-                _LOGGER.debug(f"Custom prompt added: {custom_prompt}")
-            _LOGGER.info("Starting coordinator refresh")
-            await coordinator.async_refresh()
-            _LOGGER.info("Suggestions generated successfully")
-        except Exception as err:
-            _LOGGER.error(f"Error generating suggestions: {str(err)}", exc_info=True)
-            raise
-        finally:
-            coordinator.SYSTEM_PROMPT = SYSTEM_PROMPT
+        coordinator = hass.data[DOMAIN].async_get_coordinator(call.data.get(ATTR_CONFIG_ENTRY_ID))
+        _LOGGER.info(
+            f"Service called for entry {coordinator.entry.entry_id} with all_entities={call.data.get(ATTR_ALL_ENTITIES)}, "
+            f"scan_mode={call.data.get(ATTR_SCAN_MODE)}, custom_prompt={call.data.get(ATTR_CUSTOM_PROMPT)}"
+        )
+        request = SuggestionRequest(
+            scan_mode=call.data.get(
+                ATTR_SCAN_MODE, SCAN_MODE_ALL if call.data.get(ATTR_ALL_ENTITIES, False) else SCAN_MODE_NEW
+            ),
+            custom_prompt=call.data.get(ATTR_CUSTOM_PROMPT) or None,
+            bypass_cache=call.data.get(ATTR_BYPASS_CACHE, False),
+        )
+        job, coalesced = coordinator.jobs.async_submit(request)
+        _LOGGER.info(f"Suggestion job {job.job_id} {'coalesced' if coalesced else 'queued'}")
+        if call.data[ATTR_WAIT]:
+            await job.finished.wait()
+            if job.status == JOB_FAILED:
+                raise HomeAssistantError(f"Suggestion job {job.job_id} failed: {job.error}")
+        return {**job.as_dict(), "coalesced": coalesced}
 
     hass.services.async_register(
         DOMAIN,
         SERVICE_GENERATE_SUGGESTIONS,
         handle_generate_suggestions,
         schema=vol.Schema({
-            vol.Required("all_entities"): vol.Coerce(bool),
+            vol.Required(ATTR_ALL_ENTITIES): vol.Coerce(bool),
+            vol.Optional(ATTR_SCAN_MODE): vol.In(SCAN_MODES),
             vol.Optional(ATTR_CUSTOM_PROMPT): str,
+            vol.Optional(ATTR_BYPASS_CACHE, default=False): vol.Coerce(bool),
+            vol.Optional(ATTR_WAIT, default=False): vol.Coerce(bool),
+            vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
         }),
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
+    async def handle_get_job(call: ServiceCall) -> ServiceResponse:
+        """Return the status of a recent generate_suggestions job."""
+        coordinator = hass.data[DOMAIN].async_get_coordinator(call.data.get(ATTR_CONFIG_ENTRY_ID))
+        job = coordinator.jobs.async_get(call.data[ATTR_JOB_ID])
+        if job is None:
+            raise ServiceValidationError(f"Unknown or expired job {call.data[ATTR_JOB_ID]}")
+        return job.as_dict()
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_JOB,
+        handle_get_job,
+        schema=vol.Schema({
+            vol.Required(ATTR_JOB_ID): cv.string,
+            vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        }),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def handle_get_history(call: ServiceCall) -> ServiceResponse:
+        """Return past suggestions by time range and/or entity."""
+        coordinator = hass.data[DOMAIN].async_get_coordinator(call.data.get(ATTR_CONFIG_ENTRY_ID))
+        records, total = await coordinator.history.async_query(
+            start=call.data.get(ATTR_START),
+            end=call.data.get(ATTR_END),
+            entity_id=call.data.get(ATTR_ENTITY_ID),
+            limit=call.data[ATTR_LIMIT],
+        )
+        return {"total": total, "suggestions": records}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_HISTORY,
+        handle_get_history,
+        schema=vol.Schema({
+            vol.Optional(ATTR_START): cv.datetime,
+            vol.Optional(ATTR_END): cv.datetime,
+            vol.Optional(ATTR_ENTITY_ID): cv.entity_id,
+            vol.Optional(ATTR_LIMIT, default=10): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+            vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        }),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def handle_profile_run(call: ServiceCall) -> ServiceResponse:
+        """Run one suggestion pass under cProfile and tracemalloc and report where the time went."""
+        shared: GrokDomainData = hass.data[DOMAIN]
+        coordinator = shared.async_get_coordinator(call.data.get(ATTR_CONFIG_ENTRY_ID))
+        if shared.profile_lock.locked():
+            raise ServiceValidationError("A profiled run is already in progress")
+        async with shared.profile_lock:
+            profiler = RunProfiler(coordinator, call.data[ATTR_BLOCK_THRESHOLD_MS], call.data[ATTR_TOP])
+            return await profiler.async_run(SuggestionRequest(
+                scan_mode=call.data[ATTR_SCAN_MODE],
+                custom_prompt=call.data.get(ATTR_CUSTOM_PROMPT) or None,
+                bypass_cache=call.data[ATTR_BYPASS_CACHE],
+            ))
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE_RUN,
+        handle_profile_run,
+        schema=vol.Schema({
+            vol.Optional(ATTR_SCAN_MODE, default=SCAN_MODE_NEW): vol.In(SCAN_MODES),
+            vol.Optional(ATTR_CUSTOM_PROMPT): str,
+            vol.Optional(ATTR_BYPASS_CACHE, default=False): vol.Coerce(bool),
+            vol.Optional(ATTR_BLOCK_THRESHOLD_MS, default=DEFAULT_BLOCK_THRESHOLD_MS): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(ATTR_TOP, default=DEFAULT_PROFILE_TOP): vol.All(vol.Coerce(int), vol.Range(min=1, max=200)),
+            vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        }),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Set up Grok Automation Suggester from a config entry."""
+    _LOGGER.debug(f"Configuring entry {entry.entry_id} with data: {entry.data}")
+    shared = await async_get_domain_data(hass)
+    coordinator = GrokAutomationCoordinator(hass, entry, shared)
+    await coordinator.async_setup()
+    shared.coordinators[entry.entry_id] = coordinator
+    await hass.config_entries.async_forward_entry_setups(entry, ["sensor"])
+    if not hass.services.has_service(DOMAIN, SERVICE_GENERATE_SUGGESTIONS):
+        _async_register_services(hass)
     return True
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Unload a config entry."""
+    """Unload a config entry, and the shared layer with the last one."""
     _LOGGER.debug(f"Unloading entry {entry.entry_id}")
     unload_ok = await hass.config_entries.async_unload_platforms(entry, ["sensor"])
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        shared: GrokDomainData = hass.data[DOMAIN]
+        coordinator = shared.coordinators.pop(entry.entry_id)
+        await coordinator.async_shutdown()
+        if not shared.coordinators:
+            shared.async_stop()
+            hass.data.pop(DOMAIN)
+            hass.services.async_remove(DOMAIN, SERVICE_GENERATE_SUGGESTIONS)
+            hass.services.async_remove(DOMAIN, SERVICE_GET_HISTORY)
+            hass.services.async_remove(DOMAIN, SERVICE_GET_JOB)
+            hass.services.async_remove(DOMAIN, SERVICE_PROFILE_RUN)
     return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove data stored for a deleted config entry."""
+    await EntityFingerprintStore(hass, entry.entry_id).async_remove()
+    await ResponseCache(hass, entry.entry_id, 0).async_remove()
+    await RunMetrics(hass, entry.entry_id).async_remove()
+    await SuggestionIndex(hass, entry.entry_id).async_remove()
+    await SuggestionHistory(hass, entry.entry_id).async_remove()
+    # The model list is shared per API key and endpoint: keep it while another entry uses them.
+    def credentials(config_entry: ConfigEntry) -> tuple[str, str]:
+        settings = {**config_entry.data, **config_entry.options}
+        return settings.get(CONF_GROK_API_KEY) or "", settings.get(CONF_GROK_ENDPOINT, ENDPOINT_GROK)
+
+    if not any(
+        credentials(other) == credentials(entry)
+        for other in hass.config_entries.async_entries(DOMAIN)
+        if other.entry_id != entry.entry_id
+    ):
+        await async_remove_model_catalog(hass, *credentials(entry))
@@ -0,0 +1,200 @@
+from __future__ import annotations
+from datetime import datetime, time as dt_time, timedelta
+import logging
+import time
+from typing import TYPE_CHECKING
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+from .const import (
+    AUTO_CHANGED_ENTITY_WEIGHT,
+    AUTO_MAX_DEBOUNCE_FACTOR,
+    AUTO_NEW_ENTITY_WEIGHT,
+    CONF_AUTO_DEBOUNCE,
+    CONF_AUTO_MODE,
+    CONF_AUTO_THRESHOLD,
+    CONF_DAILY_TOKEN_CAP,
+    CONF_QUIET_HOURS_END,
+    CONF_QUIET_HOURS_START,
+    DEFAULT_AUTO_DEBOUNCE,
+    DEFAULT_AUTO_MODE,
+    DEFAULT_AUTO_THRESHOLD,
+    DEFAULT_DAILY_TOKEN_CAP,
+    DEFAULT_QUIET_HOURS,
+    SCAN_MODE_CHANGED,
+)
+from .fingerprints import entity_fingerprint
+from .jobs import SuggestionRequest
+
+if TYPE_CHECKING:
+    from .coordinator import GrokAutomationCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+def _parse_time(value: str | None) -> dt_time | None:
+    if not value:
+        return None
+    try:
+        hours, minutes = value.split(":")
+        return dt_time(int(hours), int(minutes))
+    except ValueError:
+        _LOGGER.warning(f"Ignoring invalid quiet hours time: {value}")
+        return None
+
+def seconds_until_quiet_end(now: datetime, start: dt_time | None, end: dt_time | None) -> float:
+    """Return how long quiet hours still last at now, 0 when outside them or disabled."""
+    if start is None or end is None or start == end:
+        return 0.0
+    current = now.time()
+    quiet = start <= current < end if start < end else current >= start or current < end
+    if not quiet:
+        return 0.0
+    end_at = now.replace(hour=end.hour, minute=end.minute, second=0, microsecond=0)
+    if end_at <= now:
+        end_at += timedelta(days=1)
+    return (end_at - now).total_seconds()
+
+class AdaptiveScheduler:
+    """Start a generation run when enough entities appeared or changed shape.
+
+    Entity events only move a deadline: the pending delta is weighed once the
+    house has been calm for the debounce period (or after debounce x
+    AUTO_MAX_DEBOUNCE_FACTOR in a house that never settles), so a burst of new
+    devices becomes one run. Runs are queued on the job queue in "changed"
+    mode, which covers new and changed entities together.
+    """
+    def __init__(self, coordinator: GrokAutomationCoordinator):
+        """Initialize the scheduler."""
+        self.coordinator = coordinator
+        self.hass = coordinator.hass
+        self._unsub_listener: CALLBACK_TYPE | None = None
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._first_event: float | None = None
+        self._due: float | None = None
+        self._not_before = 0.0
+        self.last_weight = 0.0
+        self.last_trigger: datetime | None = None
+        self.triggered = 0
+        self.deferred_quiet_hours = 0
+        self.deferred_token_cap = 0
+
+    @callback
+    def async_start(self) -> None:
+        """Listen to entity changes."""
+        self._unsub_listener = self.coordinator.tracker.async_add_listener(self._handle_change)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop listening and cancel the pending evaluation."""
+        if self._unsub_listener:
+            self._unsub_listener()
+            self._unsub_listener = None
+        if self._unsub_timer:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+    @callback
+    def _handle_change(self, eid: str) -> None:
+        if not self.coordinator._opt(CONF_AUTO_MODE, DEFAULT_AUTO_MODE):
+            return
+        domains = self.coordinator.selected_domains
+        if domains and eid.split(".")[0] not in domains:
+            return
+        now = time.monotonic()
+        debounce = self.coordinator._opt(CONF_AUTO_DEBOUNCE, DEFAULT_AUTO_DEBOUNCE)
+        if self._first_event is None:
+            self._first_event = now
+        self._due = max(self._not_before, min(now + debounce, self._first_event + debounce * AUTO_MAX_DEBOUNCE_FACTOR))
+        if self._unsub_timer is None:
+            self._schedule(self._due - now)
+
+    @callback
+    def _schedule(self, delay: float) -> None:
+        self._unsub_timer = async_call_later(self.hass, max(0.0, delay), self._handle_timer)
+
+    @callback
+    def _handle_timer(self, _now: datetime) -> None:
+        self._unsub_timer = None
+        if self._due is None:
+            return
+        remaining = self._due - time.monotonic()
+        if remaining > 0:
+            # More events arrived since the timer was set.
+            self._schedule(remaining)
+            return
+        self._first_event = self._due = None
+        self.coordinator.entry.async_create_background_task(
+            self.hass, self._async_evaluate(), f"grok_automation_suggester auto {self.coordinator.entry.entry_id}"
+        )
+
+    @callback
+    def _defer(self, delay: float) -> None:
+        """Re-evaluate after delay, whatever happens in between."""
+        now = time.monotonic()
+        self._not_before = self._first_event = self._due = now + delay
+        if self._unsub_timer:
+            self._unsub_timer()
+        self._schedule(delay)
+
+    async def _async_weight(self) -> float:
+        """Weigh the pending entities that a "changed" run would actually send."""
+        coordinator = self.coordinator
+        delta = coordinator.tracker.async_peek(coordinator.entry.entry_id, coordinator.selected_domains)
+        known = await coordinator.fingerprints.async_load()
+        weight = 0.0
+        for eid in delta.new | delta.changed:
+            if eid not in known:
+                weight += AUTO_NEW_ENTITY_WEIGHT
+                continue
+            state = self.hass.states.get(eid)
+            if state and known[eid] != entity_fingerprint(state.attributes, coordinator.area_index.area_id(eid)):
+                weight += AUTO_CHANGED_ENTITY_WEIGHT
+        return weight
+
+    async def _async_evaluate(self) -> None:
+        coordinator = self.coordinator
+        if not coordinator._opt(CONF_AUTO_MODE, DEFAULT_AUTO_MODE):
+            return
+        self.last_weight = await self._async_weight()
+        threshold = coordinator._opt(CONF_AUTO_THRESHOLD, DEFAULT_AUTO_THRESHOLD)
+        if self.last_weight < threshold:
+            _LOGGER.debug(f"Pending entity weight {self.last_weight} below threshold {threshold}")
+            return
+        now = dt_util.now()
+        quiet_left = seconds_until_quiet_end(
+            now,
+            _parse_time(coordinator._opt(CONF_QUIET_HOURS_START, DEFAULT_QUIET_HOURS)),
+            _parse_time(coordinator._opt(CONF_QUIET_HOURS_END, DEFAULT_QUIET_HOURS)),
+        )
+        if quiet_left:
+            self.deferred_quiet_hours += 1
+            _LOGGER.info(f"Quiet hours: automatic suggestions postponed by {quiet_left / 60:.0f} min")
+            self._defer(quiet_left)
+            return
+        cap = coordinator._opt(CONF_DAILY_TOKEN_CAP, DEFAULT_DAILY_TOKEN_CAP)
+        if cap and coordinator.metrics.tokens_today >= cap:
+            self.deferred_token_cap += 1
+            tomorrow = dt_util.start_of_local_day(now + timedelta(days=1))
+            _LOGGER.info(f"Daily token cap of {cap} reached: automatic suggestions postponed until {tomorrow}")
+            self._defer((tomorrow - now).total_seconds())
+            return
+        self._not_before = 0.0
+        job, coalesced = coordinator.jobs.async_submit(SuggestionRequest(scan_mode=SCAN_MODE_CHANGED))
+        self.triggered += 1
+        self.last_trigger = now
+        _LOGGER.info(
+            f"Entity weight {self.last_weight} reached threshold {threshold}: "
+            f"job {job.job_id} {'coalesced' if coalesced else 'queued'}"
+        )
+
+    def stats(self) -> dict:
+        """Return scheduler state for diagnostics."""
+        return {
+            "enabled": self.coordinator._opt(CONF_AUTO_MODE, DEFAULT_AUTO_MODE),
+            "evaluation_pending": self._due is not None,
+            "last_weight": self.last_weight,
+            "last_trigger": self.last_trigger.isoformat() if self.last_trigger else None,
+            "triggered": self.triggered,
+            "deferred_quiet_hours": self.deferred_quiet_hours,
+            "deferred_token_cap": self.deferred_token_cap,
+        }
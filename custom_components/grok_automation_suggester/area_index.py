@@ -0,0 +1,149 @@
+from __future__ import annotations
+from collections import defaultdict
+from collections.abc import Callable
+import logging
+from typing import NamedTuple
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers import area_registry as ar, device_registry as dr, entity_registry as er
+
+_LOGGER = logging.getLogger(__name__)
+
+class EntityContext(NamedTuple):
+    """Registry context resolved for one entity."""
+    area_id: str | None
+    area_name: str | None
+    device_name: str | None
+    integration: str | None
+    entity_category: str | None = None
+    hidden: bool = False
+
+class EntityAreaIndex:
+    """entity_id -> area/device/integration index patched from registry events."""
+    def __init__(self, hass: HomeAssistant):
+        """Initialize the index."""
+        self.hass = hass
+        self._entities: dict[str, EntityContext] = {}
+        self._by_device: defaultdict[str, set[str]] = defaultdict(set)
+        self._by_area: defaultdict[str, set[str]] = defaultdict(set)
+        self._device_of: dict[str, str] = {}
+        self._listeners: list[Callable[[str], None]] = []
+        self._unsubs: list[CALLBACK_TYPE] = []
+        self._entity_registry: er.EntityRegistry | None = None
+        self._device_registry: dr.DeviceRegistry | None = None
+        self._area_registry: ar.AreaRegistry | None = None
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    @callback
+    def async_start(self) -> None:
+        """Build the index once and subscribe to registry events."""
+        self._entity_registry = er.async_get(self.hass)
+        self._device_registry = dr.async_get(self.hass)
+        self._area_registry = ar.async_get(self.hass)
+        for entry in self._entity_registry.entities.values():
+            self._index_entity(entry)
+        self._unsubs.append(self.hass.bus.async_listen(er.EVENT_ENTITY_REGISTRY_UPDATED, self._handle_entity_event))
+        self._unsubs.append(self.hass.bus.async_listen(dr.EVENT_DEVICE_REGISTRY_UPDATED, self._handle_device_event))
+        self._unsubs.append(self.hass.bus.async_listen(ar.EVENT_AREA_REGISTRY_UPDATED, self._handle_area_event))
+        _LOGGER.debug(f"Area index built for {len(self._entities)} entities")
+
+    @callback
+    def async_stop(self) -> None:
+        """Unsubscribe from registry events."""
+        while self._unsubs:
+            self._unsubs.pop()()
+
+    @callback
+    def async_add_listener(self, listener: Callable[[str], None]) -> CALLBACK_TYPE:
+        """Call listener with every entity_id whose context was patched."""
+        self._listeners.append(listener)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(listener)
+
+        return remove_listener
+
+    @callback
+    def get(self, eid: str) -> EntityContext | None:
+        """Return the context of an entity, or None when it has no registry entry."""
+        return self._entities.get(eid)
+
+    @callback
+    def area_id(self, eid: str) -> str | None:
+        """Return the resolved area of an entity."""
+        context = self._entities.get(eid)
+        return context.area_id if context else None
+
+    @callback
+    def device_id(self, eid: str) -> str | None:
+        """Return the device an entity belongs to."""
+        return self._device_of.get(eid)
+
+    @callback
+    def _index_entity(self, entry: er.RegistryEntry) -> None:
+        eid = entry.entity_id
+        self._drop_entity(eid)
+        device = self._device_registry.async_get(entry.device_id) if entry.device_id else None
+        area_id = entry.area_id or (device.area_id if device else None)
+        area = self._area_registry.async_get_area(area_id) if area_id else None
+        self._entities[eid] = EntityContext(
+            area_id=area_id,
+            area_name=area.name if area else None,
+            device_name=(device.name_by_user or device.name) if device else None,
+            integration=entry.platform,
+            entity_category=entry.entity_category.value if entry.entity_category else None,
+            hidden=entry.hidden_by is not None,
+        )
+        if entry.device_id:
+            self._device_of[eid] = entry.device_id
+            self._by_device[entry.device_id].add(eid)
+        if area_id:
+            self._by_area[area_id].add(eid)
+
+    @callback
+    def _drop_entity(self, eid: str) -> None:
+        context = self._entities.pop(eid, None)
+        if context and context.area_id:
+            self._discard(self._by_area, context.area_id, eid)
+        device_id = self._device_of.pop(eid, None)
+        if device_id:
+            self._discard(self._by_device, device_id, eid)
+
+    @staticmethod
+    def _discard(index: defaultdict[str, set[str]], key: str, eid: str) -> None:
+        members = index.get(key)
+        if members is not None:
+            members.discard(eid)
+            if not members:
+                del index[key]
+
+    @callback
+    def _reindex(self, entity_ids) -> None:
+        for eid in entity_ids:
+            entry = self._entity_registry.async_get(eid)
+            if entry:
+                self._index_entity(entry)
+            else:
+                self._drop_entity(eid)
+            for listener in self._listeners:
+                listener(eid)
+
+    @callback
+    def _handle_entity_event(self, event: Event) -> None:
+        eid = event.data.get("entity_id")
+        old_eid = event.data.get("old_entity_id")
+        self._reindex([e for e in (old_eid, eid) if e])
+
+    @callback
+    def _handle_device_event(self, event: Event) -> None:
+        device_id = event.data.get("device_id")
+        if device_id:
+            self._reindex(list(self._by_device.get(device_id, ())))
+
+    @callback
+    def _handle_area_event(self, event: Event) -> None:
+        area_id = event.data.get("area_id")
+        if area_id:
+            self._reindex(list(self._by_area.get(area_id, ())))
@@ -0,0 +1,212 @@
+from __future__ import annotations
+import asyncio
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from hashlib import blake2b
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import time
+from typing import Any
+import yaml
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:  # libyaml not available
+    from yaml import SafeLoader as YamlLoader
+
+_LOGGER = logging.getLogger(__name__)
+EVENT_AUTOMATION_RELOADED = "automation_reloaded"
+REFERENCE_KEYS = {"entity_id": "entity", "device_id": "device", "area_id": "area"}
+# entity_ids mentioned inside templates, e.g. {{ states('sensor.temperature') }}
+TEMPLATE_ENTITY_RE = re.compile(r"\b([a-z_]+\.[a-z0-9_]+)\b")
+
+def _parse_automations(path: Path) -> list[dict]:
+    """Parse automations.yaml (runs in the executor)."""
+    with open(path, encoding="utf-8") as file:
+        automations = yaml.load(file, Loader=YamlLoader) or []
+    if not isinstance(automations, list):
+        raise yaml.YAMLError("automations.yaml does not contain a list")
+    return [automation for automation in automations if isinstance(automation, dict)]
+
+class AutomationsFileCache:
+    """Parsed automations.yaml, reloaded only when the file or automations change."""
+    def __init__(self, hass: HomeAssistant):
+        """Initialize the cache."""
+        self.hass = hass
+        self.path = Path(hass.config.path("automations.yaml"))
+        self.hits = 0
+        self.misses = 0
+        self.last_parse_ms: float | None = None
+        self.loader = YamlLoader.__name__
+        self._automations: list[dict] = []
+        self._key: tuple[int, int] | None = None
+        self._lock = asyncio.Lock()
+        self._unsub: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Drop the cached parse whenever automations are reloaded."""
+        self._unsub = self.hass.bus.async_listen(EVENT_AUTOMATION_RELOADED, self._handle_reloaded)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop listening for reloads."""
+        if self._unsub:
+            self._unsub()
+            self._unsub = None
+
+    @callback
+    def _handle_reloaded(self, event: Event) -> None:
+        self._key = None
+
+    def _stat_key(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def async_get(self) -> list[dict]:
+        """Return the parsed automations, parsing off the event loop when stale."""
+        async with self._lock:
+            key = await self.hass.async_add_executor_job(self._stat_key)
+            if key is None:
+                _LOGGER.error("The automations.yaml file was not found.")
+                self._automations, self._key = [], None
+                return self._automations
+            if key == self._key:
+                self.hits += 1
+                return self._automations
+            self.misses += 1
+            start = time.monotonic()
+            try:
+                self._automations = await self.hass.async_add_executor_job(_parse_automations, self.path)
+            except (OSError, yaml.YAMLError) as err:
+                _LOGGER.error(f"Error parsing automations.yaml: {err}")
+                self._automations = []
+            self.last_parse_ms = round((time.monotonic() - start) * 1000, 2)
+            self._key = key
+            _LOGGER.debug(f"Parsed {len(self._automations)} automations in {self.last_parse_ms} ms")
+            return self._automations
+
+    def stats(self) -> dict:
+        """Return cache statistics for diagnostics."""
+        total = self.hits + self.misses
+        return {
+            "automations": len(self._automations),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "last_parse_ms": self.last_parse_ms,
+            "loader": self.loader,
+        }
+
+def _collect_references(node: Any, found: set[tuple[str, str]]) -> set[tuple[str, str]]:
+    """Collect (kind, id) pairs for every entity, device and area an automation references."""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            kind = REFERENCE_KEYS.get(key)
+            if kind:
+                for item in value if isinstance(value, list) else [value]:
+                    if isinstance(item, str):
+                        found.add((kind, item.strip().lower() if kind == "entity" else item.strip()))
+            else:
+                _collect_references(value, found)
+    elif isinstance(node, list):
+        for item in node:
+            _collect_references(item, found)
+    elif isinstance(node, str) and ("{{" in node or "{%" in node):
+        found.update(("entity", eid) for eid in TEMPLATE_ENTITY_RE.findall(node))
+    return found
+
+def automation_references(automation: dict) -> set[tuple[str, str]]:
+    """Return what an automation's triggers, conditions and actions refer to."""
+    found: set[tuple[str, str]] = set()
+    for key in ("trigger", "triggers", "condition", "conditions", "action", "actions"):
+        _collect_references(automation.get(key), found)
+    return found
+
+class AutomationIndex:
+    """Inverted index from entity, device and area ids to the automations that use them.
+
+    Updated incrementally: only automations whose content changed between two
+    parses of automations.yaml are re-indexed.
+    """
+    def __init__(self):
+        """Initialize an empty index."""
+        self._automations: dict[str, dict] = {}
+        self._digests: dict[str, str] = {}
+        self._references: dict[str, set[tuple[str, str]]] = {}
+        self._by_reference: defaultdict[tuple[str, str], set[str]] = defaultdict(set)
+        self._position: dict[str, int] = {}
+        self._source: list[dict] | None = None
+
+    def __len__(self) -> int:
+        return len(self._automations)
+
+    @staticmethod
+    def _key(automation: dict, position: int) -> str:
+        return str(automation.get("id") or f"#{position}")
+
+    def update(self, automations: list[dict]) -> None:
+        """Re-index the automations that were added, changed or removed since the last parse."""
+        if automations is self._source:
+            return
+        self._source = automations
+        current: dict[str, dict] = {}
+        self._position = {}
+        for position, automation in enumerate(automations):
+            key = self._key(automation, position)
+            current[key] = automation
+            self._position[key] = position
+        changed = 0
+        for key in list(self._automations):
+            if key not in current:
+                self._remove(key)
+                changed += 1
+        for key, automation in current.items():
+            digest = blake2b(json.dumps(automation, sort_keys=True, default=str).encode("utf-8"), digest_size=8).hexdigest()
+            if self._digests.get(key) == digest:
+                self._automations[key] = automation
+                continue
+            self._remove(key)
+            references = automation_references(automation)
+            self._automations[key] = automation
+            self._digests[key] = digest
+            self._references[key] = references
+            for reference in references:
+                self._by_reference[reference].add(key)
+            changed += 1
+        _LOGGER.debug(f"Automation index updated: {changed} of {len(current)} automations re-indexed")
+
+    def _remove(self, key: str) -> None:
+        self._automations.pop(key, None)
+        self._digests.pop(key, None)
+        for reference in self._references.pop(key, ()):
+            users = self._by_reference.get(reference)
+            if users is not None:
+                users.discard(key)
+                if not users:
+                    del self._by_reference[reference]
+
+    def overview(self, limit: int) -> list[str]:
+        """Return one line per automation, sorted by alias, whatever entities a request covers."""
+        lines = sorted((str(automation.get("alias") or "Unnamed Automation"), key) for key, automation in self._automations.items())
+        return [f"- {alias} (id: {key})\n" for alias, key in lines[:limit]]
+
+    def relevant(self, references: Iterable[tuple[str, str]], limit: int) -> list[dict]:
+        """Return the automations touching the most of the given references, best first."""
+        hits: Counter[str] = Counter()
+        for reference in references:
+            hits.update(self._by_reference.get(reference, ()))
+        ranked = sorted(hits, key=lambda key: (-hits[key], self._position.get(key, 0)))
+        return [self._automations[key] for key in ranked[:limit]]
+
+    def stats(self) -> dict:
+        """Return index sizes for diagnostics."""
+        kinds = Counter(kind for kind, _ in self._by_reference)
+        return {"automations": len(self._automations), **{f"{kind}_keys": count for kind, count in kinds.items()}}
@@ -0,0 +1,91 @@
+from __future__ import annotations
+import asyncio
+from dataclasses import dataclass
+import logging
+from typing import Protocol
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+CHARS_PER_TOKEN = 4
+TIKTOKEN_ENCODING = "cl100k_base"
+TIKTOKEN_LOAD_TIMEOUT = 10  # seconds; the BPE file may have to be downloaded on first use
+
+class TokenEstimator(Protocol):
+    """Something that can count the tokens of a text."""
+    name: str
+
+    def count(self, text: str) -> int:
+        """Return the number of tokens in text."""
+
+class HeuristicEstimator:
+    """Fast character-based estimate, about four characters per token."""
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+class TiktokenEstimator:
+    """BPE token count using tiktoken when it is installed."""
+    name = f"tiktoken:{TIKTOKEN_ENCODING}"
+
+    def __init__(self, encoding):
+        self._encoding = encoding
+
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+def _load_tiktoken() -> TokenEstimator | None:
+    """Load the BPE tables; may hit the disk or network, so run in the executor."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return TiktokenEstimator(tiktoken.get_encoding(TIKTOKEN_ENCODING))
+    except Exception as err:
+        _LOGGER.warning(f"tiktoken available but encoding could not be loaded: {err}")
+        return None
+
+async def async_get_estimator(hass: HomeAssistant) -> TokenEstimator:
+    """Return the best available estimator, without holding up setup when the BPE file cannot be fetched."""
+    try:
+        async with asyncio.timeout(TIKTOKEN_LOAD_TIMEOUT):
+            estimator = await hass.async_add_executor_job(_load_tiktoken)
+    except TimeoutError:
+        _LOGGER.warning(f"tiktoken encoding not loaded within {TIKTOKEN_LOAD_TIMEOUT} s, using the heuristic estimator")
+        estimator = None
+    if estimator is None:
+        estimator = HeuristicEstimator()
+    _LOGGER.debug(f"Using token estimator {estimator.name}")
+    return estimator
+
+@dataclass
+class PackResult:
+    """Blocks kept per group and the resulting token usage."""
+    groups: list[list[str]]
+    tokens: int
+    dropped: int
+
+def pack_blocks(
+    fixed: str, groups: list[list[str]], budget: int, estimator: TokenEstimator
+) -> PackResult:
+    """Pick whole blocks, highest-priority group first, until the budget is used.
+
+    ``fixed`` is the text that is always sent (system prompt, headers, closing
+    instructions). Groups are given in priority order; within a group earlier
+    blocks win. Kept blocks are returned in their original order.
+    """
+    used = estimator.count(fixed)
+    kept: list[list[str]] = []
+    dropped = 0
+    for blocks in groups:
+        selected: list[str] = []
+        for block in blocks:
+            cost = estimator.count(block)
+            if used + cost <= budget:
+                selected.append(block)
+                used += cost
+            else:
+                dropped += 1
+        kept.append(selected)
+    return PackResult(groups=kept, tokens=used, dropped=dropped)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+_MISSING = object()
+
+class LRUCache:
+    """Size-bounded mapping that evicts the least recently used entry."""
+    def __init__(self, maxsize: int):
+        """Initialize the cache."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[Hashable, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, fingerprint: Hashable = None) -> Any:
+        """Return the cached value if present and stored under the same fingerprint."""
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING or item[0] != fingerprint:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: Hashable, value: Any, fingerprint: Hashable = None) -> None:
+        """Store a value, evicting the oldest entries beyond maxsize."""
+        self._data[key] = (fingerprint, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry."""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._data.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        """Return hit/miss counters."""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
@@ -4,31 +4,85 @@ from typing import Any, Dict, Optional
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.core import callback
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.selector import SelectSelector, SelectSelectorConfig, SelectSelectorMode
 from .const import (
     DOMAIN,
+    CONF_AUTO_DEBOUNCE,
+    CONF_AUTO_INPUT_BUDGET,
+    CONF_AUTO_MODE,
+    CONF_AUTO_THRESHOLD,
+    CONF_DAILY_TOKEN_CAP,
     CONF_GROK_API_KEY,
+    CONF_GROK_ENDPOINT,
     CONF_GROK_MODEL,
     CONF_MAX_INPUT_TOKENS,
     CONF_MAX_OUTPUT_TOKENS,
+    CONF_MAX_PARALLEL_REQUESTS,
+    CONF_MAX_SHARDS,
+    CONF_PROMPT_FORMAT,
+    CONF_QUIET_HOURS_END,
+    CONF_QUIET_HOURS_START,
+    CONF_REQUESTS_PER_MINUTE,
+    CONF_RESPONSE_CACHE_TTL,
+    CONF_SHARDED_MODE,
+    CONF_STREAMING,
+    CONF_TOKENS_PER_MINUTE,
+    CONF_TRIAGE_API_KEY,
+    CONF_TRIAGE_ENDPOINT,
+    CONF_TRIAGE_MAX_INPUT_TOKENS,
+    CONF_TRIAGE_MAX_OUTPUT_TOKENS,
+    CONF_TRIAGE_MIN_ENTITIES,
+    CONF_TRIAGE_MODE,
+    CONF_TRIAGE_MODEL,
+    DEFAULT_AUTO_DEBOUNCE,
+    DEFAULT_AUTO_INPUT_BUDGET,
+    DEFAULT_AUTO_MODE,
+    DEFAULT_AUTO_THRESHOLD,
+    DEFAULT_DAILY_TOKEN_CAP,
     DEFAULT_MAX_INPUT_TOKENS,
     DEFAULT_MAX_OUTPUT_TOKENS,
     DEFAULT_MODELS,
+    DEFAULT_MAX_PARALLEL_REQUESTS,
+    DEFAULT_MAX_SHARDS,
+    DEFAULT_PROMPT_FORMAT,
+    DEFAULT_QUIET_HOURS,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    DEFAULT_RESPONSE_CACHE_TTL,
+    DEFAULT_SHARDED_MODE,
+    DEFAULT_STREAMING,
+    DEFAULT_TOKENS_PER_MINUTE,
+    DEFAULT_TRIAGE_ENDPOINT,
+    DEFAULT_TRIAGE_MAX_INPUT_TOKENS,
+    DEFAULT_TRIAGE_MAX_OUTPUT_TOKENS,
+    DEFAULT_TRIAGE_MIN_ENTITIES,
+    DEFAULT_TRIAGE_MODE,
+    DEFAULT_TRIAGE_MODEL,
+    ENDPOINT_GROK,
+    PROMPT_FORMATS,
 )
+from .model_catalog import async_get_model_catalog
+from .scheduler import ApiError
 
 _LOGGER = logging.getLogger(__name__)
+QUIET_HOURS_SCHEMA = vol.Match(r"^$|^([01]\d|2[0-3]):[0-5]\d$")
 
 class ProviderValidator:
     """Validator for Grok API key."""
     def __init__(self, hass):
-        self.session = async_get_clientsession(hass)
+        """Initialize the validator."""
+        self.hass = hass
 
     async def validate_grok(self, api_key: str) -> Optional[str]:
-        """Validate the Grok API key by making a test request."""
-        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        """Validate the Grok API key by listing its models.
+
+        The list is kept in the model catalog, so a key validated within
+        MODEL_CATALOG_TTL is not sent to the provider again.
+        """
         try:
-            resp = await self.session.get("https://api.x.ai/v1/models", headers=headers)
-            return None if resp.status == 200 else await resp.text()
+            await async_get_model_catalog(self.hass, api_key).async_get()
+            return None
+        except ApiError as err:
+            return err.text
         except Exception as err:
             return str(err)
 
@@ -94,23 +148,91 @@ class GrokAutomationOptionsFlowHandler(config_entries.OptionsFlow):
         """Initialize the options flow."""
         self._config_entry = config_entry
 
+    def _current(self, key: str, default=None):
+        """Return the current value of a setting, options taking precedence over data."""
+        return self._config_entry.options.get(key, self._config_entry.data.get(key, default))
+
+    async def _model_selector(self):
+        """Return a dropdown of the cached models, or a text field when none are known.
+
+        The catalog is only refreshed once its TTL has expired, so opening the
+        form does not call the provider each time; other models can still be typed.
+        """
+        catalog = async_get_model_catalog(
+            self.hass, self._current(CONF_GROK_API_KEY, ""), self._current(CONF_GROK_ENDPOINT, ENDPOINT_GROK)
+        )
+        try:
+            models = await catalog.async_get()
+        except Exception as err:
+            _LOGGER.debug(f"Model list unavailable, showing a text field: {err}")
+            models = catalog.models
+        if not models:
+            return str
+        return SelectSelector(SelectSelectorConfig(options=models, custom_value=True, mode=SelectSelectorMode.DROPDOWN))
+
     async def async_step_init(self, user_input=None):
         """Handle the options configuration step."""
         if user_input:
             # Update options with new user input
             new_data = {
-                CONF_GROK_API_KEY: user_input.get(CONF_GROK_API_KEY, self._config_entry.data.get(CONF_GROK_API_KEY)),
-                CONF_GROK_MODEL: user_input.get(CONF_GROK_MODEL, self._config_entry.data.get(CONF_GROK_MODEL, DEFAULT_MODELS["Grok"])),
-                CONF_MAX_INPUT_TOKENS: user_input.get(CONF_MAX_INPUT_TOKENS, self._config_entry.data.get(CONF_MAX_INPUT_TOKENS, DEFAULT_MAX_INPUT_TOKENS)),
-                CONF_MAX_OUTPUT_TOKENS: user_input.get(CONF_MAX_OUTPUT_TOKENS, self._config_entry.data.get(CONF_MAX_OUTPUT_TOKENS, DEFAULT_MAX_OUTPUT_TOKENS)),
+                CONF_GROK_API_KEY: user_input.get(CONF_GROK_API_KEY, self._current(CONF_GROK_API_KEY)),
+                CONF_GROK_MODEL: user_input.get(CONF_GROK_MODEL, self._current(CONF_GROK_MODEL, DEFAULT_MODELS["Grok"])),
+                CONF_MAX_INPUT_TOKENS: user_input.get(CONF_MAX_INPUT_TOKENS, self._current(CONF_MAX_INPUT_TOKENS, DEFAULT_MAX_INPUT_TOKENS)),
+                CONF_MAX_OUTPUT_TOKENS: user_input.get(CONF_MAX_OUTPUT_TOKENS, self._current(CONF_MAX_OUTPUT_TOKENS, DEFAULT_MAX_OUTPUT_TOKENS)),
+                CONF_PROMPT_FORMAT: user_input.get(CONF_PROMPT_FORMAT, self._current(CONF_PROMPT_FORMAT, DEFAULT_PROMPT_FORMAT)),
+                CONF_RESPONSE_CACHE_TTL: user_input.get(CONF_RESPONSE_CACHE_TTL, self._current(CONF_RESPONSE_CACHE_TTL, DEFAULT_RESPONSE_CACHE_TTL)),
+                CONF_SHARDED_MODE: user_input.get(CONF_SHARDED_MODE, self._current(CONF_SHARDED_MODE, DEFAULT_SHARDED_MODE)),
+                CONF_MAX_PARALLEL_REQUESTS: user_input.get(CONF_MAX_PARALLEL_REQUESTS, self._current(CONF_MAX_PARALLEL_REQUESTS, DEFAULT_MAX_PARALLEL_REQUESTS)),
+                CONF_MAX_SHARDS: user_input.get(CONF_MAX_SHARDS, self._current(CONF_MAX_SHARDS, DEFAULT_MAX_SHARDS)),
+                CONF_STREAMING: user_input.get(CONF_STREAMING, self._current(CONF_STREAMING, DEFAULT_STREAMING)),
+                CONF_GROK_ENDPOINT: user_input.get(CONF_GROK_ENDPOINT, self._current(CONF_GROK_ENDPOINT, ENDPOINT_GROK)),
+                CONF_REQUESTS_PER_MINUTE: user_input.get(CONF_REQUESTS_PER_MINUTE, self._current(CONF_REQUESTS_PER_MINUTE, DEFAULT_REQUESTS_PER_MINUTE)),
+                CONF_TOKENS_PER_MINUTE: user_input.get(CONF_TOKENS_PER_MINUTE, self._current(CONF_TOKENS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE)),
+                CONF_AUTO_MODE: user_input.get(CONF_AUTO_MODE, self._current(CONF_AUTO_MODE, DEFAULT_AUTO_MODE)),
+                CONF_AUTO_THRESHOLD: user_input.get(CONF_AUTO_THRESHOLD, self._current(CONF_AUTO_THRESHOLD, DEFAULT_AUTO_THRESHOLD)),
+                CONF_AUTO_DEBOUNCE: user_input.get(CONF_AUTO_DEBOUNCE, self._current(CONF_AUTO_DEBOUNCE, DEFAULT_AUTO_DEBOUNCE)),
+                CONF_QUIET_HOURS_START: user_input.get(CONF_QUIET_HOURS_START, self._current(CONF_QUIET_HOURS_START, DEFAULT_QUIET_HOURS)),
+                CONF_QUIET_HOURS_END: user_input.get(CONF_QUIET_HOURS_END, self._current(CONF_QUIET_HOURS_END, DEFAULT_QUIET_HOURS)),
+                CONF_DAILY_TOKEN_CAP: user_input.get(CONF_DAILY_TOKEN_CAP, self._current(CONF_DAILY_TOKEN_CAP, DEFAULT_DAILY_TOKEN_CAP)),
+                CONF_TRIAGE_MODE: user_input.get(CONF_TRIAGE_MODE, self._current(CONF_TRIAGE_MODE, DEFAULT_TRIAGE_MODE)),
+                CONF_TRIAGE_MODEL: user_input.get(CONF_TRIAGE_MODEL, self._current(CONF_TRIAGE_MODEL, DEFAULT_TRIAGE_MODEL)),
+                CONF_TRIAGE_ENDPOINT: user_input.get(CONF_TRIAGE_ENDPOINT, self._current(CONF_TRIAGE_ENDPOINT, DEFAULT_TRIAGE_ENDPOINT)),
+                CONF_TRIAGE_API_KEY: user_input.get(CONF_TRIAGE_API_KEY, self._current(CONF_TRIAGE_API_KEY, "")),
+                CONF_TRIAGE_MAX_INPUT_TOKENS: user_input.get(CONF_TRIAGE_MAX_INPUT_TOKENS, self._current(CONF_TRIAGE_MAX_INPUT_TOKENS, DEFAULT_TRIAGE_MAX_INPUT_TOKENS)),
+                CONF_TRIAGE_MAX_OUTPUT_TOKENS: user_input.get(CONF_TRIAGE_MAX_OUTPUT_TOKENS, self._current(CONF_TRIAGE_MAX_OUTPUT_TOKENS, DEFAULT_TRIAGE_MAX_OUTPUT_TOKENS)),
+                CONF_TRIAGE_MIN_ENTITIES: user_input.get(CONF_TRIAGE_MIN_ENTITIES, self._current(CONF_TRIAGE_MIN_ENTITIES, DEFAULT_TRIAGE_MIN_ENTITIES)),
+                CONF_AUTO_INPUT_BUDGET: user_input.get(CONF_AUTO_INPUT_BUDGET, self._current(CONF_AUTO_INPUT_BUDGET, DEFAULT_AUTO_INPUT_BUDGET)),
             }
             return self.async_create_entry(title="", data=new_data)
 
         # Show the options form
         schema = {
-            vol.Optional(CONF_GROK_API_KEY, default=self._config_entry.data.get(CONF_GROK_API_KEY, "")): str,
-            vol.Optional(CONF_GROK_MODEL, default=self._config_entry.data.get(CONF_GROK_MODEL, DEFAULT_MODELS["Grok"])): str,
-            vol.Optional(CONF_MAX_INPUT_TOKENS, default=self._config_entry.data.get(CONF_MAX_INPUT_TOKENS, DEFAULT_MAX_INPUT_TOKENS)): vol.All(vol.Coerce(int), vol.Range(min=100)),
-            vol.Optional(CONF_MAX_OUTPUT_TOKENS, default=self._config_entry.data.get(CONF_MAX_OUTPUT_TOKENS, DEFAULT_MAX_OUTPUT_TOKENS)): vol.All(vol.Coerce(int), vol.Range(min=100)),
+            vol.Optional(CONF_GROK_API_KEY, default=self._current(CONF_GROK_API_KEY, "")): str,
+            vol.Optional(CONF_GROK_MODEL, default=self._current(CONF_GROK_MODEL, DEFAULT_MODELS["Grok"])): await self._model_selector(),
+            vol.Optional(CONF_MAX_INPUT_TOKENS, default=self._current(CONF_MAX_INPUT_TOKENS, DEFAULT_MAX_INPUT_TOKENS)): vol.All(vol.Coerce(int), vol.Range(min=100)),
+            vol.Optional(CONF_AUTO_INPUT_BUDGET, default=self._current(CONF_AUTO_INPUT_BUDGET, DEFAULT_AUTO_INPUT_BUDGET)): bool,
+            vol.Optional(CONF_MAX_OUTPUT_TOKENS, default=self._current(CONF_MAX_OUTPUT_TOKENS, DEFAULT_MAX_OUTPUT_TOKENS)): vol.All(vol.Coerce(int), vol.Range(min=100)),
+            vol.Optional(CONF_PROMPT_FORMAT, default=self._current(CONF_PROMPT_FORMAT, DEFAULT_PROMPT_FORMAT)): vol.In(PROMPT_FORMATS),
+            vol.Optional(CONF_RESPONSE_CACHE_TTL, default=self._current(CONF_RESPONSE_CACHE_TTL, DEFAULT_RESPONSE_CACHE_TTL)): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional(CONF_SHARDED_MODE, default=self._current(CONF_SHARDED_MODE, DEFAULT_SHARDED_MODE)): bool,
+            vol.Optional(CONF_MAX_PARALLEL_REQUESTS, default=self._current(CONF_MAX_PARALLEL_REQUESTS, DEFAULT_MAX_PARALLEL_REQUESTS)): vol.All(vol.Coerce(int), vol.Range(min=1, max=10)),
+            vol.Optional(CONF_MAX_SHARDS, default=self._current(CONF_MAX_SHARDS, DEFAULT_MAX_SHARDS)): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(CONF_STREAMING, default=self._current(CONF_STREAMING, DEFAULT_STREAMING)): bool,
+            vol.Optional(CONF_GROK_ENDPOINT, default=self._current(CONF_GROK_ENDPOINT, ENDPOINT_GROK)): str,
+            vol.Optional(CONF_REQUESTS_PER_MINUTE, default=self._current(CONF_REQUESTS_PER_MINUTE, DEFAULT_REQUESTS_PER_MINUTE)): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(CONF_TOKENS_PER_MINUTE, default=self._current(CONF_TOKENS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE)): vol.All(vol.Coerce(int), vol.Range(min=100)),
+            vol.Optional(CONF_AUTO_MODE, default=self._current(CONF_AUTO_MODE, DEFAULT_AUTO_MODE)): bool,
+            vol.Optional(CONF_AUTO_THRESHOLD, default=self._current(CONF_AUTO_THRESHOLD, DEFAULT_AUTO_THRESHOLD)): vol.All(vol.Coerce(float), vol.Range(min=0.5)),
+            vol.Optional(CONF_AUTO_DEBOUNCE, default=self._current(CONF_AUTO_DEBOUNCE, DEFAULT_AUTO_DEBOUNCE)): vol.All(vol.Coerce(int), vol.Range(min=5)),
+            vol.Optional(CONF_QUIET_HOURS_START, default=self._current(CONF_QUIET_HOURS_START, DEFAULT_QUIET_HOURS)): QUIET_HOURS_SCHEMA,
+            vol.Optional(CONF_QUIET_HOURS_END, default=self._current(CONF_QUIET_HOURS_END, DEFAULT_QUIET_HOURS)): QUIET_HOURS_SCHEMA,
+            vol.Optional(CONF_DAILY_TOKEN_CAP, default=self._current(CONF_DAILY_TOKEN_CAP, DEFAULT_DAILY_TOKEN_CAP)): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional(CONF_TRIAGE_MODE, default=self._current(CONF_TRIAGE_MODE, DEFAULT_TRIAGE_MODE)): bool,
+            vol.Optional(CONF_TRIAGE_MODEL, default=self._current(CONF_TRIAGE_MODEL, DEFAULT_TRIAGE_MODEL)): str,
+            vol.Optional(CONF_TRIAGE_ENDPOINT, default=self._current(CONF_TRIAGE_ENDPOINT, DEFAULT_TRIAGE_ENDPOINT)): str,
+            vol.Optional(CONF_TRIAGE_API_KEY, default=self._current(CONF_TRIAGE_API_KEY, "")): str,
+            vol.Optional(CONF_TRIAGE_MAX_INPUT_TOKENS, default=self._current(CONF_TRIAGE_MAX_INPUT_TOKENS, DEFAULT_TRIAGE_MAX_INPUT_TOKENS)): vol.All(vol.Coerce(int), vol.Range(min=500)),
+            vol.Optional(CONF_TRIAGE_MAX_OUTPUT_TOKENS, default=self._current(CONF_TRIAGE_MAX_OUTPUT_TOKENS, DEFAULT_TRIAGE_MAX_OUTPUT_TOKENS)): vol.All(vol.Coerce(int), vol.Range(min=100)),
+            vol.Optional(CONF_TRIAGE_MIN_ENTITIES, default=self._current(CONF_TRIAGE_MIN_ENTITIES, DEFAULT_TRIAGE_MIN_ENTITIES)): vol.All(vol.Coerce(int), vol.Range(min=1)),
         }
         return self.async_show_form(step_id="init", data_schema=vol.Schema(schema))
@@ -12,10 +12,177 @@ DEFAULT_MAX_INPUT_TOKENS = 1000  # Increased from 500
 DEFAULT_MAX_OUTPUT_TOKENS = 1000
 DEFAULT_TEMPERATURE = 0.7
 
+# Prompt entity encoding
+CONF_PROMPT_FORMAT = "prompt_format"
+PROMPT_FORMAT_VERBOSE = "verbose"
+PROMPT_FORMAT_COMPACT = "compact"
+PROMPT_FORMATS = [PROMPT_FORMAT_VERBOSE, PROMPT_FORMAT_COMPACT]
+DEFAULT_PROMPT_FORMAT = PROMPT_FORMAT_VERBOSE
+COMPACT_MAX_VALUE = 40  # characters kept per attribute value in compact rows
+# Attributes never sent in compact mode (noise, or already in the name column)
+ATTRIBUTE_DENYLIST = {
+    "friendly_name",
+    "entity_picture",
+    "entity_picture_local",
+    "icon",
+    "supported_features",
+    "attribution",
+    "assumed_state",
+    "editable",
+    "id",
+    "restored",
+    "entity_id",
+    "device_id",
+    "last_reset",
+}
+# When a domain is listed, only these attributes are sent for its entities
+DOMAIN_ATTRIBUTE_ALLOWLIST = {
+    "light": ["brightness", "color_mode", "color_temp_kelvin", "effect"],
+    "climate": ["hvac_action", "temperature", "current_temperature", "preset_mode", "hvac_modes"],
+    "cover": ["device_class", "current_position"],
+    "sensor": ["device_class", "unit_of_measurement", "state_class"],
+    "binary_sensor": ["device_class"],
+    "media_player": ["device_class", "source", "media_content_type", "volume_level"],
+    "fan": ["percentage", "preset_mode"],
+    "person": ["source"],
+}
+# Extra attributes dropped for some domains on top of ATTRIBUTE_DENYLIST
+DOMAIN_ATTRIBUTE_DENYLIST = {
+    "sun": ["next_dawn", "next_dusk", "next_midnight", "next_noon", "next_rising", "next_setting", "azimuth"],
+    "weather": ["forecast"],
+    "update": ["release_summary", "release_url", "in_progress", "skipped_version"],
+}
+
+# Prompt fragment cache
+FRAGMENT_CACHE_SIZE = 2048
+
+# Sharded generation
+CONF_SHARDED_MODE = "sharded_mode"
+CONF_MAX_PARALLEL_REQUESTS = "max_parallel_requests"
+CONF_MAX_SHARDS = "max_shards"
+DEFAULT_SHARDED_MODE = False
+DEFAULT_MAX_PARALLEL_REQUESTS = 3
+DEFAULT_MAX_SHARDS = 10
+
+# Streaming
+CONF_STREAMING = "streaming"
+DEFAULT_STREAMING = False
+STREAM_UPDATE_INTERVAL = 1.0  # seconds between sensor/notification refreshes while streaming
+
+# Tiered generation: a cheap model shortlists ideas, the configured model writes the YAML
+CONF_TRIAGE_MODE = "triage_mode"
+CONF_TRIAGE_MODEL = "triage_model"
+CONF_TRIAGE_ENDPOINT = "triage_endpoint"
+CONF_TRIAGE_API_KEY = "triage_api_key"
+CONF_TRIAGE_MAX_INPUT_TOKENS = "triage_max_input_tokens"
+CONF_TRIAGE_MAX_OUTPUT_TOKENS = "triage_max_output_tokens"
+CONF_TRIAGE_MIN_ENTITIES = "triage_min_entities"
+DEFAULT_TRIAGE_MODE = False
+DEFAULT_TRIAGE_MODEL = "grok-3-mini"
+DEFAULT_TRIAGE_ENDPOINT = ""  # empty uses the main endpoint and API key
+DEFAULT_TRIAGE_MAX_INPUT_TOKENS = 16000
+DEFAULT_TRIAGE_MAX_OUTPUT_TOKENS = 800
+DEFAULT_TRIAGE_MIN_ENTITIES = 40  # below this a single call is cheaper than two
+TRIAGE_MAX_IDEAS = 8
+TIER_TRIAGE = "triage"
+TIER_PREMIUM = "premium"
+
+# Adaptive background runs
+CONF_AUTO_MODE = "auto_mode"
+CONF_AUTO_THRESHOLD = "auto_threshold"
+CONF_AUTO_DEBOUNCE = "auto_debounce"
+CONF_QUIET_HOURS_START = "quiet_hours_start"
+CONF_QUIET_HOURS_END = "quiet_hours_end"
+CONF_DAILY_TOKEN_CAP = "daily_token_cap"
+DEFAULT_AUTO_MODE = False
+DEFAULT_AUTO_THRESHOLD = 10.0  # weighted new/changed entities that trigger a run
+DEFAULT_AUTO_DEBOUNCE = 120  # seconds of calm before a burst is processed
+DEFAULT_QUIET_HOURS = ""  # "HH:MM", empty disables quiet hours
+DEFAULT_DAILY_TOKEN_CAP = 50000  # 0 disables the cap
+AUTO_NEW_ENTITY_WEIGHT = 1.0
+AUTO_CHANGED_ENTITY_WEIGHT = 0.5
+AUTO_MAX_DEBOUNCE_FACTOR = 5  # a busy house is still evaluated after debounce x factor
+
+# Model catalog (the provider's /models list, shared per API key)
+DATA_MODEL_CATALOGS = f"{DOMAIN}_model_catalogs"
+MODEL_CATALOG_TTL = 86400  # seconds before the list is fetched again
+CONF_AUTO_INPUT_BUDGET = "auto_input_budget"
+DEFAULT_AUTO_INPUT_BUDGET = False
+AUTO_INPUT_BUDGET_SHARE = 0.1  # share of the context window used as input budget in auto mode
+# Context window in tokens, matched by model-name prefix (longest first) when the provider does not report it
+MODEL_CONTEXT_WINDOWS = {
+    "grok-4": 256000,
+    "grok-3-mini": 131072,
+    "grok-3": 131072,
+    "grok-2-vision": 32768,
+    "grok-2": 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 32768
+
+# Request scheduler (shared per API key)
+DATA_SCHEDULERS = f"{DOMAIN}_schedulers"
+CONF_REQUESTS_PER_MINUTE = "requests_per_minute"
+CONF_TOKENS_PER_MINUTE = "tokens_per_minute"
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 100000
+SCHEDULER_MAX_ATTEMPTS = 3
+SCHEDULER_BASE_DELAY = 1.0  # seconds, doubled on each retry
+SCHEDULER_MAX_DELAY = 30.0  # longest wait before a retry, including Retry-After
+SCHEDULER_FAILURE_THRESHOLD = 5  # consecutive failures that open the circuit
+SCHEDULER_RESET_TIMEOUT = 60.0  # seconds the circuit stays open
+
+# Response cache
+CONF_RESPONSE_CACHE_TTL = "response_cache_ttl"
+DEFAULT_RESPONSE_CACHE_TTL = 86400  # seconds, 0 disables the cache
+RESPONSE_CACHE_MAX_ENTRIES = 50
+RESPONSE_CACHE_MAX_BYTES = 2_000_000
+
+# Suggestion fingerprint index
+SUGGESTION_INDEX_MAX_ENTRIES = 1000
+SUGGESTION_COVERAGE_LIMIT = 2  # automations referencing an entity before it is deprioritized
+
+# Entity ranking
+ACTIVITY_HALF_LIFE = 6 * 3600  # seconds for a state change to lose half its weight
+
+# Suggestion history
+HISTORY_DIR = "grok_suggestions"
+HISTORY_MAX_BYTES = 5_000_000
+HISTORY_MAX_AGE_DAYS = 90
+HISTORY_MEMORY_WINDOW = 20
+SERVICE_GET_HISTORY = "get_suggestion_history"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_ENTITY_ID = "entity_id"
+ATTR_LIMIT = "limit"
+ATTR_OFFSET = "offset"
+WS_TYPE_SUGGESTIONS = f"{DOMAIN}/suggestions"
+
+# On-demand profiling
+SERVICE_PROFILE_RUN = "profile_run"
+ATTR_BLOCK_THRESHOLD_MS = "block_threshold_ms"
+ATTR_TOP = "top"
+DEFAULT_BLOCK_THRESHOLD_MS = 50
+DEFAULT_PROFILE_TOP = 20
+PROFILE_STACK_DEPTH = 8  # frames kept per event-loop blocking span
+PROFILE_MAX_SPANS = 50  # longest blocking spans kept in the report
+
+# Run metrics
+METRICS_WINDOW = 100  # runs kept per phase for the rolling p50/p95
+# USD per million (input, output) tokens, matched by model-name prefix (longest first)
+MODEL_PRICES = {
+    "grok-4": (3.0, 15.0),
+    "grok-3-mini": (0.3, 0.5),
+    "grok-3": (3.0, 15.0),
+    "grok-2": (2.0, 10.0),
+}
+DEFAULT_MODEL_PRICE = (3.0, 15.0)
+CACHED_INPUT_PRICE_FACTOR = 0.25  # prompt tokens served from the provider's prefix cache
+
 # Grok-specific keys
 CONF_GROK_API_KEY = "grok_api_key"
 CONF_GROK_MODEL = "grok-3-latest"
 ENDPOINT_GROK = "https://api.x.ai/v1/chat/completions"
+CONF_GROK_ENDPOINT = "grok_endpoint"
 DEFAULT_MODELS = {
     "Grok": "grok-3-latest"
 }
@@ -23,6 +190,19 @@ DEFAULT_MODELS = {
 # Service & attribute names
 ATTR_CUSTOM_PROMPT = "custom_prompt"
 SERVICE_GENERATE_SUGGESTIONS = "generate_suggestions"
+ATTR_ALL_ENTITIES = "all_entities"
+ATTR_SCAN_MODE = "scan_mode"
+ATTR_BYPASS_CACHE = "bypass_cache"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_WAIT = "wait"
+SERVICE_GET_JOB = "get_job"
+ATTR_JOB_ID = "job_id"
+
+# Entity scan modes
+SCAN_MODE_NEW = "new"
+SCAN_MODE_CHANGED = "changed"
+SCAN_MODE_ALL = "all"
+SCAN_MODES = [SCAN_MODE_NEW, SCAN_MODE_CHANGED, SCAN_MODE_ALL]
 
 # Provider-status sensor values
 PROVIDER_STATUS_CONNECTED = "connected"
@@ -1,32 +1,87 @@
 from __future__ import annotations
+import asyncio
+from collections.abc import Callable
 from datetime import datetime
+from itertools import groupby
 import logging
-import random
 import re
-from pathlib import Path
-import yaml
-import anyio
+import time
 from homeassistant.components import persistent_notification
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import area_registry as ar, device_registry as dr, entity_registry as er
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from .adaptive import AdaptiveScheduler
+from .budget import PackResult, TokenEstimator, pack_blocks
+from .history import SuggestionHistory
+from .jobs import SuggestionJob, SuggestionJobQueue, SuggestionRequest
+from .metrics import RunMetrics
+from .model_catalog import ModelCatalog, async_get_model_catalog
+from .prompt_format import COMPACT_LEGEND, compact_attributes, compact_header, compact_row
+from .ranking import ActivityRanker
+from .routing import TRIAGE_PROMPT, ModelTier, is_xai_endpoint, parse_triage_response, render_ideas
+from .fingerprints import EntityFingerprintStore, entity_fingerprint
+from .response_cache import ResponseCache, response_cache_key
+from .scheduler import ApiError, async_get_scheduler, parse_retry_after
+from .shared import GrokDomainData
+from .streaming import YamlBlockExtractor, iter_sse_events
+from .suggestion_index import SuggestionIndex
+from .tracker import EntityDelta
 from .const import (
     DOMAIN,
+    AUTO_INPUT_BUDGET_SHARE,
+    CONF_AUTO_INPUT_BUDGET,
+    DEFAULT_AUTO_INPUT_BUDGET,
     CONF_GROK_API_KEY,
+    CONF_GROK_ENDPOINT,
     CONF_GROK_MODEL,
     ENDPOINT_GROK,
     CONF_MAX_INPUT_TOKENS,
     CONF_MAX_OUTPUT_TOKENS,
+    CONF_MAX_PARALLEL_REQUESTS,
+    CONF_MAX_SHARDS,
+    CONF_PROMPT_FORMAT,
+    CONF_REQUESTS_PER_MINUTE,
+    CONF_RESPONSE_CACHE_TTL,
+    CONF_SHARDED_MODE,
+    CONF_STREAMING,
+    CONF_TOKENS_PER_MINUTE,
+    CONF_TRIAGE_API_KEY,
+    CONF_TRIAGE_ENDPOINT,
+    CONF_TRIAGE_MAX_INPUT_TOKENS,
+    CONF_TRIAGE_MAX_OUTPUT_TOKENS,
+    CONF_TRIAGE_MIN_ENTITIES,
+    CONF_TRIAGE_MODE,
+    CONF_TRIAGE_MODEL,
     DEFAULT_MAX_INPUT_TOKENS,
     DEFAULT_MAX_OUTPUT_TOKENS,
     DEFAULT_TEMPERATURE,
     DEFAULT_MODELS,
+    DEFAULT_MAX_PARALLEL_REQUESTS,
+    DEFAULT_MAX_SHARDS,
+    DEFAULT_PROMPT_FORMAT,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    DEFAULT_RESPONSE_CACHE_TTL,
+    DEFAULT_SHARDED_MODE,
+    DEFAULT_STREAMING,
+    DEFAULT_TOKENS_PER_MINUTE,
+    DEFAULT_TRIAGE_ENDPOINT,
+    DEFAULT_TRIAGE_MAX_INPUT_TOKENS,
+    DEFAULT_TRIAGE_MAX_OUTPUT_TOKENS,
+    DEFAULT_TRIAGE_MIN_ENTITIES,
+    DEFAULT_TRIAGE_MODE,
+    DEFAULT_TRIAGE_MODEL,
+    PROMPT_FORMAT_COMPACT,
+    SCAN_MODE_ALL,
+    SCAN_MODE_CHANGED,
+    TIER_PREMIUM,
+    TIER_TRIAGE,
     SENSOR_KEY_STATUS,
     SENSOR_KEY_INPUT_TOKENS,
     SENSOR_KEY_OUTPUT_TOKENS,
     SENSOR_KEY_MODEL,
     SENSOR_KEY_LAST_ERROR,
+    STREAM_UPDATE_INTERVAL,
     PROVIDER_STATUS_CONNECTED,
     PROVIDER_STATUS_DISCONNECTED,
     PROVIDER_STATUS_ERROR,
@@ -35,18 +90,43 @@ from .const import (
 
 _LOGGER = logging.getLogger(__name__)
 YAML_RE = re.compile(r"```yaml\s*([\s\S]+?)\s*```", flags=re.IGNORECASE)
+MAX_ATTR = 200
+MAX_AUTOM = 20  # relevant automations offered to the packer, which keeps what fits
+MAX_OVERVIEW = 50  # automations listed in the entity-independent overview
+OVERVIEW_SHARE = 0.1  # input budget the automation overview may use
+AUTOMATION_CONTEXT_SHARE = 0.25  # input budget kept for automations when planning shards
+TRIAGE_HEADER_SHARE = 0.1  # triage input budget kept for the table headers
 SYSTEM_PROMPT = """Salut, je suis Grok, créé par xAI ! 😎 Je génère des automatisations Home Assistant basées sur tes entités, avec une touche d'humour. Analyse les entités fournies, propose des automatisations YAML en utilisant les vrais entity_ids, et adapte-toi à tout thème précisé. Go ! 🚀"""
 
+def _cached_tokens(usage: dict) -> int:
+    """Return the prompt tokens the provider served from its prefix cache."""
+    return (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+
 class GrokAutomationCoordinator(DataUpdateCoordinator):
     """Coordinator for Grok Automation Suggester."""
-    def __init__(self, hass: HomeAssistant, entry):
-        """Initialize the coordinator."""
+    def __init__(self, hass: HomeAssistant, entry, shared: GrokDomainData):
+        """Initialize the coordinator on top of the indexes shared by all entries."""
         self.hass = hass
         self.entry = entry
-        self.previous_entities: dict[str, dict] = {}
+        self.shared = shared
+        self.tracker = shared.tracker
+        self.fingerprints = EntityFingerprintStore(hass, entry.entry_id)
+        self.area_index = shared.area_index
+        self.fragment_cache = shared.fragment_cache
+        self.automations = shared.automations
+        self.automation_index = shared.automation_index
+        self.last_pack: PackResult | None = None
+        self.response_cache = ResponseCache(
+            hass, entry.entry_id, self._opt(CONF_RESPONSE_CACHE_TTL, DEFAULT_RESPONSE_CACHE_TTL)
+        )
+        self.jobs = SuggestionJobQueue(hass, entry, self.async_run_job)
+        self.history = SuggestionHistory(hass, entry.entry_id)
+        self.metrics = RunMetrics(hass, entry.entry_id)
+        self.suggestion_index = SuggestionIndex(hass, entry.entry_id)
+        self.ranker = ActivityRanker(hass, shared.activity, self.area_index, self.suggestion_index)
+        self.adaptive = AdaptiveScheduler(self)
         self.last_update: datetime | None = None
         self.SYSTEM_PROMPT = SYSTEM_PROMPT
-        self.scan_all = False
         self.selected_domains: list[str] = []
         self.entity_limit = 20
         self.automation_read_file = True
@@ -61,110 +141,254 @@ class GrokAutomationCoordinator(DataUpdateCoordinator):
             "entities_processed": [],
             "provider": "Grok",
             "last_error": "",
+            "from_cache": False,
+            "streaming": False,
+            "job_id": None,
+            "duplicates_filtered": 0,
             SENSOR_KEY_STATUS: PROVIDER_STATUS_INITIALIZING,
             SENSOR_KEY_INPUT_TOKENS: 0,
+            "cached_tokens": 0,
             SENSOR_KEY_OUTPUT_TOKENS: 0,
             SENSOR_KEY_MODEL: "",
         }
-        self.device_registry: dr.DeviceRegistry | None = None
-        self.entity_registry: er.EntityRegistry | None = None
-        self.area_registry: ar.AreaRegistry | None = None
 
     def _opt(self, key: str, default=None):
         """Get configuration option or default value."""
         return self.entry.options.get(key, self.entry.data.get(key, default))
 
+    @property
+    def estimator(self) -> TokenEstimator:
+        """Return the shared token estimator."""
+        return self.shared.estimator
+
+    @property
+    def model_catalog(self) -> ModelCatalog:
+        """Return the cached model list of the configured API key and endpoint."""
+        return async_get_model_catalog(
+            self.hass, self._opt(CONF_GROK_API_KEY) or "", self._opt(CONF_GROK_ENDPOINT, ENDPOINT_GROK)
+        )
+
     def _budgets(self) -> tuple[int, int]:
-        """Get input and output token budgets."""
+        """Get input and output token budgets, bounded by the model's context window."""
         out_budget = self._opt(CONF_MAX_OUTPUT_TOKENS, DEFAULT_MAX_OUTPUT_TOKENS)
         in_budget = self._opt(CONF_MAX_INPUT_TOKENS, DEFAULT_MAX_INPUT_TOKENS)
-        return in_budget, out_budget
+        window = self.model_catalog.context_window(self._opt(CONF_GROK_MODEL, DEFAULT_MODELS["Grok"]))
+        if self._opt(CONF_AUTO_INPUT_BUDGET, DEFAULT_AUTO_INPUT_BUDGET):
+            in_budget = int(window * AUTO_INPUT_BUDGET_SHARE)
+        # Prompt and completion share the window; a larger budget only ends in a 400.
+        return min(in_budget, window - out_budget), out_budget
+
+    def _tiers(self) -> tuple[ModelTier, ModelTier]:
+        """Return the triage and premium tiers from the current options."""
+        in_budget, out_budget = self._budgets()
+        api_key = self._opt(CONF_GROK_API_KEY)
+        endpoint = self._opt(CONF_GROK_ENDPOINT, ENDPOINT_GROK)
+        premium = ModelTier(TIER_PREMIUM, self._opt(CONF_GROK_MODEL, DEFAULT_MODELS["Grok"]), endpoint, api_key, in_budget, out_budget)
+        triage_endpoint = self._opt(CONF_TRIAGE_ENDPOINT, DEFAULT_TRIAGE_ENDPOINT) or endpoint
+        # The xAI key is never sent to another (e.g. self-hosted) endpoint.
+        triage_key = self._opt(CONF_TRIAGE_API_KEY, "") or (api_key if triage_endpoint == endpoint else "")
+        triage_model = self._opt(CONF_TRIAGE_MODEL, DEFAULT_TRIAGE_MODEL)
+        triage_out = self._opt(CONF_TRIAGE_MAX_OUTPUT_TOKENS, DEFAULT_TRIAGE_MAX_OUTPUT_TOKENS)
+        triage = ModelTier(
+            TIER_TRIAGE,
+            triage_model,
+            triage_endpoint,
+            triage_key,
+            min(
+                self._opt(CONF_TRIAGE_MAX_INPUT_TOKENS, DEFAULT_TRIAGE_MAX_INPUT_TOKENS),
+                async_get_model_catalog(self.hass, triage_key, triage_endpoint).context_window(triage_model) - triage_out,
+            ),
+            triage_out,
+            priced=triage_endpoint == endpoint or is_xai_endpoint(triage_endpoint),
+        )
+        return triage, premium
+
+    async def async_setup(self) -> None:
+        """Start tracking entity changes for this entry."""
+        await self.metrics.async_load()
+        await self.model_catalog.async_load()
+        self.tracker.async_add_consumer(self.entry.entry_id)
+        self.adaptive.async_start()
+        self.entry.async_create_background_task(self.hass, self._async_check_model(), f"{DOMAIN} model check")
 
-    async def async_added_to_hass(self):
-        """Handle coordinator added to Home Assistant."""
-        await super().async_added_to_hass()
-        self.device_registry = dr.async_get(self.hass)
-        self.entity_registry = er.async_get(self.hass)
-        self.area_registry = ar.async_get(self.hass)
+    async def _async_check_model(self) -> None:
+        """Warn when the configured model is not offered by the endpoint.
+
+        The list comes from the shared catalog, so the provider is only called
+        when it is older than MODEL_CATALOG_TTL, not once per entry or restart.
+        """
+        model = self._opt(CONF_GROK_MODEL, DEFAULT_MODELS["Grok"])
+        try:
+            models = await self.model_catalog.async_get()
+        except Exception as err:
+            _LOGGER.debug(f"Model list unavailable, not checking {model}: {err}")
+            return
+        if models and model not in models:
+            _LOGGER.warning(f"Model {model} is not listed by {self.model_catalog.url}; available: {', '.join(models)}")
 
     async def async_shutdown(self):
-        """Handle coordinator shutdown."""
-        return
+        """Handle coordinator shutdown; the shared indexes keep running for other entries."""
+        self.adaptive.async_stop()
+        self.tracker.async_remove_consumer(self.entry.entry_id)
+        await super().async_shutdown()
+
+    def _snapshot(self, entity_ids) -> dict[str, dict]:
+        """Capture state and attributes for the given entities."""
+        current: dict[str, dict] = {}
+        for eid in entity_ids:
+            st = self.hass.states.get(eid)
+            if st:
+                current[eid] = {
+                    "state": st.state,
+                    "attributes": st.attributes,
+                    "last_changed": st.last_changed,
+                    "last_updated": st.last_updated,
+                    "friendly_name": st.attributes.get("friendly_name", eid),
+                }
+        return current
 
     async def _async_update_data(self) -> dict:
-        """Update data and generate suggestions."""
-        _LOGGER.debug("Starting data update")
+        """Update data and generate suggestions for new entities."""
+        return await self._async_generate(SuggestionRequest())
+
+    async def async_run_job(self, job: SuggestionJob) -> None:
+        """Run a queued job and publish its result; a failed run fails the job."""
+        data = await self._async_generate(job.request, job.job_id)
+        self.async_set_updated_data(data)
+        if data[SENSOR_KEY_STATUS] != PROVIDER_STATUS_CONNECTED:
+            raise HomeAssistantError(data.get("last_error") or "No response from API")
+
+    def _instructions(self, request: SuggestionRequest) -> str:
+        """Return the request-specific instructions, which go at the very end of the prompt."""
+        return f"Custom Prompt: {request.custom_prompt}" if request.custom_prompt else ""
+
+    async def _async_generate(self, request: SuggestionRequest, job_id: str | None = None) -> dict:
+        """Generate suggestions, timing the whole run."""
+        with self.metrics.phase("total"):
+            data = await self._async_generate_suggestions(request, job_id)
+        self.metrics.async_record_run()
+        self.data = {**data, "job_id": job_id}
+        return self.data
+
+    async def _async_generate_suggestions(self, request: SuggestionRequest, job_id: str | None = None) -> dict:
+        """Generate suggestions for the entities selected by the request."""
+        _LOGGER.debug(f"Starting data update for {request}")
+        delta: EntityDelta | None = None
         try:
             now = datetime.now()
             self.last_update = now
             self._last_error = None
-            current: dict[str, dict] = {}
-            for eid in self.hass.states.async_entity_ids():
-                if self.selected_domains and eid.split(".")[0] not in self.selected_domains:
-                    continue
-                st = self.hass.states.get(eid)
-                if st:
-                    current[eid] = {
-                        "state": st.state,
-                        "attributes": st.attributes,
-                        "last_changed": st.last_changed,
-                        "last_updated": st.last_updated,
-                        "friendly_name": st.attributes.get("friendly_name", eid),
-                    }
-            _LOGGER.debug(f"Previous entities: {list(self.previous_entities.keys())}")
-            picked = current if self.scan_all else {k: v for k, v in current.items() if k not in self.previous_entities}
-            _LOGGER.info(f"Entities picked for processing: {list(picked.keys())}")
+            # One notification per entry, replaced by each run instead of piling up.
+            notification_id = f"grok_automation_suggestions_{self.entry.entry_id}"
+            with self.metrics.phase("snapshot"):
+                delta = self.tracker.async_pop(self.entry.entry_id, self.selected_domains)
+                _LOGGER.debug(
+                    f"Entity delta: {len(delta.new)} new, {len(delta.changed)} changed, {len(delta.removed)} removed"
+                )
+                if request.scan_mode == SCAN_MODE_ALL:
+                    candidates = self.hass.states.async_entity_ids(self.selected_domains or None)
+                elif request.scan_mode == SCAN_MODE_CHANGED:
+                    candidates = delta.new | delta.changed
+                else:
+                    candidates = delta.new
+                    # Keep state changes pending for a later "changed" run.
+                    self.tracker.async_restore(self.entry.entry_id, EntityDelta(changed=delta.changed))
+                current = self._snapshot(candidates)
+                known = await self.fingerprints.async_load()
+                current_fps = {
+                    eid: entity_fingerprint(meta["attributes"], self.area_index.area_id(eid)) for eid, meta in current.items()
+                }
+            if request.scan_mode == SCAN_MODE_ALL:
+                picked = current
+            elif request.scan_mode == SCAN_MODE_CHANGED:
+                picked = {eid: meta for eid, meta in current.items() if known.get(eid) != current_fps[eid]}
+            else:
+                picked = {eid: meta for eid, meta in current.items() if eid not in known}
+            _LOGGER.info(f"Entities picked for processing: {len(picked)}")
             if not picked:
                 _LOGGER.debug("No new entities to process")
-                self.previous_entities = current
+                self._commit_fingerprints(current_fps, delta, request.scan_mode)
                 self.data[SENSOR_KEY_STATUS] = PROVIDER_STATUS_CONNECTED
                 return self.data
-            prompt = await self._build_prompt(picked)
-            _LOGGER.debug(f"Generated prompt length: {len(prompt)}")
-            response_data = await self._grok(prompt)
+            await self.suggestion_index.async_load()
+            await self.shared.async_get_automations()
+            self.suggestion_index.async_sync_existing(self.shared.existing_fingerprints)
+            tiered = None
+            if self._opt(CONF_TRIAGE_MODE, DEFAULT_TRIAGE_MODE) and len(picked) >= self._opt(
+                CONF_TRIAGE_MIN_ENTITIES, DEFAULT_TRIAGE_MIN_ENTITIES
+            ):
+                tiered = await self._generate_tiered(picked, current_fps, request, notification_id)
+            if tiered:
+                response_data, from_cache, processed = tiered
+            elif self._opt(CONF_SHARDED_MODE, DEFAULT_SHARDED_MODE) and len(picked) > self.entity_limit:
+                response_data, from_cache, processed = await self._generate_sharded(picked, current_fps, request)
+            else:
+                with self.metrics.phase("build_prompt"):
+                    prompt, processed = await self._build_prompt(picked, self._instructions(request))
+                _LOGGER.debug(f"Generated prompt length: {len(prompt)}")
+                response_data, from_cache = await self._cached_grok(
+                    prompt,
+                    self._stream_progress_handler(notification_id, processed),
+                    request.bypass_cache,
+                    filter_duplicates=True,
+                )
             if response_data:
                 response = response_data.get("content", "")
                 input_tokens = response_data.get("input_tokens", 0)
+                cached_tokens = response_data.get("cached_tokens", 0)
                 output_tokens = response_data.get("output_tokens", 0)
                 model = response_data.get("model", "")
                 _LOGGER.debug(f"Received response: {response[:200]}...")
-                match = YAML_RE.search(response)
-                yaml_block = match.group(1).strip() if match else ""
-                description = YAML_RE.sub("", response).strip() if match else ""
+                with self.metrics.phase("parse"):
+                    yaml_blocks = [block.strip() for block in YAML_RE.findall(response)]
+                    duplicates = response_data.get("duplicates_filtered", 0)
+                    if yaml_blocks:
+                        # Responses were filtered and indexed when received (and cached filtered);
+                        # only automations created since then can still be duplicates.
+                        response, yaml_blocks, new_duplicates = self._drop_duplicate_suggestions(
+                            response, yaml_blocks, index=False
+                        )
+                        duplicates += new_duplicates
+                    yaml_block = "\n\n".join(yaml_blocks)
+                    description = YAML_RE.sub("", response).strip() if yaml_blocks else ""
                 persistent_notification.async_create(
                     self.hass,
                     message=response,
                     title="Grok Automation Suggestions",
-                    notification_id=f"grok_automation_suggestions_{now.timestamp()}",
+                    notification_id=notification_id,
                 )
                 suggestions_data = {
                     "timestamp": now.isoformat(),
+                    "job_id": job_id,
                     "suggestions": response,
                     "description": description,
                     "yaml_block": yaml_block,
-                    "entities_processed": list(picked.keys()),
+                    "entities_processed": processed,
                     "input_tokens": input_tokens,
+                    "cached_tokens": cached_tokens,
                     "output_tokens": output_tokens,
                     "model": model,
+                    "duplicates_filtered": duplicates,
                 }
-                suggestions_file = Path(self.hass.config.path("grok_suggestions.yaml"))
                 try:
-                    _LOGGER.info(f"Writing suggestions to {suggestions_file}")
-                    async with await anyio.open_file(suggestions_file, "w", encoding="utf-8") as file:
-                        await file.write(yaml.safe_dump(suggestions_data, allow_unicode=True))
-                    _LOGGER.info(f"Successfully wrote suggestions to {suggestions_file}")
-                except Exception as err:
-                    _LOGGER.error(f"Failed to write suggestions to {suggestions_file}: {err}")
+                    with self.metrics.phase("history_write"):
+                        await self.history.async_append(suggestions_data)
+                except OSError as err:
+                    _LOGGER.error(f"Failed to record suggestions in history: {err}")
                 self.data = {
                     "suggestions": response,
                     "description": description,
                     "yaml_block": yaml_block,
                     "last_update": now,
-                    "entities_processed": list(picked.keys()),
+                    "entities_processed": processed,
                     "provider": "Grok",
                     "last_error": "",
+                    "from_cache": from_cache,
+                    "streaming": False,
+                    "duplicates_filtered": duplicates,
                     SENSOR_KEY_STATUS: PROVIDER_STATUS_CONNECTED,
                     SENSOR_KEY_INPUT_TOKENS: input_tokens,
+                    "cached_tokens": cached_tokens,
                     SENSOR_KEY_OUTPUT_TOKENS: output_tokens,
                     SENSOR_KEY_MODEL: model,
                 }
@@ -177,16 +401,22 @@ class GrokAutomationCoordinator(DataUpdateCoordinator):
                         "yaml_block": "",
                         "last_update": now,
                         "entities_processed": [],
+                        "from_cache": False,
+                        "streaming": False,
+                        "duplicates_filtered": 0,
                         "last_error": self._last_error or "No response from API",
                         SENSOR_KEY_STATUS: PROVIDER_STATUS_DISCONNECTED,
                         SENSOR_KEY_INPUT_TOKENS: 0,
+                        "cached_tokens": 0,
                         SENSOR_KEY_OUTPUT_TOKENS: 0,
                         SENSOR_KEY_MODEL: "",
                     }
                 )
-            self.previous_entities = current
+            self._commit_fingerprints(current_fps, delta, request.scan_mode)
             return self.data
         except Exception as err:
+            if delta is not None:
+                self.tracker.async_restore(self.entry.entry_id, delta)
             self._last_error = str(err)
             _LOGGER.error(f"Coordinator fatal error: {str(err)}")
             self.data.update(
@@ -196,165 +426,577 @@ class GrokAutomationCoordinator(DataUpdateCoordinator):
                     "yaml_block": "",
                     "last_update": now,
                     "entities_processed": [],
+                    "from_cache": False,
+                    "streaming": False,
+                    "duplicates_filtered": 0,
                     "last_error": self._last_error,
                     SENSOR_KEY_STATUS: PROVIDER_STATUS_ERROR,
                     SENSOR_KEY_INPUT_TOKENS: 0,
+                    "cached_tokens": 0,
                     SENSOR_KEY_OUTPUT_TOKENS: 0,
                     SENSOR_KEY_MODEL: "",
                 }
             )
             return self.data
 
-    async def _build_prompt(self, entities: dict) -> str:
-        """Build the prompt for Grok API."""
-        _LOGGER.debug(f"Building prompt for {len(entities)} entities")
-        MAX_ATTR = 200
-        MAX_AUTOM = 5
-        ent_sections: list[str] = []
-        for eid, meta in random.sample(list(entities.items()), min(len(entities), self.entity_limit)):
+    def _drop_duplicate_suggestions(
+        self, response: str, yaml_blocks: list[str], index: bool = True
+    ) -> tuple[str, list[str], int]:
+        """Remove suggested automations we already have from the response and its YAML blocks."""
+        filtered, duplicates = self.suggestion_index.async_filter(yaml_blocks, index)
+        if not duplicates:
+            return response, yaml_blocks, 0
+        replacements = iter(filtered)
+
+        def replace(match: re.Match) -> str:
+            block = next(replacements)
+            return "" if block is None else f"```yaml\n{block}\n```"
+
+        return YAML_RE.sub(replace, response), [block for block in filtered if block is not None], duplicates
+
+    def _filter_response(self, response_data: dict) -> dict:
+        """Drop duplicate suggestions from a fresh response and index the new ones."""
+        content = response_data.get("content", "")
+        yaml_blocks = [block.strip() for block in YAML_RE.findall(content)]
+        if not yaml_blocks:
+            return response_data
+        content, _, duplicates = self._drop_duplicate_suggestions(content, yaml_blocks)
+        return {**response_data, "content": content, "duplicates_filtered": duplicates}
+
+    def _commit_fingerprints(self, current_fps: dict[str, str], delta: EntityDelta, scan_mode: str) -> None:
+        """Remember what was evaluated so later runs can skip it."""
+        full_scan = scan_mode == SCAN_MODE_ALL and not self.selected_domains
+        self.fingerprints.async_update(current_fps, delta.removed, replace=full_scan)
+
+    async def _generate_sharded(
+        self, picked: dict, current_fps: dict[str, str], request: SuggestionRequest
+    ) -> tuple[dict | None, bool, list[str]]:
+        """Cover every picked entity with budget-sized shards sent concurrently."""
+        instructions = self._instructions(request)
+        with self.metrics.phase("build_prompt"):
+            shards, leftover = await self._plan_shards(picked, instructions)
+        if leftover:
+            # Not covered this time: keep them pending for the next run.
+            _LOGGER.info(f"{len(leftover)} entities exceed {len(shards)} shards, deferring them to the next run")
+            for eid in leftover:
+                current_fps.pop(eid, None)
+            self.tracker.async_restore(self.entry.entry_id, EntityDelta(new=set(leftover)))
+        semaphore = asyncio.Semaphore(self._opt(CONF_MAX_PARALLEL_REQUESTS, DEFAULT_MAX_PARALLEL_REQUESTS))
+
+        async def run_shard(shard: dict) -> tuple[dict | None, bool, list[str]]:
+            async with semaphore:
+                prompt, included = await self._build_prompt(shard, instructions, sample=False)
+                response_data, from_cache = await self._cached_grok(
+                    prompt, bypass_cache=request.bypass_cache, filter_duplicates=True
+                )
+                return response_data, from_cache, included
+
+        _LOGGER.info(f"Sending {len(shards)} shards for {sum(len(s) for s in shards)} entities")
+        results = await asyncio.gather(*(run_shard(shard) for shard in shards))
+        succeeded = [(data, cached, included) for data, cached, included in results if data]
+        for (data, _, included), shard in zip(results, shards):
+            # A failed shard, or entities the packer dropped from its prompt, were not evaluated: retry them next run.
+            deferred = set(shard).difference(included) if data else set(shard)
+            if deferred:
+                if data:
+                    _LOGGER.debug(f"{len(deferred)} entities did not fit their shard prompt, deferring them to the next run")
+                for eid in deferred:
+                    current_fps.pop(eid, None)
+                self.tracker.async_restore(self.entry.entry_id, EntityDelta(new=deferred))
+        if not succeeded:
+            return None, False, []
+        merged = {
+            "content": "\n\n---\n\n".join(data["content"] for data, _, _ in succeeded),
+            "input_tokens": sum(data.get("input_tokens", 0) for data, _, _ in succeeded),
+            "cached_tokens": sum(data.get("cached_tokens", 0) for data, _, _ in succeeded),
+            "output_tokens": sum(data.get("output_tokens", 0) for data, _, _ in succeeded),
+            "duplicates_filtered": sum(data.get("duplicates_filtered", 0) for data, _, _ in succeeded),
+            "model": succeeded[0][0].get("model", ""),
+        }
+        processed = [eid for _, _, included in succeeded for eid in included]
+        return merged, all(cached for _, cached, _ in succeeded), processed
+
+    async def _generate_tiered(
+        self, picked: dict, current_fps: dict[str, str], request: SuggestionRequest, notification_id: str
+    ) -> tuple[dict | None, bool, list[str]] | None:
+        """Let the triage model shortlist ideas, then have the premium model write YAML for them.
+
+        Returns None when triage gave nothing usable, so the caller falls back to a single-tier run.
+        """
+        triage, premium = self._tiers()
+        with self.metrics.phase("build_prompt"):
+            triage_prompt, offered = self._build_triage_prompt(picked, triage)
+        leftover = [eid for eid in picked if eid not in offered]
+        triage_data, triage_cached = await self._cached_grok(triage_prompt, bypass_cache=request.bypass_cache, tier=triage)
+        ideas = parse_triage_response(triage_data["content"], offered) if triage_data else []
+        if not ideas:
+            _LOGGER.warning(f"Triage with {triage.model} gave no usable ideas, falling back to {premium.model} only")
+            self._last_error = None
+            return None
+        if leftover:
+            _LOGGER.info(f"{len(leftover)} entities exceed the triage budget, deferring them to the next run")
+            for eid in leftover:
+                current_fps.pop(eid, None)
+            self.tracker.async_restore(self.entry.entry_id, EntityDelta(new=set(leftover)))
+        shortlist = {eid: picked[eid] for idea in ideas for eid in idea.entities}
+        _LOGGER.info(f"Triage shortlisted {len(ideas)} ideas over {len(shortlist)} of {len(offered)} entities")
+        instructions = "\n\n".join(filter(None, [render_ideas(ideas), self._instructions(request)]))
+        processed = sorted(offered)
+        with self.metrics.phase("build_prompt"):
+            prompt, _ = await self._build_prompt(shortlist, instructions, sample=False)
+        response_data, from_cache = await self._cached_grok(
+            prompt,
+            self._stream_progress_handler(notification_id, processed),
+            request.bypass_cache,
+            tier=premium,
+            filter_duplicates=True,
+        )
+        if not response_data:
+            return None, False, []
+        response_data = {
+            **response_data,
+            "input_tokens": response_data.get("input_tokens", 0) + triage_data.get("input_tokens", 0),
+            "cached_tokens": response_data.get("cached_tokens", 0) + triage_data.get("cached_tokens", 0),
+            "output_tokens": response_data.get("output_tokens", 0) + triage_data.get("output_tokens", 0),
+        }
+        return response_data, from_cache and triage_cached, processed
+
+    def _build_triage_prompt(self, picked: dict, tier: ModelTier) -> tuple[str, set[str]]:
+        """Render the best-ranked entities that fit the triage budget as compact tables."""
+        fixed = f"{TRIAGE_PROMPT}{COMPACT_LEGEND}"
+        budget = int(tier.max_input_tokens * (1 - TRIAGE_HEADER_SHARE)) - self.estimator.count(fixed)
+        items: list[tuple[str, dict]] = []
+        used = 0
+        for eid in self.ranker.top_k(picked, len(picked)):
+            meta = picked[eid]
+            values = compact_attributes(eid.split(".")[0], meta["attributes"])
+            cost = self.estimator.count(compact_row(eid, meta["friendly_name"], meta["state"], values, list(values)))
+            if items and used + cost > budget:
+                break
+            items.append((eid, meta))
+            used += cost
+        ordered, sections, _ = self._compact_sections(items)
+        return f"{fixed}{''.join(sections)}", {eid for eid, _ in ordered}
+
+    async def _plan_shards(self, picked: dict, instructions: str) -> tuple[list[dict], list[str]]:
+        """Partition picked entities by area (or domain) into shards that fit the input budget."""
+        in_budget, _ = self._budgets()
+        # Each shard gets the automations relevant to its own entities, so only reserve room for them.
+        entity_budget = int(in_budget * (1 - AUTOMATION_CONTEXT_SHARE)) - self.estimator.count(
+            self._render_prompt(instructions, await self._automation_overview(), [], [], [])
+        )
+        max_shards = self._opt(CONF_MAX_SHARDS, DEFAULT_MAX_SHARDS)
+
+        def group_key(eid: str) -> tuple[str, str]:
+            context = self.area_index.get(eid)
+            return (context.area_name if context and context.area_name else "~", eid.split(".")[0])
+
+        # Covered entities go last, so they are the ones deferred when shards run out.
+        ordered = sorted(picked, key=lambda eid: (self.suggestion_index.covered(eid), group_key(eid), eid))
+        shards: list[dict] = []
+        shard: dict = {}
+        used = 0
+        for index, eid in enumerate(ordered):
+            cost = self.estimator.count(self._entity_cost_block(eid, picked[eid]))
+            if shard and used + cost > entity_budget:
+                shards.append(shard)
+                shard, used = {}, 0
+                if len(shards) >= max_shards:
+                    return shards, ordered[index:]
+            shard[eid] = picked[eid]
+            used += cost
+        if shard:
+            shards.append(shard)
+        return shards, []
+
+    def _entity_fragment(self, eid: str, meta: dict) -> str:
+        """Return the rendered entity block, from the fragment cache when possible."""
+        block = self.fragment_cache.get(eid, meta["last_updated"])
+        if block is None:
+            block = self._render_entity(eid, meta, MAX_ATTR)
+            self.fragment_cache.set(eid, block, meta["last_updated"])
+        return block
+
+    def _compact(self) -> bool:
+        return self._opt(CONF_PROMPT_FORMAT, DEFAULT_PROMPT_FORMAT) == PROMPT_FORMAT_COMPACT
+
+    def _entity_cost_block(self, eid: str, meta: dict) -> str:
+        """Return the text an entity adds to the prompt in the current format, for budgeting."""
+        if self._compact():
+            values = compact_attributes(eid.split(".")[0], meta["attributes"])
+            return compact_row(eid, meta["friendly_name"], meta["state"], values, list(values))
+        return self._entity_fragment(eid, meta)
+
+    def _compact_sections(self, items: list[tuple[str, dict]]) -> tuple[list[tuple[str, dict]], list[str], set[int]]:
+        """Render entities as one table per area and domain.
+
+        Returns the entities in table order, one block per entity (the first block
+        of each table carries its header) and the indexes of those first blocks.
+        """
+        rows = []
+        for eid, meta in items:
+            context = self.area_index.get(eid)
+            area_name = context.area_name if context and context.area_name else "Unknown Area"
             domain = eid.split(".")[0]
-            attr_str = str(meta["attributes"])
-            if len(attr_str) > MAX_ATTR:
-                attr_str = f"{attr_str[:MAX_ATTR]}..."
-            ent_entry = self.entity_registry.async_get(eid) if self.entity_registry else None
-            dev_entry = self.device_registry.async_get(ent_entry.device_id) if ent_entry and ent_entry.device_id else None
-            area_id = ent_entry.area_id if ent_entry and ent_entry.area_id else (dev_entry.area_id if dev_entry else None)
-            area_name = "Unknown Area"
-            if area_id and self.area_registry:
-                ar_entry = self.area_registry.async_get_area(area_id)
-                if ar_entry:
-                    area_name = ar_entry.name
-            block = (
-                f"Entity: {eid}\n"
-                f"Friendly Name: {meta['friendly_name']}\n"
-                f"Domain: {domain}\n"
-                f"State: {meta['state']}\n"
-                f"Attributes: {attr_str}\n"
-                f"Area: {area_name}\n"
-                "---\n"
-            )
-            ent_sections.append(block)
+            rows.append((area_name, domain, eid, meta, compact_attributes(domain, meta["attributes"])))
+        rows.sort(key=lambda row: row[:3])
+        ordered: list[tuple[str, dict]] = []
+        sections: list[str] = []
+        table_starts: set[int] = set()
+        for (area_name, domain), table in groupby(rows, key=lambda row: row[:2]):
+            table = list(table)
+            columns = sorted({name for *_, values in table for name in values})
+            table_starts.add(len(sections))
+            for index, (_, _, eid, meta, values) in enumerate(table):
+                row = compact_row(eid, meta["friendly_name"], meta["state"], values, columns)
+                sections.append(compact_header(area_name, domain, columns) + row if index == 0 else row)
+                ordered.append((eid, meta))
+        return ordered, sections, table_starts
+
+    @staticmethod
+    def _drop_headless_rows(packed: PackResult, sections: list[str], table_starts: set[int]) -> PackResult:
+        """Drop compact rows whose table header did not fit in the budget."""
+        kept = {id(block) for block in packed.groups[0]}
+        rows: list[str] = []
+        header_kept = False
+        for index, block in enumerate(sections):
+            if index in table_starts:
+                header_kept = id(block) in kept
+            if header_kept and id(block) in kept:
+                rows.append(block)
+        return PackResult(
+            groups=[rows, *packed.groups[1:]],
+            tokens=packed.tokens,
+            dropped=packed.dropped + len(packed.groups[0]) - len(rows),
+        )
+
+    async def _build_prompt(self, entities: dict, instructions: str = "", sample: bool = True) -> tuple[str, list[str]]:
+        """Build the prompt for Grok API and return it with the entity_ids it includes."""
+        _LOGGER.debug(f"Building prompt for {len(entities)} entities")
+        if sample:
+            items = [(eid, entities[eid]) for eid in self.ranker.top_k(entities, self.entity_limit)]
+        else:
+            items = list(entities.items())
+        # Sorted so that an unchanged set of entities yields a byte-identical, cacheable prompt.
+        compact = self._compact()
+        if compact:
+            items, ent_sections, table_starts = self._compact_sections(items)
+        else:
+            items.sort(key=lambda item: item[0])
+            ent_sections = [self._entity_fragment(eid, meta) for eid, meta in items]
+        with self.metrics.phase("automations_read"):
+            overview = await self._automation_overview()
+            relevant = await self._relevant_automations([eid for eid, _ in items], MAX_AUTOM)
+            autom_sections = self._read_automations_default(relevant, MAX_ATTR)
+            autom_codes = self._read_automations_file_method(relevant, MAX_ATTR) if self.automation_read_file else []
+        in_budget, _ = self._budgets()
+        # Whole blocks are dropped rather than cutting the prompt mid-entity or losing the closing instructions.
+        packed = pack_blocks(
+            self._render_prompt(instructions, overview, [], [], []),
+            [ent_sections, autom_sections, autom_codes],
+            in_budget,
+            self.estimator,
+        )
+        if compact:
+            packed = self._drop_headless_rows(packed, ent_sections, table_starts)
+        self.last_pack = packed
+        if packed.dropped:
+            _LOGGER.debug(f"Dropped {packed.dropped} prompt blocks to fit input budget {in_budget}")
+        # Automations are packed by relevance but rendered sorted, so the same context is byte-identical.
+        builded_prompt = self._render_prompt(
+            instructions, overview, packed.groups[0], sorted(packed.groups[1]), sorted(packed.groups[2])
+        )
+        _LOGGER.debug(f"Prompt built, length: {len(builded_prompt)}, estimated tokens: {packed.tokens}")
+        kept = iter(packed.groups[0])
+        next_kept = next(kept, None)
+        included: list[str] = []
+        for (eid, _), block in zip(items, ent_sections):
+            if block is next_kept:
+                included.append(eid)
+                next_kept = next(kept, None)
+        return builded_prompt, included
+
+    async def _automation_overview(self) -> list[str]:
+        """Return the overview lines that fit in their share of the input budget.
+
+        They depend only on automations.yaml and the budget, never on the
+        selected entities, so every request and shard starts with them.
+        """
+        await self.shared.async_get_automations()
+        in_budget, _ = self._budgets()
+        lines = self.automation_index.overview(MAX_OVERVIEW)
+        return pack_blocks("", [lines], int(in_budget * OVERVIEW_SHARE), self.estimator).groups[0]
+
+    def _render_prompt(
+        self,
+        instructions: str,
+        overview: list[str],
+        ent_sections: list[str],
+        autom_sections: list[str],
+        autom_codes: list[str],
+    ) -> str:
+        """Assemble the prompt from already selected blocks.
+
+        Only the system prompt and the automation overview are independent of
+        the entities, so they come first and form the prefix successive requests
+        and shards share with the provider cache. The entities, the automations
+        relevant to them and the request instructions follow.
+        """
+        entities_title = COMPACT_LEGEND if self._compact() else "Entities (sampled):\n"
+        entities = f"{entities_title}{''.join(ent_sections)}\n"
+        prompt = (
+            f"{self.SYSTEM_PROMPT}\n\n"
+            "Automations Overview:\n"
+            f"{''.join(overview) if overview else 'None found.'}\n\n"
+            f"{entities}"
+            "Existing Automations:\n"
+            f"{''.join(autom_sections) if autom_sections else 'None found.'}\n\n"
+        )
         if self.automation_read_file:
-            autom_sections = self._read_automations_default(MAX_AUTOM, MAX_ATTR)
-            autom_codes = await self._read_automations_file_method(MAX_AUTOM, MAX_ATTR)
-            builded_prompt = (
-                f"{self.SYSTEM_PROMPT}\n\n"
-                f"Entities (sampled):\n{''.join(ent_sections)}\n"
-                "Existing Automations:\n"
-                f"{''.join(autom_sections) if autom_sections else 'None found.'}\n\n"
+            prompt += (
                 "Automations YAML:\n"
                 f"{''.join(autom_codes) if autom_codes else 'None available.'}\n\n"
                 "Propose new automations or improvements using the entity_ids above."
             )
         else:
-            autom_sections = self._read_automations_default(MAX_AUTOM, MAX_ATTR)
-            builded_prompt = (
-                f"{self.SYSTEM_PROMPT}\n\n"
-                f"Entities (sampled):\n{''.join(ent_sections)}\n"
-                "Existing Automations:\n"
-                f"{''.join(autom_sections) if autom_sections else 'None found.'}\n\n"
-                "Propose new automations using the entity_ids above."
-            )
-        _LOGGER.debug(f"Prompt built, length: {len(builded_prompt)}")
-        return builded_prompt
+            prompt += "Propose new automations using the entity_ids above."
+        return f"{prompt}\n\n{instructions}" if instructions else prompt
+
+    def _render_entity(self, eid: str, meta: dict, max_attr: int) -> str:
+        """Render the prompt block describing one entity."""
+        domain = eid.split(".")[0]
+        attr_str = str(meta["attributes"])
+        if len(attr_str) > max_attr:
+            attr_str = f"{attr_str[:max_attr]}..."
+        context = self.area_index.get(eid)
+        area_name = context.area_name if context and context.area_name else "Unknown Area"
+        return (
+            f"Entity: {eid}\n"
+            f"Friendly Name: {meta['friendly_name']}\n"
+            f"Domain: {domain}\n"
+            f"State: {meta['state']}\n"
+            f"Attributes: {attr_str}\n"
+            f"Area: {area_name}\n"
+            "---\n"
+        )
 
-    def _read_automations_default(self, max_autom: int, max_attr: int) -> list[str]:
-        """Read default automations from Home Assistant."""
-        _LOGGER.debug(f"Reading default automations, max={max_autom}")
+    async def _relevant_automations(self, entity_ids: list[str], max_autom: int) -> list[dict]:
+        """Return the automations that reference the entities, their devices or their areas."""
+        await self.shared.async_get_automations()
+        references: list[tuple[str, str]] = []
+        for eid in entity_ids:
+            references.append(("entity", eid))
+            if device_id := self.area_index.device_id(eid):
+                references.append(("device", device_id))
+            if area_id := self.area_index.area_id(eid):
+                references.append(("area", area_id))
+        relevant = self.automation_index.relevant(references, max_autom)
+        _LOGGER.debug(f"{len(relevant)} automations relevant to {len(entity_ids)} entities")
+        return relevant
+
+    def _read_automations_default(self, relevant: list[dict], max_attr: int) -> list[str]:
+        """Describe the automation entities of the relevant automations from Home Assistant."""
+        states = {st.attributes.get("id"): st for st in self.hass.states.async_all("automation")}
         automations: list[str] = []
-        for aid in self.hass.states.async_entity_ids("automation")[:max_autom]:
-            st = self.hass.states.get(aid)
+        for automation in relevant:
+            st = states.get(automation.get("id"))
             if st:
                 attr = str(st.attributes)
                 if len(attr) > max_attr:
                     attr = f"{attr[:max_attr]}...(truncated)"
                 automations.append(
-                    f"Entity: {aid}\n"
-                    f"Friendly Name: {st.attributes.get('friendly_name', aid)}\n"
+                    f"Entity: {st.entity_id}\n"
+                    f"Friendly Name: {st.attributes.get('friendly_name', st.entity_id)}\n"
                     f"State: {st.state}\n"
                     f"Attributes: {attr}\n"
                     "---\n"
                 )
         return automations
 
-    async def _read_automations_file_method(self, max_autom: int, max_attr: int) -> list[str]:
-        """Read automations from automations.yaml file."""
-        _LOGGER.debug(f"Reading automations from file, max={max_autom}")
-        automations_file = Path(self.hass.config.path()) / "automations.yaml"
+    def _read_automations_file_method(self, relevant: list[dict], max_attr: int) -> list[str]:
+        """Render the relevant automations from automations.yaml."""
         autom_codes: list[str] = []
-        max_autom = min(max_autom, 5)
-        try:
-            async with await anyio.open_file(automations_file, "r", encoding="utf-8") as file:
-                content = await file.read()
-                automations = yaml.safe_load(content) or []
-            for automation in automations[:max_autom]:
-                aid = automation.get("id", "unknown_id")
-                alias = automation.get("alias", "Unnamed Automation")
-                description = automation.get("description", "")
-                trigger = automation.get("trigger", []) or automation.get("triggers", [])
-                condition = automation.get("condition", []) or automation.get("conditions", [])
-                action = automation.get("action", []) or automation.get("actions", {})
-                code_block = (
-                    f"Automation Code for automation.{aid}:\n"
-                    "```yaml\n"
-                    f"- id: '{aid}'\n"
-                    f"  alias: {alias}\n"
-                    f"  description: {description}\n"
-                    f"  trigger: {trigger}\n"
-                    f"  condition: {condition}\n"
-                    f"  action: {action}\n"
-                    "```\n"
-                    "---\n"
-                )
-                autom_codes.append(code_block)
-        except FileNotFoundError:
-            _LOGGER.error("The automations.yaml file was not found.")
-        except yaml.YAMLError as err:
-            _LOGGER.error(f"Error parsing automations.yaml: {err}")
+        for automation in relevant:
+            aid = automation.get("id", "unknown_id")
+            alias = automation.get("alias", "Unnamed Automation")
+            description = automation.get("description", "")
+            trigger = automation.get("trigger", []) or automation.get("triggers", [])
+            condition = automation.get("condition", []) or automation.get("conditions", [])
+            action = automation.get("action", []) or automation.get("actions", {})
+            code_block = (
+                f"Automation Code for automation.{aid}:\n"
+                "```yaml\n"
+                f"- id: '{aid}'\n"
+                f"  alias: {alias}\n"
+                f"  description: {description}\n"
+                f"  trigger: {trigger}\n"
+                f"  condition: {condition}\n"
+                f"  action: {action}\n"
+                "```\n"
+                "---\n"
+            )
+            autom_codes.append(code_block)
         return autom_codes
 
-    async def _grok(self, prompt: str) -> dict | None:
-        """Send request to Grok API and return response with metadata."""
-        _LOGGER.debug(f"Sending request to Grok API with prompt length: {len(prompt)}")
-        for attempt in range(3):
-            try:
-                api_key = self._opt(CONF_GROK_API_KEY)
-                model = self._opt(CONF_GROK_MODEL, DEFAULT_MODELS["Grok"])
-                in_budget, out_budget = self._budgets()
-                if not api_key:
-                    raise ValueError("Grok API key not configured")
-                if len(prompt) // 4 > in_budget:
-                    _LOGGER.debug(f"Prompt truncated to fit input budget: {in_budget * 4}")
-                    prompt = prompt[:in_budget * 4]
-                body = {
-                    "model": model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": out_budget,
-                    "temperature": DEFAULT_TEMPERATURE,
-                }
-                headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-                async with self.session.post(ENDPOINT_GROK, headers=headers, json=body) as resp:
+    def _stream_progress_handler(self, notification_id: str, processed: list[str]) -> Callable[[str, list[str]], None]:
+        """Return a callback publishing partial streamed text to the sensors and notification."""
+        @callback
+        def on_progress(text: str, yaml_blocks: list[str]) -> None:
+            self.data = {
+                **self.data,
+                "suggestions": text,
+                "description": "",
+                "yaml_block": "\n\n".join(yaml_blocks),
+                "entities_processed": processed,
+                "streaming": True,
+                SENSOR_KEY_STATUS: PROVIDER_STATUS_CONNECTED,
+            }
+            persistent_notification.async_create(
+                self.hass,
+                message=text,
+                title="Grok Automation Suggestions",
+                notification_id=notification_id,
+            )
+            self.async_update_listeners()
+
+        return on_progress
+
+    async def _cached_grok(
+        self,
+        prompt: str,
+        on_progress: Callable[[str, list[str]], None] | None = None,
+        bypass_cache: bool = False,
+        tier: ModelTier | None = None,
+        filter_duplicates: bool = False,
+    ) -> tuple[dict | None, bool]:
+        """Return a cached response for an identical request, or call Grok and cache the result.
+
+        With filter_duplicates, a fresh response has its duplicate suggestions removed
+        before it is cached, so a cache hit never brings back what was dropped.
+        """
+        tier = tier or self._tiers()[1]
+        ttl = self._opt(CONF_RESPONSE_CACHE_TTL, DEFAULT_RESPONSE_CACHE_TTL)
+        key = response_cache_key(tier.endpoint, tier.model, DEFAULT_TEMPERATURE, tier.max_output_tokens, prompt)
+        if ttl > 0 and not bypass_cache:
+            self.response_cache.ttl = ttl
+            cached = await self.response_cache.async_get(key)
+            if cached:
+                _LOGGER.info("Identical request found in response cache, skipping Grok API call")
+                return {**cached, "duplicates_filtered": 0}, True
+        response_data = await self._grok(prompt, on_progress, tier)
+        if response_data and filter_duplicates:
+            response_data = self._filter_response(response_data)
+        if response_data and ttl > 0:
+            self.response_cache.ttl = ttl
+            self.response_cache.async_set(key, response_data)
+        return response_data, False
+
+    async def _grok(
+        self,
+        prompt: str,
+        on_progress: Callable[[str, list[str]], None] | None = None,
+        tier: ModelTier | None = None,
+    ) -> dict | None:
+        """Send request to Grok API (or the tier's endpoint) and return response with metadata."""
+        tier = tier or self._tiers()[1]
+        _LOGGER.debug(f"Sending {tier.name} request to {tier.model} with prompt length: {len(prompt)}")
+        try:
+            api_key = tier.api_key
+            model = tier.model
+            out_budget = tier.max_output_tokens
+            if not api_key and tier.priced:
+                raise ValueError("Grok API key not configured")
+            body = {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": out_budget,
+                "temperature": DEFAULT_TEMPERATURE,
+            }
+            # Triage output is parsed as a whole, so only the premium tier streams.
+            streaming = tier.name == TIER_PREMIUM and self._opt(CONF_STREAMING, DEFAULT_STREAMING)
+            if streaming:
+                body["stream"] = True
+                body["stream_options"] = {"include_usage": True}
+            headers = {"Content-Type": "application/json"}
+            if api_key:
+                headers["Authorization"] = f"Bearer {api_key}"
+            endpoint = tier.endpoint
+
+            async def send() -> dict:
+                async with self.session.post(endpoint, headers=headers, json=body) as resp:
                     if resp.status != 200:
-                        error_text = await resp.text()
-                        self._last_error = f"Grok error {resp.status}: {error_text}"
-                        _LOGGER.error(self._last_error)
-                        if attempt < 2:
-                            _LOGGER.info(f"Retrying API call (attempt {attempt + 2}/3)")
-                            continue
-                        return None
+                        raise ApiError(resp.status, await resp.text(), parse_retry_after(resp.headers.get("Retry-After")))
+                    if streaming:
+                        return await self._read_stream(resp, model, on_progress)
                     res = await resp.json()
                     if not isinstance(res, dict) or "choices" not in res or not res["choices"]:
                         raise ValueError(f"Unexpected response format: {res}")
+                    usage = res.get("usage") or {}
                     return {
                         "content": res["choices"][0]["message"]["content"],
-                        "input_tokens": res.get("usage", {}).get("prompt_tokens", 0),
-                        "output_tokens": res.get("usage", {}).get("completion_tokens", 0),
+                        "input_tokens": usage.get("prompt_tokens", 0),
+                        "cached_tokens": _cached_tokens(usage),
+                        "output_tokens": usage.get("completion_tokens", 0),
                         "model": res.get("model", model),
                     }
-            except Exception as err:
-                self._last_error = f"Grok processing error (attempt {attempt + 1}/3): {str(err)}"
-                _LOGGER.error(self._last_error)
-                if attempt < 2:
-                    _LOGGER.info(f"Retrying API call (attempt {attempt + 2}/3)")
+
+            scheduler = async_get_scheduler(
+                self.hass,
+                tier.scheduler_key,
+                self._opt(CONF_REQUESTS_PER_MINUTE, DEFAULT_REQUESTS_PER_MINUTE),
+                self._opt(CONF_TOKENS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE),
+            )
+            phase = "network" if tier.name == TIER_PREMIUM else f"{tier.name}_network"
+            with self.metrics.phase(phase):
+                response_data = await scheduler.async_execute(send, self.estimator.count(prompt) + out_budget)
+            cached_tokens = response_data.get("cached_tokens", 0)
+            # Split latency by prefix cache outcome to show what a hit saves.
+            self.metrics.record(f"{phase}_prefix_{'hit' if cached_tokens else 'miss'}", self.metrics.last(phase))
+            self.metrics.async_record_usage(
+                response_data["model"],
+                response_data["input_tokens"],
+                response_data["output_tokens"],
+                cached_tokens,
+                tier=tier.name,
+                priced=tier.priced,
+            )
+            return response_data
+        except ApiError as err:
+            self._last_error = str(err)
+            _LOGGER.error(self._last_error)
+            return None
+        except Exception as err:
+            self._last_error = f"Grok processing error: {str(err)}"
+            _LOGGER.error(self._last_error)
+            return None
+
+    async def _read_stream(
+        self, resp, model: str, on_progress: Callable[[str, list[str]], None] | None
+    ) -> dict:
+        """Consume an SSE completion, publishing progress at a throttled cadence."""
+        extractor = YamlBlockExtractor()
+        usage: dict = {}
+        last_push = time.monotonic()
+        async for chunk in iter_sse_events(resp):
+            model = chunk.get("model", model)
+            if chunk.get("usage"):
+                usage = chunk["usage"]
+            for choice in chunk.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if not delta:
                     continue
-                return None
+                new_blocks = extractor.feed(delta)
+                if new_blocks:
+                    _LOGGER.debug(f"Streamed {len(new_blocks)} complete YAML block(s)")
+                if on_progress and (new_blocks or time.monotonic() - last_push >= STREAM_UPDATE_INTERVAL):
+                    on_progress(extractor.text, extractor.blocks)
+                    last_push = time.monotonic()
+        if not extractor.text:
+            raise ValueError("Empty streamed response")
+        return {
+            "content": extractor.text,
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "cached_tokens": _cached_tokens(usage),
+            "output_tokens": usage.get("completion_tokens", 0),
+            "model": model,
+        }
@@ -0,0 +1,39 @@
+from __future__ import annotations
+from typing import Any
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from .const import DOMAIN, CONF_GROK_API_KEY, CONF_GROK_ENDPOINT, CONF_TRIAGE_API_KEY, CONF_TRIAGE_ENDPOINT
+from .coordinator import GrokAutomationCoordinator
+from .scheduler import async_peek_scheduler
+
+# Endpoints may be self-hosted or proxy URLs carrying hostnames or credentials (user:pass@host, ?token=)
+TO_REDACT = {CONF_GROK_API_KEY, CONF_GROK_ENDPOINT, CONF_TRIAGE_API_KEY, CONF_TRIAGE_ENDPOINT}
+# The model catalog reports the /models URL derived from the endpoint
+CATALOG_TO_REDACT = {"url"}
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: GrokAutomationCoordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "automations_file": coordinator.automations.stats(),
+        "automation_index": coordinator.automation_index.stats(),
+        "prompt_fragment_cache": coordinator.fragment_cache.stats(),
+        "response_cache": coordinator.response_cache.stats(),
+        "suggestion_index": coordinator.suggestion_index.stats(),
+        "entity_ranking": coordinator.ranker.stats(),
+        "jobs": coordinator.jobs.stats(),
+        "adaptive_scheduler": coordinator.adaptive.stats(),
+        "scheduler": scheduler.stats() if (scheduler := async_peek_scheduler(hass, coordinator._tiers()[1].scheduler_key)) else None,
+        "shared": coordinator.shared.stats(),
+        "model_catalog": async_redact_data(coordinator.model_catalog.stats(), CATALOG_TO_REDACT),
+        "metrics": coordinator.metrics.summary(),
+        "last_prompt": {
+            "estimated_tokens": coordinator.last_pack.tokens,
+            "dropped_blocks": coordinator.last_pack.dropped,
+        } if coordinator.last_pack else None,
+    }
@@ -0,0 +1,59 @@
+from __future__ import annotations
+import asyncio
+from collections.abc import Mapping
+from hashlib import blake2b
+import logging
+from typing import Any
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+STORAGE_VERSION = 1
+SAVE_DELAY = 30
+
+def entity_fingerprint(attrs: Mapping[str, Any], area_id: str | None) -> str:
+    """Return a short hash of the parts of an entity that shape its suggestions."""
+    raw = f"{attrs.get('state_class', '')}|{','.join(sorted(attrs))}|{area_id or ''}"
+    return blake2b(raw.encode("utf-8"), digest_size=4).hexdigest()
+
+class EntityFingerprintStore:
+    """Persisted entity_id -> fingerprint table of entities already sent to Grok."""
+    def __init__(self, hass: HomeAssistant, entry_id: str):
+        """Initialize the store; nothing is read until first use."""
+        self._store: Store[dict[str, dict[str, str]]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.fingerprints"
+        )
+        self._fingerprints: dict[str, str] | None = None
+        self._lock = asyncio.Lock()
+
+    async def async_load(self) -> dict[str, str]:
+        """Load the table from disk on first access."""
+        if self._fingerprints is None:
+            async with self._lock:
+                if self._fingerprints is None:
+                    data = await self._store.async_load() or {}
+                    self._fingerprints = data.get("fingerprints", {})
+                    _LOGGER.debug(f"Loaded {len(self._fingerprints)} entity fingerprints")
+        return self._fingerprints
+
+    @callback
+    def async_update(self, fingerprints: dict[str, str], removed=(), replace: bool = False) -> None:
+        """Record fingerprints of processed entities and schedule a save."""
+        if self._fingerprints is None:
+            return
+        if replace:
+            self._fingerprints = dict(fingerprints)
+        else:
+            self._fingerprints.update(fingerprints)
+        for eid in removed:
+            self._fingerprints.pop(eid, None)
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, dict[str, str]]:
+        return {"fingerprints": self._fingerprints or {}}
+
+    async def async_remove(self) -> None:
+        """Delete the persisted table."""
+        await self._store.async_remove()
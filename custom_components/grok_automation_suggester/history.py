@@ -0,0 +1,214 @@
+from __future__ import annotations
+import asyncio
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime
+import json
+import logging
+import os
+from pathlib import Path
+import time
+from homeassistant.core import HomeAssistant
+from .const import (
+    HISTORY_DIR,
+    HISTORY_MAX_AGE_DAYS,
+    HISTORY_MAX_BYTES,
+    HISTORY_MEMORY_WINDOW,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class IndexEntry:
+    """Where one record lives in the data file."""
+    timestamp: float
+    offset: int
+    length: int
+    entities: tuple[str, ...]
+
+    def to_line(self) -> str:
+        return json.dumps([self.timestamp, self.offset, self.length, list(self.entities)]) + "\n"
+
+    @classmethod
+    def from_line(cls, line: str) -> IndexEntry:
+        timestamp, offset, length, entities = json.loads(line)
+        return cls(timestamp, offset, length, tuple(entities))
+
+def _record_timestamp(record: dict) -> float:
+    try:
+        return datetime.fromisoformat(record["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+class SuggestionHistory:
+    """Append-only JSONL history of suggestion runs with a sidecar offset index.
+
+    The data file holds one JSON record per line. The ``.idx`` sidecar holds
+    one ``[timestamp, offset, length, entities]`` line per record, so lookups by
+    time range (bisect) or entity (inverted list) never rescan the data file.
+    All file access runs in the executor.
+    """
+    def __init__(self, hass: HomeAssistant, entry_id: str):
+        """Initialize the history; files are read on first use."""
+        self.hass = hass
+        directory = Path(hass.config.path(HISTORY_DIR))
+        self.path = directory / f"{entry_id}.jsonl"
+        self.index_path = directory / f"{entry_id}.idx"
+        self.recent: deque[dict] = deque(maxlen=HISTORY_MEMORY_WINDOW)
+        self._index: list[IndexEntry] | None = None
+        self._timestamps: list[float] = []
+        self._by_entity: defaultdict[str, list[int]] = defaultdict(list)
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._index or ())
+
+    def _load_index(self) -> list[IndexEntry]:
+        """Read the sidecar, rebuilding it from the data file when it is out of sync."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.path.exists():
+            return []
+        size = self.path.stat().st_size
+        entries: list[IndexEntry] = []
+        try:
+            with open(self.index_path, encoding="utf-8") as file:
+                entries = [IndexEntry.from_line(line) for line in file if line.strip()]
+        except (OSError, ValueError):
+            entries = []
+        if entries and entries[-1].offset + entries[-1].length == size:
+            return entries
+        if size:
+            _LOGGER.info(f"Rebuilding suggestion history index for {self.path.name}")
+        entries = self._scan()
+        self._write_index(entries)
+        return entries
+
+    def _scan(self) -> list[IndexEntry]:
+        entries: list[IndexEntry] = []
+        offset = 0
+        with open(self.path, "rb") as file:
+            for raw in file:
+                try:
+                    record = json.loads(raw)
+                    entries.append(
+                        IndexEntry(_record_timestamp(record), offset, len(raw), tuple(record.get("entities_processed", [])))
+                    )
+                except ValueError:
+                    _LOGGER.warning(f"Skipping corrupt history line at offset {offset}")
+                offset += len(raw)
+        return entries
+
+    def _write_index(self, entries: list[IndexEntry]) -> None:
+        tmp = self.index_path.with_suffix(".idx.tmp")
+        with open(tmp, "w", encoding="utf-8") as file:
+            file.writelines(entry.to_line() for entry in entries)
+        os.replace(tmp, self.index_path)
+
+    def _set_index(self, entries: list[IndexEntry]) -> None:
+        self._index = entries
+        self._timestamps = [entry.timestamp for entry in entries]
+        self._by_entity = defaultdict(list)
+        for position, entry in enumerate(entries):
+            for eid in entry.entities:
+                self._by_entity[eid].append(position)
+
+    async def _async_ensure_loaded(self) -> list[IndexEntry]:
+        if self._index is None:
+            self._set_index(await self.hass.async_add_executor_job(self._load_index))
+        return self._index
+
+    def _append(self, line: bytes, entry_without_offset: IndexEntry) -> IndexEntry:
+        with open(self.path, "ab") as file:
+            offset = file.tell()
+            file.write(line)
+        entry = IndexEntry(entry_without_offset.timestamp, offset, len(line), entry_without_offset.entities)
+        with open(self.index_path, "a", encoding="utf-8") as file:
+            file.write(entry.to_line())
+        return entry
+
+    async def async_append(self, record: dict) -> None:
+        """Append a record off the event loop, compacting the file when it grows too big or old."""
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        pending = IndexEntry(_record_timestamp(record), 0, 0, tuple(record.get("entities_processed", [])))
+        async with self._lock:
+            entries = await self._async_ensure_loaded()
+            entry = await self.hass.async_add_executor_job(self._append, line, pending)
+            entries.append(entry)
+            self._timestamps.append(entry.timestamp)
+            for eid in entry.entities:
+                self._by_entity[eid].append(len(entries) - 1)
+            self.recent.append(record)
+            oldest_allowed = time.time() - HISTORY_MAX_AGE_DAYS * 86400
+            if entry.offset + entry.length > HISTORY_MAX_BYTES or entries[0].timestamp < oldest_allowed:
+                self._set_index(await self.hass.async_add_executor_job(self._compact, entries, oldest_allowed))
+                while len(self.recent) > len(self._index):
+                    self.recent.popleft()
+
+    def _compact(self, entries: list[IndexEntry], oldest_allowed: float) -> list[IndexEntry]:
+        """Rewrite the data file keeping the newest records within the age and size limits."""
+        keep: list[IndexEntry] = []
+        size = 0
+        # Keep the file at most 3/4 full after compaction so it doesn't run on every append.
+        for entry in reversed(entries):
+            if entry.timestamp < oldest_allowed or size + entry.length > HISTORY_MAX_BYTES * 3 // 4:
+                break
+            keep.append(entry)
+            size += entry.length
+        keep.reverse()
+        tmp = self.path.with_suffix(".jsonl.tmp")
+        compacted: list[IndexEntry] = []
+        with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+            for entry in keep:
+                src.seek(entry.offset)
+                compacted.append(IndexEntry(entry.timestamp, dst.tell(), entry.length, entry.entities))
+                dst.write(src.read(entry.length))
+        os.replace(tmp, self.path)
+        self._write_index(compacted)
+        _LOGGER.info(f"Suggestion history compacted from {len(entries)} to {len(compacted)} records")
+        return compacted
+
+    def _read(self, entries: list[IndexEntry]) -> list[dict]:
+        records: list[dict] = []
+        with open(self.path, "rb") as file:
+            for entry in entries:
+                file.seek(entry.offset)
+                records.append(json.loads(file.read(entry.length)))
+        return records
+
+    async def async_query(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        entity_id: str | None = None,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> tuple[list[dict], int]:
+        """Return matching records, newest first, and the total number of matches."""
+        async with self._lock:
+            entries = await self._async_ensure_loaded()
+            low = bisect_left(self._timestamps, start.timestamp()) if start else 0
+            high = bisect_right(self._timestamps, end.timestamp()) if end else len(entries)
+            if entity_id:
+                positions = self._by_entity.get(entity_id, [])
+                positions = positions[bisect_left(positions, low):bisect_left(positions, high)]
+            else:
+                positions = range(low, high)
+            total = len(positions)
+            page = [positions[total - 1 - i] for i in range(offset, min(offset + limit, total))]
+            # The newest records are usually still in memory.
+            recent_start = len(entries) - len(self.recent)
+            if all(position >= recent_start for position in page):
+                return [self.recent[position - recent_start] for position in page], total
+            return await self.hass.async_add_executor_job(self._read, [entries[p] for p in page]), total
+
+    def _remove(self) -> None:
+        for path in (self.path, self.index_path, self.path.with_suffix(".jsonl.tmp"), self.index_path.with_suffix(".idx.tmp")):
+            path.unlink(missing_ok=True)
+
+    async def async_remove(self) -> None:
+        """Delete the data file and its index."""
+        async with self._lock:
+            await self.hass.async_add_executor_job(self._remove)
+            self._set_index([])
+            self.recent.clear()
@@ -0,0 +1,120 @@
+from __future__ import annotations
+import asyncio
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+import logging
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util.ulid import ulid_now
+from .const import SCAN_MODE_NEW
+
+_LOGGER = logging.getLogger(__name__)
+JOB_HISTORY_SIZE = 20
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+@dataclass(frozen=True)
+class SuggestionRequest:
+    """Everything a generation run depends on; identical requests can share a run."""
+    scan_mode: str = SCAN_MODE_NEW
+    custom_prompt: str | None = None
+    bypass_cache: bool = False
+
+@dataclass
+class SuggestionJob:
+    """One queued generation run."""
+    request: SuggestionRequest
+    job_id: str = field(default_factory=ulid_now)
+    created: datetime = field(default_factory=datetime.now)
+    status: str = JOB_QUEUED
+    callers: int = 1
+    error: str | None = None
+    runner: Callable[[SuggestionJob], Awaitable[None]] | None = field(default=None, repr=False)
+    finished: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created": self.created.isoformat(),
+            "callers": self.callers,
+            "scan_mode": self.request.scan_mode,
+            "error": self.error,
+        }
+
+class SuggestionJobQueue:
+    """Single-flight FIFO of generation jobs; identical queued requests are coalesced."""
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        runner: Callable[[SuggestionJob], Awaitable[None]],
+    ):
+        """Initialize the queue."""
+        self.hass = hass
+        self.entry = entry
+        self._runner = runner
+        self._pending: deque[SuggestionJob] = deque()
+        self._jobs: OrderedDict[str, SuggestionJob] = OrderedDict()
+        self._worker: asyncio.Task | None = None
+        self.coalesced = 0
+
+    @callback
+    def async_submit(
+        self,
+        request: SuggestionRequest,
+        runner: Callable[[SuggestionJob], Awaitable[None]] | None = None,
+    ) -> tuple[SuggestionJob, bool]:
+        """Queue a request, or attach to an identical one that has not started yet.
+
+        A job with its own runner (e.g. a profiled run) is never coalesced.
+        """
+        for job in self._pending if runner is None else ():
+            if job.request == request and job.runner is None:
+                job.callers += 1
+                self.coalesced += 1
+                _LOGGER.debug(f"Request coalesced into queued job {job.job_id}")
+                return job, True
+        job = SuggestionJob(request, runner=runner)
+        self._pending.append(job)
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > JOB_HISTORY_SIZE:
+            self._jobs.popitem(last=False)
+        if self._worker is None or self._worker.done():
+            self._worker = self.entry.async_create_background_task(
+                self.hass, self._async_work(), f"grok_automation_suggester jobs {self.entry.entry_id}"
+            )
+        return job, False
+
+    @callback
+    def async_get(self, job_id: str) -> SuggestionJob | None:
+        """Return a recent job."""
+        return self._jobs.get(job_id)
+
+    async def _async_work(self) -> None:
+        while self._pending:
+            job = self._pending.popleft()
+            job.status = JOB_RUNNING
+            try:
+                await (job.runner or self._runner)(job)
+                job.status = JOB_DONE
+            except Exception as err:
+                job.status = JOB_FAILED
+                job.error = str(err)
+                # Failed runs were already logged by the coordinator; only unexpected errors need a traceback.
+                _LOGGER.error(f"Suggestion job {job.job_id} failed: {err}", exc_info=not isinstance(err, HomeAssistantError))
+            finally:
+                job.finished.set()
+
+    def stats(self) -> dict:
+        """Return queue counters and recent jobs."""
+        return {
+            "pending": len(self._pending),
+            "coalesced": self.coalesced,
+            "recent_jobs": [job.as_dict() for job in self._jobs.values()],
+        }
@@ -0,0 +1,164 @@
+from __future__ import annotations
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+import logging
+import time
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+from .const import CACHED_INPUT_PRICE_FACTOR, DEFAULT_MODEL_PRICE, DOMAIN, METRICS_WINDOW, MODEL_PRICES, TIER_PREMIUM
+
+_LOGGER = logging.getLogger(__name__)
+STORAGE_VERSION = 1
+SAVE_DELAY = 30
+USAGE_KEYS = ("api_calls", "input_tokens", "cached_tokens", "output_tokens", "cost_usd", "cache_savings_usd")
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+class PhaseTimings:
+    """Rolling window of durations (ms) for one phase."""
+    def __init__(self):
+        self.samples: deque[float] = deque(maxlen=METRICS_WINDOW)
+        self.last: float | None = None
+
+    def add(self, duration_ms: float) -> None:
+        self.last = duration_ms
+        self.samples.append(duration_ms)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            "last_ms": round(self.last, 2) if self.last is not None else None,
+            "p50_ms": round(_percentile(ordered, 0.5), 2) if ordered else None,
+            "p95_ms": round(_percentile(ordered, 0.95), 2) if ordered else None,
+            "count": len(ordered),
+        }
+
+def _rounded(totals: dict) -> dict:
+    return {**totals, "cost_usd": round(totals["cost_usd"], 6), "cache_savings_usd": round(totals["cache_savings_usd"], 6)}
+
+def model_price(model: str) -> tuple[float, float]:
+    """Return (input, output) USD per million tokens for a model, matched by prefix."""
+    for prefix, price in MODEL_PRICES.items():
+        if model.startswith(prefix):
+            return price
+    return DEFAULT_MODEL_PRICE
+
+class RunMetrics:
+    """Per-phase timings plus cumulative token and cost counters persisted across restarts."""
+    def __init__(self, hass: HomeAssistant, entry_id: str):
+        """Initialize the metrics."""
+        self.phases: dict[str, PhaseTimings] = {}
+        self.totals = {"runs": 0, **dict.fromkeys(USAGE_KEYS, 0)}
+        self.daily = {"date": None, "tokens": 0}
+        self.tiers: dict[str, dict] = {}
+        self._captures: list[dict[str, float]] = []
+        self._store: Store[dict] = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.metrics")
+
+    async def async_load(self) -> None:
+        """Restore cumulative counters."""
+        data = await self._store.async_load() or {}
+        self.totals.update(data.get("totals", {}))
+        self.daily.update(data.get("daily", {}))
+        for tier, totals in data.get("tiers", {}).items():
+            self.tiers[tier] = {**dict.fromkeys(USAGE_KEYS, 0), **totals}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a block with the monotonic clock."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, (time.monotonic() - start) * 1000)
+
+    def record(self, name: str, duration_ms: float) -> None:
+        """Add a duration measured elsewhere to a phase."""
+        self.phases.setdefault(name, PhaseTimings()).add(duration_ms)
+        for captured in self._captures:
+            captured[name] = captured.get(name, 0.0) + duration_ms
+
+    @contextmanager
+    def capture(self) -> Iterator[dict[str, float]]:
+        """Collect the phases recorded inside a block, summed per name, in ms."""
+        captured: dict[str, float] = {}
+        self._captures.append(captured)
+        try:
+            yield captured
+        finally:
+            self._captures.remove(captured)
+
+    def last(self, name: str) -> float | None:
+        """Return the last duration of a phase in ms."""
+        timings = self.phases.get(name)
+        return timings.last if timings else None
+
+    @callback
+    def async_record_run(self) -> None:
+        self.totals["runs"] += 1
+        self._schedule_save()
+
+    @callback
+    def async_record_usage(
+        self,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        cached_tokens: int = 0,
+        tier: str = TIER_PREMIUM,
+        priced: bool = True,
+    ) -> None:
+        """Add one API call's usage to the cumulative and per-tier counters.
+
+        cached_tokens is the part of input_tokens served from the provider's prefix cache.
+        """
+        input_price, output_price = model_price(model) if priced else (0.0, 0.0)
+        savings = cached_tokens * input_price * (1 - CACHED_INPUT_PRICE_FACTOR) / 1_000_000
+        cost = (input_tokens * input_price + output_tokens * output_price) / 1_000_000 - savings
+        tier_totals = self.tiers.setdefault(tier, dict.fromkeys(USAGE_KEYS, 0))
+        for totals in (self.totals, tier_totals):
+            totals["api_calls"] += 1
+            totals["input_tokens"] += input_tokens
+            totals["cached_tokens"] += cached_tokens
+            totals["output_tokens"] += output_tokens
+            totals["cost_usd"] += cost
+            totals["cache_savings_usd"] += savings
+        self.daily = {"date": dt_util.now().date().isoformat(), "tokens": self.tokens_today + input_tokens + output_tokens}
+        self._schedule_save()
+
+    @property
+    def total_tokens(self) -> int:
+        return self.totals["input_tokens"] + self.totals["output_tokens"]
+
+    @property
+    def prefix_cache_hit_rate(self) -> float | None:
+        """Return the share of input tokens served from the provider's prefix cache."""
+        if not self.totals["input_tokens"]:
+            return None
+        return round(self.totals["cached_tokens"] / self.totals["input_tokens"], 4)
+
+    @property
+    def tokens_today(self) -> int:
+        """Return the tokens used since local midnight."""
+        return self.daily["tokens"] if self.daily["date"] == dt_util.now().date().isoformat() else 0
+
+    @callback
+    def _schedule_save(self) -> None:
+        self._store.async_delay_save(lambda: {"totals": self.totals, "daily": self.daily, "tiers": self.tiers}, SAVE_DELAY)
+
+    def summary(self) -> dict:
+        """Return phase percentiles and totals."""
+        return {
+            "phases": {name: timings.summary() for name, timings in self.phases.items()},
+            "totals": _rounded(self.totals),
+            "tokens_today": self.tokens_today,
+            "prefix_cache_hit_rate": self.prefix_cache_hit_rate,
+            "tiers": {name: _rounded(totals) for name, totals in self.tiers.items()},
+        }
+
+    async def async_remove(self) -> None:
+        """Delete the persisted counters."""
+        await self._store.async_remove()
@@ -0,0 +1,162 @@
+from __future__ import annotations
+import asyncio
+from dataclasses import dataclass
+from hashlib import sha256
+import logging
+import time
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
+from .const import (
+    DATA_MODEL_CATALOGS,
+    DEFAULT_CONTEXT_WINDOW,
+    DOMAIN,
+    ENDPOINT_GROK,
+    MODEL_CATALOG_TTL,
+    MODEL_CONTEXT_WINDOWS,
+)
+from .scheduler import ApiError, async_get_scheduler, parse_retry_after
+
+_LOGGER = logging.getLogger(__name__)
+STORAGE_VERSION = 1
+# Fields OpenAI-compatible servers use to report the context length of a model
+CONTEXT_WINDOW_FIELDS = ("context_window", "context_length", "max_context_length", "max_model_len")
+
+def models_endpoint(endpoint: str) -> str:
+    """Return the /models URL next to a /chat/completions endpoint."""
+    base = endpoint.rstrip("/")
+    if base.endswith("/chat/completions"):
+        base = base[: -len("/chat/completions")]
+    return f"{base}/models"
+
+def catalog_id(api_key: str, endpoint: str) -> str:
+    """Return the storage id of the catalog of an API key and endpoint."""
+    return sha256(f"{models_endpoint(endpoint)}|{api_key}".encode("utf-8")).hexdigest()[:16]
+
+def default_context_window(model: str) -> int:
+    """Return the known context window of a model, matched by prefix."""
+    for prefix, window in MODEL_CONTEXT_WINDOWS.items():
+        if model.startswith(prefix):
+            return window
+    return DEFAULT_CONTEXT_WINDOW
+
+@dataclass(frozen=True)
+class ModelInfo:
+    """One model listed by the provider."""
+    id: str
+    context_window: int
+
+    @classmethod
+    def from_api(cls, item: dict) -> ModelInfo:
+        window = next((item[field] for field in CONTEXT_WINDOW_FIELDS if isinstance(item.get(field), int)), None)
+        return cls(item["id"], window or default_context_window(item["id"]))
+
+class ModelCatalog:
+    """Models available to one API key and endpoint, cached in a Store for MODEL_CATALOG_TTL.
+
+    The config flow fills it while validating the key, so the options form and
+    the coordinator read the list without calling the provider again.
+    """
+    def __init__(self, hass: HomeAssistant, api_key: str, endpoint: str = ENDPOINT_GROK):
+        """Initialize the catalog; nothing is read until first use."""
+        self.hass = hass
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self.url = models_endpoint(endpoint)
+        self._store: Store[dict] = Store(hass, STORAGE_VERSION, f"{DOMAIN}.models.{catalog_id(api_key, endpoint)}")
+        self._models: dict[str, ModelInfo] = {}
+        self._fetched_at = 0.0
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def fresh(self) -> bool:
+        """Whether the cached list is younger than the TTL."""
+        return bool(self._models) and time.time() - self._fetched_at < MODEL_CATALOG_TTL
+
+    @property
+    def models(self) -> list[str]:
+        """Return the cached model ids, sorted."""
+        return sorted(self._models)
+
+    def context_window(self, model: str) -> int:
+        """Return the context window of a model, from the provider when it reports one."""
+        info = self._models.get(model)
+        return info.context_window if info else default_context_window(model)
+
+    async def async_load(self) -> None:
+        """Restore the last fetched list, whatever its age."""
+        if self._loaded:
+            return
+        self._loaded = True
+        data = await self._store.async_load() or {}
+        self._fetched_at = data.get("fetched_at", 0.0)
+        self._models = {item["id"]: ModelInfo(item["id"], item["context_window"]) for item in data.get("models", [])}
+
+    async def async_get(self) -> list[str]:
+        """Return the model ids, calling the provider only when the cache is stale.
+
+        Raises ApiError (or the transport error) when the fetch fails and
+        nothing was cached; a stale list is returned instead when there is one.
+        """
+        async with self._lock:
+            await self.async_load()
+            if self.fresh:
+                return self.models
+            try:
+                await self._async_fetch()
+            except Exception as err:
+                if not self._models:
+                    raise
+                _LOGGER.warning(f"Could not refresh the model list from {self.url}, keeping the cached one: {err}")
+            return self.models
+
+    async def _async_fetch(self) -> None:
+        session = async_get_clientsession(self.hass)
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+        async def send() -> list[dict]:
+            async with session.get(self.url, headers=headers) as resp:
+                if resp.status != 200:
+                    raise ApiError(resp.status, await resp.text(), parse_retry_after(resp.headers.get("Retry-After")))
+                return (await resp.json()).get("data", [])
+
+        # Same scheduler as the chat calls, without touching the limits the entries configured.
+        items = await async_get_scheduler(self.hass, self.api_key or self.endpoint).async_execute(send)
+        self._models = {info.id: info for info in (ModelInfo.from_api(item) for item in items if "id" in item)}
+        self._fetched_at = time.time()
+        await self._store.async_save(self._data())
+        _LOGGER.debug(f"Fetched {len(self._models)} models from {self.url}")
+
+    def _data(self) -> dict:
+        return {
+            "fetched_at": self._fetched_at,
+            "models": [{"id": info.id, "context_window": info.context_window} for info in self._models.values()],
+        }
+
+    def stats(self) -> dict:
+        """Return the cached list and its age for diagnostics."""
+        return {
+            "url": self.url,
+            "fresh": self.fresh,
+            "age_seconds": round(time.time() - self._fetched_at) if self._fetched_at else None,
+            "models": {info.id: info.context_window for info in self._models.values()},
+        }
+
+    async def async_remove(self) -> None:
+        """Delete the cached list."""
+        await self._store.async_remove()
+
+def async_get_model_catalog(hass: HomeAssistant, api_key: str, endpoint: str = ENDPOINT_GROK) -> ModelCatalog:
+    """Return the catalog shared by every caller using this API key and endpoint."""
+    catalogs: dict[str, ModelCatalog] = hass.data.setdefault(DATA_MODEL_CATALOGS, {})
+    key_id = catalog_id(api_key, endpoint)
+    catalog = catalogs.get(key_id)
+    if catalog is None:
+        catalog = catalogs[key_id] = ModelCatalog(hass, api_key, endpoint)
+    return catalog
+
+async def async_remove_model_catalog(hass: HomeAssistant, api_key: str, endpoint: str = ENDPOINT_GROK) -> None:
+    """Forget and delete the cached list of an API key and endpoint."""
+    catalog = hass.data.get(DATA_MODEL_CATALOGS, {}).pop(catalog_id(api_key, endpoint), None)
+    await (catalog or ModelCatalog(hass, api_key, endpoint)).async_remove()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+import asyncio
+import cProfile
+import logging
+from pathlib import Path
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from typing import TYPE_CHECKING
+from homeassistant.core import HomeAssistant, callback
+from .const import DOMAIN, PROFILE_MAX_SPANS, PROFILE_STACK_DEPTH
+from .jobs import SuggestionJob, SuggestionRequest
+
+if TYPE_CHECKING:
+    from .coordinator import GrokAutomationCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+PACKAGE_DIR = str(Path(__file__).parent)
+
+def _format_frame(filename: str, lineno: int, name: str) -> str:
+    return f"{Path(filename).name}:{lineno}({name})"
+
+class LoopBlockMonitor:
+    """Report event-loop stalls longer than a threshold, with the stack that caused them.
+
+    A heartbeat callback runs on the loop every few milliseconds; when it is
+    late by more than the threshold the loop was blocked. A watchdog thread
+    notices the missing beat while the stall is still going on and samples the
+    loop thread's stack, so the span can be attributed to the blocking code.
+    """
+    def __init__(self, hass: HomeAssistant, threshold_ms: float):
+        """Initialize the monitor."""
+        self.hass = hass
+        self.threshold = threshold_ms / 1000
+        self.interval = min(self.threshold / 4, 0.01)
+        self.spans: list[dict] = []
+        self._started = 0.0
+        self._beat = 0.0
+        self._sampled: tuple[float, list[str]] | None = None
+        self._handle: asyncio.TimerHandle | None = None
+        self._loop_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._watchdog = threading.Thread(target=self._watch, name=f"{DOMAIN} loop watchdog", daemon=True)
+
+    @callback
+    def async_start(self) -> None:
+        """Start the heartbeat and the watchdog; call from the event loop."""
+        self._loop_thread = threading.get_ident()
+        self._started = self._beat = time.monotonic()
+        self._handle = self.hass.loop.call_later(self.interval, self._tick)
+        self._watchdog.start()
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop monitoring; the watchdog thread exits on its next wake-up."""
+        self._stop.set()
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+    @callback
+    def _tick(self) -> None:
+        now = time.monotonic()
+        blocked = now - self._beat - self.interval
+        if blocked > self.threshold:
+            sampled = self._sampled
+            self.spans.append({
+                "at_ms": round((self._beat - self._started) * 1000, 1),
+                "duration_ms": round(blocked * 1000, 1),
+                "stack": sampled[1] if sampled and sampled[0] == self._beat else [],
+            })
+        self._beat = now
+        self._handle = self.hass.loop.call_later(self.interval, self._tick)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            if time.monotonic() - beat - self.interval > self.threshold and (not self._sampled or self._sampled[0] != beat):
+                frame = sys._current_frames().get(self._loop_thread)
+                stack: list[str] = []
+                while frame is not None and len(stack) < PROFILE_STACK_DEPTH:
+                    stack.append(_format_frame(frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name))
+                    frame = frame.f_back
+                self._sampled = (beat, stack)
+
+    def report(self) -> list[dict]:
+        """Return the longest spans, longest first."""
+        return sorted(self.spans, key=lambda span: span["duration_ms"], reverse=True)[:PROFILE_MAX_SPANS]
+
+class RunProfiler:
+    """Run one suggestion pass under cProfile and tracemalloc, and write the results.
+
+    cProfile only sees the event-loop thread: work sent to the executor
+    (automations.yaml parsing, history writes) shows up in the phase timings
+    instead. Both tools slow the run down, so compare durations between
+    profiled runs rather than against normal ones.
+    """
+    def __init__(self, coordinator: GrokAutomationCoordinator, block_threshold_ms: float, top: int):
+        """Initialize the profiler."""
+        self.coordinator = coordinator
+        self.hass = coordinator.hass
+        self.block_threshold_ms = block_threshold_ms
+        self.top = top
+        self.profile = cProfile.Profile()
+        self.monitor = LoopBlockMonitor(self.hass, block_threshold_ms)
+        self.phases: dict[str, float] = {}
+        self.duration_ms = 0.0
+        self._snapshots: list[tracemalloc.Snapshot] = []
+
+    async def async_run(self, request: SuggestionRequest) -> dict:
+        """Queue a profiled pass behind any running job, wait for it and return the report."""
+        job, _ = self.coordinator.jobs.async_submit(request, runner=self._async_run_job)
+        await job.finished.wait()
+        report = await self.hass.async_add_executor_job(self._write_report, job.job_id)
+        return {"job_id": job.job_id, "status": job.status, "error": job.error, **report}
+
+    async def _async_run_job(self, job: SuggestionJob) -> None:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        self._snapshots.append(tracemalloc.take_snapshot())
+        self.monitor.async_start()
+        start = time.monotonic()
+        try:
+            with self.coordinator.metrics.capture() as phases:
+                self.profile.enable()
+                try:
+                    await self.coordinator.async_run_job(job)
+                finally:
+                    self.profile.disable()
+        finally:
+            self.duration_ms = (time.monotonic() - start) * 1000
+            self.monitor.async_stop()
+            self.phases = phases
+            self._snapshots.append(tracemalloc.take_snapshot())
+            if started_tracing:
+                tracemalloc.stop()
+
+    def _write_report(self, job_id: str) -> dict:
+        """Write the pstats and allocation files to the config dir (runs in the executor)."""
+        base = self.hass.config.path(f"{DOMAIN}.profile.{int(time.time())}")
+        pstats_path = f"{base}.pstats"
+        allocations_path = f"{base}.allocations.txt"
+        self.profile.dump_stats(pstats_path)
+
+        stats = pstats.Stats(self.profile)
+        rows = [
+            (key, cumtime, tottime, calls)
+            for key, (_, calls, tottime, cumtime, _) in stats.stats.items()
+        ]
+        own = sorted((row for row in rows if row[0][0].startswith(PACKAGE_DIR)), key=lambda row: row[1], reverse=True)
+        slowest = sorted(rows, key=lambda row: row[2], reverse=True)
+
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        before, after = (snapshot.filter_traces(filters) for snapshot in self._snapshots)
+        allocations = after.compare_to(before, "lineno")
+        with open(allocations_path, "w", encoding="utf-8") as file:
+            file.write(f"Top allocations during job {job_id} (net, by line)\n")
+            for stat in allocations[: self.top]:
+                file.write(f"{stat}\n")
+
+        _LOGGER.info(f"Profiled job {job_id} in {self.duration_ms:.0f} ms, wrote {pstats_path} and {allocations_path}")
+        return {
+            "duration_ms": round(self.duration_ms, 1),
+            "pstats_path": pstats_path,
+            "allocations_path": allocations_path,
+            "phases": {name: round(ms, 2) for name, ms in self.phases.items()},
+            "integration_functions": [
+                {"function": _format_frame(*key), "cumulative_ms": round(cumtime * 1000, 2), "calls": calls}
+                for key, cumtime, _, calls in own[: self.top]
+            ],
+            "self_time_functions": [
+                {"function": _format_frame(*key), "self_ms": round(tottime * 1000, 2), "calls": calls}
+                for key, _, tottime, calls in slowest[: self.top]
+            ],
+            "top_allocations": [
+                {
+                    "location": f"{Path(stat.traceback[0].filename).name}:{stat.traceback[0].lineno}",
+                    "size_kib": round(stat.size_diff / 1024, 1),
+                    "count": stat.count_diff,
+                }
+                for stat in allocations[: self.top]
+            ],
+            "block_threshold_ms": self.block_threshold_ms,
+            "blocking_spans": self.monitor.report(),
+        }
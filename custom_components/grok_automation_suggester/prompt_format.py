@@ -0,0 +1,44 @@
+from __future__ import annotations
+from collections.abc import Mapping
+import json
+import logging
+from typing import Any
+from .const import (
+    ATTRIBUTE_DENYLIST,
+    COMPACT_MAX_VALUE,
+    DOMAIN_ATTRIBUTE_ALLOWLIST,
+    DOMAIN_ATTRIBUTE_DENYLIST,
+)
+
+_LOGGER = logging.getLogger(__name__)
+COMPACT_LEGEND = "Entities (one table per area and domain; columns are entity_id|name|state|attributes):\n"
+
+def compact_value(value: Any) -> str:
+    """Render an attribute value on one short line without the column separator."""
+    if isinstance(value, (list, tuple, set)):
+        text = ",".join(str(item) for item in value)
+    elif isinstance(value, Mapping):
+        text = json.dumps(value, separators=(",", ":"), default=str, ensure_ascii=False)
+    else:
+        text = str(value)
+    text = text.replace("|", "/").replace("\n", " ")
+    return text if len(text) <= COMPACT_MAX_VALUE else f"{text[:COMPACT_MAX_VALUE]}…"
+
+def compact_attributes(domain: str, attributes: Mapping[str, Any]) -> dict[str, str]:
+    """Keep the attributes worth sending for a domain, rendered as short strings."""
+    allowed = DOMAIN_ATTRIBUTE_ALLOWLIST.get(domain)
+    if allowed is not None:
+        return {name: compact_value(attributes[name]) for name in allowed if attributes.get(name) is not None}
+    denied = ATTRIBUTE_DENYLIST.union(DOMAIN_ATTRIBUTE_DENYLIST.get(domain, ()))
+    return {
+        name: compact_value(value) for name, value in sorted(attributes.items()) if name not in denied and value is not None
+    }
+
+def compact_header(area_name: str, domain: str, columns: list[str]) -> str:
+    """Return the heading and column line of one area/domain table."""
+    return f"## {area_name} / {domain}\nentity_id|name|state{''.join(f'|{column}' for column in columns)}\n"
+
+def compact_row(eid: str, name: str, state: str, values: Mapping[str, str], columns: list[str]) -> str:
+    """Return one table row; missing attributes are left empty."""
+    cells = [eid, compact_value(name), compact_value(state), *(values.get(column, "") for column in columns)]
+    return "|".join(cells) + "\n"
@@ -0,0 +1,113 @@
+from __future__ import annotations
+from collections.abc import Iterable
+import heapq
+import logging
+import math
+import time
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from .area_index import EntityAreaIndex
+from .const import ACTIVITY_HALF_LIFE, SUGGESTION_COVERAGE_LIMIT
+from .suggestion_index import SuggestionIndex
+
+_LOGGER = logging.getLogger(__name__)
+WEIGHT_ACTIVITY = 1.0  # times log(1 + decayed state changes)
+WEIGHT_AREA = 1.0
+WEIGHT_UNREFERENCED = 1.0
+WEIGHT_COVERED = 1.0  # full penalty once SUGGESTION_COVERAGE_LIMIT automations use the entity
+PENALTY_SECONDARY = 10.0  # diagnostic/config entities and hidden entities
+SECONDARY_CATEGORIES = {"config", "diagnostic"}
+
+class ActivityTracker:
+    """Exponentially decayed state-change counter per entity, updated in O(1) on each event."""
+    def __init__(self, hass: HomeAssistant):
+        """Initialize the tracker."""
+        self.hass = hass
+        self._activity: dict[str, tuple[float, float]] = {}
+        self._decay = math.log(2) / ACTIVITY_HALF_LIFE
+        self._unsub: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Start counting state changes."""
+        self._unsub = self.hass.bus.async_listen(EVENT_STATE_CHANGED, self._handle_state_changed)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop counting state changes."""
+        if self._unsub:
+            self._unsub()
+            self._unsub = None
+
+    @callback
+    def _handle_state_changed(self, event: Event) -> None:
+        eid = event.data["entity_id"]
+        old_state, new_state = event.data.get("old_state"), event.data.get("new_state")
+        if new_state is None:
+            self._activity.pop(eid, None)
+        elif old_state is not None and old_state.state != new_state.state:
+            # Attribute-only updates (sun elevation, signal strength...) are not activity.
+            now = time.monotonic()
+            self._activity[eid] = (self.activity(eid, now) + 1.0, now)
+
+    def activity(self, eid: str, now: float | None = None) -> float:
+        """Return the decayed number of state changes of an entity."""
+        value, updated = self._activity.get(eid, (0.0, 0.0))
+        if not value:
+            return 0.0
+        return value * math.exp(-self._decay * ((now or time.monotonic()) - updated))
+
+    def __len__(self) -> int:
+        return len(self._activity)
+
+class ActivityRanker:
+    """Rank entities by how likely they are to produce useful automations.
+
+    Activity comes from the shared ActivityTracker; static signals come from the
+    area and suggestion indexes. Selection is a heap top-k over the candidates.
+    """
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        activity: ActivityTracker,
+        area_index: EntityAreaIndex,
+        suggestion_index: SuggestionIndex,
+    ):
+        """Initialize the ranker."""
+        self.hass = hass
+        self.activity = activity
+        self.area_index = area_index
+        self.suggestion_index = suggestion_index
+
+    def score(self, eid: str, now: float | None = None) -> float:
+        """Return the ranking score of an entity; higher is better."""
+        score = WEIGHT_ACTIVITY * math.log1p(self.activity.activity(eid, now))
+        context = self.area_index.get(eid)
+        if context:
+            if context.area_id:
+                score += WEIGHT_AREA
+            if context.entity_category in SECONDARY_CATEGORIES or context.hidden:
+                score -= PENALTY_SECONDARY
+        coverage = self.suggestion_index.coverage(eid)
+        if coverage:
+            score -= WEIGHT_COVERED * min(coverage, SUGGESTION_COVERAGE_LIMIT) / SUGGESTION_COVERAGE_LIMIT
+        else:
+            score += WEIGHT_UNREFERENCED
+        return score
+
+    def top_k(self, entity_ids: Iterable[str], k: int) -> list[str]:
+        """Return the k best-ranked entities, best first; ties go to the entity_id order."""
+        now = time.monotonic()
+        best = heapq.nsmallest(k, ((-self.score(eid, now), eid) for eid in entity_ids))
+        return [eid for _, eid in best]
+
+    def stats(self) -> dict:
+        """Return the tracked entity count and the current top 10 for diagnostics."""
+        now = time.monotonic()
+        return {
+            "active_entities": len(self.activity),
+            "top_ranked": [
+                {"entity_id": eid, "score": round(self.score(eid, now), 3)}
+                for eid in self.top_k(self.hass.states.async_entity_ids(), 10)
+            ],
+        }
@@ -0,0 +1,99 @@
+from __future__ import annotations
+import asyncio
+from hashlib import sha256
+import json
+import logging
+import time
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from .const import DOMAIN, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRIES
+
+_LOGGER = logging.getLogger(__name__)
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+def response_cache_key(endpoint: str, model: str, temperature: float, max_tokens: int, prompt: str) -> str:
+    """Hash the endpoint and request parameters with a whitespace-normalized prompt."""
+    normalized = " ".join(prompt.split())
+    raw = json.dumps([endpoint, model, temperature, max_tokens, normalized], ensure_ascii=False)
+    return sha256(raw.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Persisted LRU of Grok responses with a TTL and a size bound."""
+    def __init__(self, hass: HomeAssistant, entry_id: str, ttl: int):
+        """Initialize the cache; entries are loaded on first use."""
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        self._store: Store[dict] = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.responses")
+        self._entries: dict[str, dict] | None = None
+        self._lock = asyncio.Lock()
+
+    async def _async_load(self) -> dict[str, dict]:
+        if self._entries is None:
+            async with self._lock:
+                if self._entries is None:
+                    data = await self._store.async_load() or {}
+                    self._entries = data.get("entries", {})
+                    stats = data.get("stats", {})
+                    self.hits = stats.get("hits", 0)
+                    self.misses = stats.get("misses", 0)
+                    self.saved_tokens = stats.get("saved_tokens", 0)
+        return self._entries
+
+    async def async_get(self, key: str) -> dict | None:
+        """Return a fresh cached response and mark it as recently used."""
+        entries = await self._async_load()
+        entry = entries.pop(key, None)
+        if entry is None or time.time() - entry["created"] > self.ttl:
+            self.misses += 1
+            self._schedule_save()
+            return None
+        entries[key] = entry
+        response = entry["response"]
+        self.hits += 1
+        self.saved_tokens += response.get("input_tokens", 0) + response.get("output_tokens", 0)
+        self._schedule_save()
+        return response
+
+    @callback
+    def async_set(self, key: str, response: dict) -> None:
+        """Store a response, evicting expired then least recently used entries."""
+        if self._entries is None:
+            return
+        now = time.time()
+        self._entries.pop(key, None)
+        self._entries[key] = {"created": now, "response": response}
+        for stale in [k for k, v in self._entries.items() if now - v["created"] > self.ttl]:
+            del self._entries[stale]
+        size = sum(len(v["response"].get("content", "")) for v in self._entries.values())
+        while self._entries and (len(self._entries) > RESPONSE_CACHE_MAX_ENTRIES or size > RESPONSE_CACHE_MAX_BYTES):
+            oldest = next(iter(self._entries))
+            size -= len(self._entries.pop(oldest)["response"].get("content", ""))
+        self._schedule_save()
+
+    @callback
+    def _schedule_save(self) -> None:
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict:
+        return {
+            "entries": self._entries or {},
+            "stats": {"hits": self.hits, "misses": self.misses, "saved_tokens": self.saved_tokens},
+        }
+
+    def stats(self) -> dict:
+        """Return cache counters."""
+        return {
+            "entries": len(self._entries or {}),
+            "hits": self.hits,
+            "misses": self.misses,
+            "saved_tokens": self.saved_tokens,
+            "ttl": self.ttl,
+        }
+
+    async def async_remove(self) -> None:
+        """Delete the persisted cache."""
+        await self._store.async_remove()
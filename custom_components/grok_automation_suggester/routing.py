@@ -0,0 +1,58 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import logging
+import re
+from urllib.parse import urlparse
+from .const import ENDPOINT_GROK, TRIAGE_MAX_IDEAS
+
+_LOGGER = logging.getLogger(__name__)
+TRIAGE_PROMPT = f"""You pre-select Home Assistant entities for an automation generator. From the entities below, list up to {TRIAGE_MAX_IDEAS} distinct, useful automation ideas. One idea per line, formatted exactly as:
+- <short idea> | <entity_id>, <entity_id>
+Only use entity_ids from the tables. No YAML, no other text.
+
+"""
+IDEA_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*(.+?)\s*\|\s*(.+?)\s*$", flags=re.MULTILINE)
+ENTITY_ID_RE = re.compile(r"\b[a-z0-9_]+\.[a-z0-9_]+\b")
+
+@dataclass(frozen=True)
+class ModelTier:
+    """Model, endpoint and budgets used for one stage of a run."""
+    name: str
+    model: str
+    endpoint: str
+    api_key: str
+    max_input_tokens: int
+    max_output_tokens: int
+    priced: bool = True
+
+    @property
+    def scheduler_key(self) -> str:
+        """Key of the request scheduler: the API key, or the endpoint when it needs none."""
+        return self.api_key or self.endpoint
+
+def is_xai_endpoint(endpoint: str) -> bool:
+    """Whether an endpoint is billed by xAI rather than self-hosted."""
+    return urlparse(endpoint).hostname == urlparse(ENDPOINT_GROK).hostname
+
+@dataclass(frozen=True)
+class TriageIdea:
+    """One candidate automation and the entities it needs."""
+    text: str
+    entities: tuple[str, ...]
+
+def parse_triage_response(text: str, known: set[str]) -> list[TriageIdea]:
+    """Parse "- idea | entity_id, ..." lines, keeping only entities that were offered."""
+    ideas: list[TriageIdea] = []
+    for idea, references in IDEA_RE.findall(text):
+        entities = tuple(dict.fromkeys(eid for eid in ENTITY_ID_RE.findall(references.lower()) if eid in known))
+        if entities:
+            ideas.append(TriageIdea(idea.strip(), entities))
+        if len(ideas) >= TRIAGE_MAX_IDEAS:
+            break
+    _LOGGER.debug(f"Triage returned {len(ideas)} usable ideas")
+    return ideas
+
+def render_ideas(ideas: list[TriageIdea]) -> str:
+    """Render the shortlist handed to the generation model."""
+    lines = "".join(f"- {idea.text} ({', '.join(idea.entities)})\n" for idea in ideas)
+    return f"Candidate ideas (pre-selected, write the YAML for the best ones):\n{lines}"
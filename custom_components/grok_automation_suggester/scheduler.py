@@ -0,0 +1,208 @@
+from __future__ import annotations
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from hashlib import sha256
+import logging
+import random
+import time
+from typing import TypeVar
+import aiohttp
+from homeassistant.core import HomeAssistant
+from .const import (
+    DATA_SCHEDULERS,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    DEFAULT_TOKENS_PER_MINUTE,
+    SCHEDULER_BASE_DELAY,
+    SCHEDULER_FAILURE_THRESHOLD,
+    SCHEDULER_MAX_ATTEMPTS,
+    SCHEDULER_MAX_DELAY,
+    SCHEDULER_RESET_TIMEOUT,
+)
+
+_LOGGER = logging.getLogger(__name__)
+_T = TypeVar("_T")
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+class ApiError(Exception):
+    """Non-200 answer from the provider."""
+    def __init__(self, status: int, text: str, retry_after: float | None = None):
+        super().__init__(f"Grok error {status}: {text}")
+        self.status = status
+        self.text = text
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status in RETRYABLE_STATUSES or self.status >= 500
+
+class CircuitOpenError(Exception):
+    """The provider failed repeatedly; calls fail fast until the circuit resets."""
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at capacity per minute."""
+    def __init__(self, per_minute: int):
+        """Initialize a full bucket."""
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self._updated = time.monotonic()
+
+    def configure(self, per_minute: int) -> None:
+        """Change the rate, keeping the current fill level within the new capacity."""
+        self._refill()
+        self.capacity = float(per_minute)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Return how long to wait before amount tokens are available."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) * 60 / self.capacity
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+class RequestScheduler:
+    """Per-API-key gate: rate limits, backoff with jitter, Retry-After and a circuit breaker."""
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        """Initialize the scheduler."""
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._lock = asyncio.Lock()
+        self._failures = 0
+        self._open_until = 0.0
+        self.throttled_seconds = 0.0
+        self.retries = 0
+        self.rejected = 0
+
+    def configure(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        """Apply the current limits from the config entry options."""
+        if self._requests.capacity != requests_per_minute:
+            self._requests.configure(requests_per_minute)
+        if self._tokens.capacity != tokens_per_minute:
+            self._tokens.configure(tokens_per_minute)
+
+    @property
+    def circuit_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    async def _acquire(self, tokens: int) -> None:
+        # Serialized so that waiting callers are served in order.
+        async with self._lock:
+            while True:
+                wait = max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+                if wait <= 0:
+                    self._requests.consume(1)
+                    self._tokens.consume(tokens)
+                    return
+                self.throttled_seconds += wait
+                _LOGGER.debug(f"Rate limit reached, waiting {wait:.1f}s")
+                await asyncio.sleep(wait)
+
+    def _record_failure(self, pause: float = 0.0) -> None:
+        self._failures += 1
+        if self._failures >= SCHEDULER_FAILURE_THRESHOLD:
+            pause = max(pause, SCHEDULER_RESET_TIMEOUT)
+        if pause:
+            self._open_until = max(self._open_until, time.monotonic() + pause)
+
+    async def async_execute(self, request: Callable[[], Awaitable[_T]], tokens: int = 0) -> _T:
+        """Run request under the rate limits, retrying transient failures."""
+        for attempt in range(SCHEDULER_MAX_ATTEMPTS):
+            if self.circuit_open:
+                self.rejected += 1
+                raise CircuitOpenError(
+                    f"Provider unavailable, retrying after {self._open_until - time.monotonic():.0f}s"
+                )
+            await self._acquire(tokens)
+            try:
+                result = await request()
+            except ApiError as err:
+                if not err.retryable:
+                    raise
+                retry_after = err.retry_after
+                if retry_after is not None and retry_after > SCHEDULER_MAX_DELAY:
+                    # Don't hold the caller that long: fail fast until the provider is ready.
+                    self._record_failure(retry_after)
+                    raise
+                self._record_failure()
+                last_error: Exception = err
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                retry_after = None
+                self._record_failure()
+                last_error = err
+            else:
+                self._failures = 0
+                return result
+            if attempt == SCHEDULER_MAX_ATTEMPTS - 1:
+                raise last_error
+            delay = retry_after if retry_after is not None else min(
+                SCHEDULER_MAX_DELAY, SCHEDULER_BASE_DELAY * 2**attempt * (0.5 + random.random())
+            )
+            self.retries += 1
+            _LOGGER.info(
+                f"Retrying API call in {delay:.1f}s (attempt {attempt + 2}/{SCHEDULER_MAX_ATTEMPTS}): {last_error}"
+            )
+            await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    def stats(self) -> dict:
+        """Return scheduler counters."""
+        return {
+            "requests_available": round(self._requests.tokens, 1),
+            "tokens_available": round(self._tokens.tokens),
+            "throttled_seconds": round(self.throttled_seconds, 1),
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "circuit_open": self.circuit_open,
+            "consecutive_failures": self._failures,
+        }
+
+def _scheduler_id(key: str) -> str:
+    return sha256(key.encode("utf-8")).hexdigest()[:16]
+
+def async_peek_scheduler(hass: HomeAssistant, key: str) -> RequestScheduler | None:
+    """Return the scheduler of an API key (or keyless endpoint) if one exists, without changing it."""
+    return hass.data.get(DATA_SCHEDULERS, {}).get(_scheduler_id(key))
+
+def async_get_scheduler(
+    hass: HomeAssistant,
+    key: str,
+    requests_per_minute: int | None = None,
+    tokens_per_minute: int | None = None,
+) -> RequestScheduler:
+    """Return the scheduler shared by every caller using this API key (or keyless endpoint).
+
+    Limits are applied only when given: callers that hold the entry options
+    pass them, other callers (model list, config flow) leave them untouched
+    and a scheduler they create starts with the defaults.
+    """
+    schedulers: dict[str, RequestScheduler] = hass.data.setdefault(DATA_SCHEDULERS, {})
+    key_id = _scheduler_id(key)
+    scheduler = schedulers.get(key_id)
+    if scheduler is None:
+        scheduler = schedulers[key_id] = RequestScheduler(
+            requests_per_minute or DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute or DEFAULT_TOKENS_PER_MINUTE
+        )
+    elif requests_per_minute is not None and tokens_per_minute is not None:
+        scheduler.configure(requests_per_minute, tokens_per_minute)
+    return scheduler
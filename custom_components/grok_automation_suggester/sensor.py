@@ -1,9 +1,11 @@
 from __future__ import annotations
+from abc import abstractmethod
 import logging
 from typing import Any
 from datetime import datetime
-from homeassistant.components.sensor import SensorEntity
-from homeassistant.core import HomeAssistant
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorStateClass
+from homeassistant.const import UnitOfTime
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers import device_registry as dr, entity_registry as er
 from .const import (
     DOMAIN,
@@ -24,10 +26,13 @@ _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass: HomeAssistant, entry, async_add_entities):
     """Set up sensors from a config entry."""
-    coordinator = hass.data[DOMAIN][entry.entry_id]
+    coordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
     sensors = [
         GrokAutomationSuggestionsSensor(coordinator, entry),
         GrokAutomationStatusSensor(coordinator, entry),
+        GrokAutomationRunDurationSensor(coordinator, entry),
+        GrokAutomationTotalTokensSensor(coordinator, entry),
+        GrokAutomationTotalCostSensor(coordinator, entry),
     ]
     async_add_entities(sensors)
 
@@ -52,14 +57,35 @@ class GrokAutomationBaseSensor(SensorEntity):
 
     async def async_added_to_hass(self):
         """Handle entity added to Home Assistant."""
-        self._coordinator.async_add_listener(self.async_write_ha_state)
+        self._async_update_attrs()
+        self.async_on_remove(self._coordinator.async_add_listener(self._handle_coordinator_update))
 
-    async def async_will_remove_from_hass(self):
-        """Handle entity removal from Home Assistant."""
-        self._coordinator.async_remove_listener(self.async_write_ha_state)
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Compute the state and attributes once per coordinator update, then write them."""
+        self._async_update_attrs()
+        self.async_write_ha_state()
+
+    @abstractmethod
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Set _attr_native_value and _attr_extra_state_attributes from the coordinator."""
 
 class GrokAutomationSuggestionsSensor(GrokAutomationBaseSensor):
-    """Sensor for automation suggestions."""
+    """Sensor for automation suggestions.
+
+    The summaries are for dashboards only and are not recorded; full
+    suggestions are served by the grok_automation_suggester/suggestions
+    WebSocket command.
+    """
+    _unrecorded_attributes = frozenset({
+        "suggestions_summary",
+        "description_summary",
+        "yaml_block_summary",
+        "entities_processed",
+        "full_suggestions",
+    })
+
     def __init__(self, coordinator: GrokAutomationCoordinator, entry):
         """Initialize the suggestions sensor."""
         super().__init__(coordinator, entry)
@@ -67,29 +93,22 @@ class GrokAutomationSuggestionsSensor(GrokAutomationBaseSensor):
         self._attr_unique_id = f"{entry.entry_id}_suggestions"
         self._attr_icon = "mdi:robot-happy"
 
-    @property
-    def state(self) -> str | None:
-        """Return the state of the sensor."""
-        if self._coordinator.data.get("yaml_block") or self._coordinator.data.get("description"):
-            return "Available"
-        return "No suggestions"
-
-    @property
-    def extra_state_attributes(self):
-        """Return the state attributes."""
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Set the state and the truncated summaries."""
+        data = self._coordinator.data
+        self._attr_native_value = "Available" if data.get("yaml_block") or data.get("description") else "No suggestions"
         # Convertir les valeurs potentiellement None en chaînes et tronquer
-        suggestions = str(self._coordinator.data.get(SENSOR_KEY_SUGGESTIONS, "No suggestions yet"))[:500]
-        description = str(self._coordinator.data.get("description", ""))[:800]
-        yaml_block = str(self._coordinator.data.get("yaml_block", ""))[:1500]
-
-        return {
-            "suggestions_summary": suggestions,
-            "description_summary": description,
-            "yaml_block_summary": yaml_block,
-            "last_update": str(self._coordinator.data.get("last_update", "")),
-            "entities_processed": self._coordinator.data.get("entities_processed", [])[:10],
-            "provider": str(self._coordinator.data.get("provider", "")),
-            "full_suggestions": "Consultez les notifications persistantes ou le fichier grok_suggestions.yaml pour les suggestions complètes."
+        self._attr_extra_state_attributes = {
+            "suggestions_summary": str(data.get(SENSOR_KEY_SUGGESTIONS, "No suggestions yet"))[:500],
+            "description_summary": str(data.get("description", ""))[:800],
+            "yaml_block_summary": str(data.get("yaml_block", ""))[:1500],
+            "last_update": str(data.get("last_update", "")),
+            "entities_processed": data.get("entities_processed", [])[:10],
+            "provider": str(data.get("provider", "")),
+            "job_id": data.get("job_id"),
+            "duplicates_filtered": data.get("duplicates_filtered", 0),
+            "full_suggestions": "Consultez la commande WebSocket grok_automation_suggester/suggestions ou le service grok_automation_suggester.get_suggestion_history pour les suggestions complètes."
         }
 
 class GrokAutomationStatusSensor(GrokAutomationBaseSensor):
@@ -101,19 +120,104 @@ class GrokAutomationStatusSensor(GrokAutomationBaseSensor):
         self._attr_unique_id = f"{entry.entry_id}_status"
         self._attr_icon = "mdi:connection"
 
-    @property
-    def state(self) -> str | None:
-        """Return the state of the sensor."""
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Set the provider status and the token and cache counters."""
+        data = self._coordinator.data
         if self._coordinator._last_error:
-            return PROVIDER_STATUS_ERROR
-        return PROVIDER_STATUS_CONNECTED if self._coordinator.data.get(SENSOR_KEY_STATUS) else PROVIDER_STATUS_DISCONNECTED
+            self._attr_native_value = PROVIDER_STATUS_ERROR
+        else:
+            self._attr_native_value = PROVIDER_STATUS_CONNECTED if data.get(SENSOR_KEY_STATUS) else PROVIDER_STATUS_DISCONNECTED
+        self._attr_extra_state_attributes = {
+            "input_tokens": data.get(SENSOR_KEY_INPUT_TOKENS, 0),
+            "cached_input_tokens": data.get("cached_tokens", 0),
+            "output_tokens": data.get(SENSOR_KEY_OUTPUT_TOKENS, 0),
+            "model": str(data.get(SENSOR_KEY_MODEL, "")),
+            "last_error": str(data.get(SENSOR_KEY_LAST_ERROR, "")),
+            "prompt_cache_hits": self._coordinator.fragment_cache.hits,
+            "prompt_cache_misses": self._coordinator.fragment_cache.misses,
+            "response_cache_hits": self._coordinator.response_cache.hits,
+            "response_cache_misses": self._coordinator.response_cache.misses,
+            "response_cache_saved_tokens": self._coordinator.response_cache.saved_tokens,
+        }
 
-    @property
-    def extra_state_attributes(self):
-        """Return the extra state attributes."""
-        return {
-            "input_tokens": self._coordinator.data.get(SENSOR_KEY_INPUT_TOKENS, 0),
-            "output_tokens": self._coordinator.data.get(SENSOR_KEY_OUTPUT_TOKENS, 0),
-            "model": str(self._coordinator.data.get(SENSOR_KEY_MODEL, "")),
-            "last_error": str(self._coordinator.data.get(SENSOR_KEY_LAST_ERROR, "")),
+class GrokAutomationRunDurationSensor(GrokAutomationBaseSensor):
+    """Sensor for the duration of the last generation run, with per-phase percentiles."""
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_suggested_display_precision = 0
+
+    def __init__(self, coordinator: GrokAutomationCoordinator, entry):
+        """Initialize the run duration sensor."""
+        super().__init__(coordinator, entry)
+        self._attr_name = f"{entry.title} Last Run Duration"
+        self._attr_unique_id = f"{entry.entry_id}_last_run_duration"
+        self._attr_icon = "mdi:timer-outline"
+
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Set the last run duration in milliseconds and p50/p95 for each phase."""
+        self._attr_native_value = self._coordinator.metrics.last("total")
+        attributes: dict[str, Any] = {}
+        for phase, summary in self._coordinator.metrics.summary()["phases"].items():
+            attributes[f"{phase}_last_ms"] = summary["last_ms"]
+            attributes[f"{phase}_p50_ms"] = summary["p50_ms"]
+            attributes[f"{phase}_p95_ms"] = summary["p95_ms"]
+        self._attr_extra_state_attributes = attributes
+
+class GrokAutomationTotalTokensSensor(GrokAutomationBaseSensor):
+    """Sensor for the cumulative tokens sent to and received from the API."""
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = "tokens"
+
+    def __init__(self, coordinator: GrokAutomationCoordinator, entry):
+        """Initialize the total tokens sensor."""
+        super().__init__(coordinator, entry)
+        self._attr_name = f"{entry.title} Total Tokens"
+        self._attr_unique_id = f"{entry.entry_id}_total_tokens"
+        self._attr_icon = "mdi:counter"
+
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Set the cumulative token count, its split and the call counts."""
+        totals = self._coordinator.metrics.totals
+        self._attr_native_value = self._coordinator.metrics.total_tokens
+        self._attr_extra_state_attributes = {
+            "input_tokens": totals["input_tokens"],
+            "cached_input_tokens": totals["cached_tokens"],
+            "prefix_cache_hit_rate": self._coordinator.metrics.prefix_cache_hit_rate,
+            "output_tokens": totals["output_tokens"],
+            "api_calls": totals["api_calls"],
+            "runs": totals["runs"],
+            "tokens_today": self._coordinator.metrics.tokens_today,
+            **{
+                f"{tier}_tokens": tier_totals["input_tokens"] + tier_totals["output_tokens"]
+                for tier, tier_totals in self._coordinator.metrics.tiers.items()
+            },
+        }
+
+class GrokAutomationTotalCostSensor(GrokAutomationBaseSensor):
+    """Sensor for the estimated cumulative API cost."""
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+    _attr_native_unit_of_measurement = "USD"
+    _attr_suggested_display_precision = 4
+
+    def __init__(self, coordinator: GrokAutomationCoordinator, entry):
+        """Initialize the total cost sensor."""
+        super().__init__(coordinator, entry)
+        self._attr_name = f"{entry.title} Estimated Cost"
+        self._attr_unique_id = f"{entry.entry_id}_total_cost"
+        self._attr_icon = "mdi:currency-usd"
+
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Set the estimated cost in USD, from the model pricing table."""
+        self._attr_native_value = round(self._coordinator.metrics.totals["cost_usd"], 6)
+        self._attr_extra_state_attributes = {
+            "prefix_cache_savings_usd": round(self._coordinator.metrics.totals["cache_savings_usd"], 6),
+            **{
+                f"{tier}_cost_usd": round(totals["cost_usd"], 6) for tier, totals in self._coordinator.metrics.tiers.items()
+            },
         }
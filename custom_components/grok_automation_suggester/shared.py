@@ -0,0 +1,105 @@
+from __future__ import annotations
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import ServiceValidationError
+from .area_index import EntityAreaIndex
+from .automations import AutomationIndex, AutomationsFileCache
+from .budget import HeuristicEstimator, TokenEstimator, async_get_estimator
+from .cache import LRUCache
+from .const import ATTR_CONFIG_ENTRY_ID, DOMAIN, FRAGMENT_CACHE_SIZE
+from .ranking import ActivityTracker
+from .suggestion_index import automation_fingerprint
+from .tracker import EntityDeltaTracker
+
+if TYPE_CHECKING:
+    from .coordinator import GrokAutomationCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+class GrokDomainData:
+    """Indexes shared by every config entry, stored in hass.data[DOMAIN].
+
+    Event subscriptions, registry indexes, automations.yaml parsing and the
+    rendered entity fragments do not depend on the entry, so they are built
+    once however many entries (models, personas) are configured.
+    """
+    def __init__(self, hass: HomeAssistant):
+        """Initialize the shared components."""
+        self.hass = hass
+        self.coordinators: dict[str, GrokAutomationCoordinator] = {}
+        self.tracker = EntityDeltaTracker(hass)
+        self.area_index = EntityAreaIndex(hass)
+        self.activity = ActivityTracker(hass)
+        self.automations = AutomationsFileCache(hass)
+        self.automation_index = AutomationIndex()
+        self.fragment_cache = LRUCache(FRAGMENT_CACHE_SIZE)
+        self.estimator: TokenEstimator = HeuristicEstimator()
+        self.existing_fingerprints: dict[str, frozenset[str]] = {}
+        self.profile_lock = asyncio.Lock()  # cProfile allows one active profiler per process
+        self._automations_source: list[dict] | None = None
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    async def async_start(self) -> None:
+        """Build the indexes, subscribe to events and load the estimator."""
+        self.area_index.async_start()
+        self.automations.async_start()
+        self.tracker.async_start()
+        self.activity.async_start()
+        self._unsubs.append(self.tracker.async_add_listener(self.fragment_cache.invalidate))
+        self._unsubs.append(self.area_index.async_add_listener(self.fragment_cache.invalidate))
+        # Entries set up meanwhile budget with the heuristic estimator until this returns.
+        self.estimator = await async_get_estimator(self.hass)
+
+    @callback
+    def async_stop(self) -> None:
+        """Unsubscribe from events."""
+        while self._unsubs:
+            self._unsubs.pop()()
+        self.activity.async_stop()
+        self.tracker.async_stop()
+        self.automations.async_stop()
+        self.area_index.async_stop()
+
+    @callback
+    def async_get_coordinator(self, entry_id: str | None) -> GrokAutomationCoordinator:
+        """Return the coordinator of an entry; the entry may be omitted when only one is loaded."""
+        if entry_id is None:
+            if len(self.coordinators) != 1:
+                raise ServiceValidationError(
+                    f"{ATTR_CONFIG_ENTRY_ID} is required when {len(self.coordinators)} entries are loaded"
+                )
+            return next(iter(self.coordinators.values()))
+        if entry_id not in self.coordinators:
+            raise ServiceValidationError(f"Config entry {entry_id} is not loaded")
+        return self.coordinators[entry_id]
+
+    async def async_get_automations(self) -> list[dict]:
+        """Return the parsed automations, re-indexing them once per change of the file."""
+        automations = await self.automations.async_get()
+        if automations is not self._automations_source:
+            self._automations_source = automations
+            self.automation_index.update(automations)
+            self.existing_fingerprints = dict(automation_fingerprint(automation) for automation in automations)
+            _LOGGER.debug(f"Indexed {len(automations)} automations for {len(self.coordinators)} entries")
+        return automations
+
+    def stats(self) -> dict:
+        """Return shared index sizes for diagnostics."""
+        return {
+            "entries": len(self.coordinators),
+            "indexed_entities": len(self.area_index),
+            "active_entities": len(self.activity),
+            "fragment_cache_size": len(self.fragment_cache),
+            "existing_fingerprints": len(self.existing_fingerprints),
+            "estimator": self.estimator.name,
+        }
+
+async def async_get_domain_data(hass: HomeAssistant) -> GrokDomainData:
+    """Return the shared domain data, starting it for the first entry."""
+    data: GrokDomainData | None = hass.data.get(DOMAIN)
+    if data is None:
+        data = hass.data[DOMAIN] = GrokDomainData(hass)
+        await data.async_start()
+    return data
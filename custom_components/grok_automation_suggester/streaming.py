@@ -0,0 +1,44 @@
+from __future__ import annotations
+from collections.abc import AsyncIterator
+import json
+import logging
+import re
+from aiohttp import ClientResponse
+
+_LOGGER = logging.getLogger(__name__)
+SSE_DATA_PREFIX = "data:"
+SSE_DONE = "[DONE]"
+YAML_FENCE_RE = re.compile(r"```yaml\s*([\s\S]+?)\s*```", flags=re.IGNORECASE)
+
+async def iter_sse_events(resp: ClientResponse) -> AsyncIterator[dict]:
+    """Yield the JSON payloads of a server-sent-event chat completion stream."""
+    async for raw in resp.content:
+        line = raw.decode("utf-8").strip()
+        if not line.startswith(SSE_DATA_PREFIX):
+            # Blank separators, comments and keep-alives.
+            continue
+        payload = line[len(SSE_DATA_PREFIX):].strip()
+        if payload == SSE_DONE:
+            return
+        try:
+            yield json.loads(payload)
+        except ValueError:
+            _LOGGER.debug(f"Skipping malformed stream chunk: {payload[:100]}")
+
+class YamlBlockExtractor:
+    """Pull complete ```yaml blocks out of text that is still streaming in."""
+    def __init__(self):
+        """Initialize the extractor."""
+        self.text = ""
+        self.blocks: list[str] = []
+        self._scan_from = 0
+
+    def feed(self, chunk: str) -> list[str]:
+        """Append a chunk and return the blocks whose closing fence just arrived."""
+        self.text += chunk
+        found: list[str] = []
+        for match in YAML_FENCE_RE.finditer(self.text, self._scan_from):
+            found.append(match.group(1).strip())
+            self._scan_from = match.end()
+        self.blocks.extend(found)
+        return found
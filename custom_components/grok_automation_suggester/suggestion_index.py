@@ -0,0 +1,191 @@
+from __future__ import annotations
+import asyncio
+from collections import Counter, OrderedDict
+from collections.abc import Iterable
+from hashlib import blake2b
+import json
+import logging
+from typing import Any
+import yaml
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from .automations import YamlLoader
+from .const import DOMAIN, SUGGESTION_COVERAGE_LIMIT, SUGGESTION_INDEX_MAX_ENTRIES
+
+_LOGGER = logging.getLogger(__name__)
+STORAGE_VERSION = 1
+SAVE_DELAY = 30
+# Keys that identify what an action step does when there is no service/action call.
+ACTION_KINDS = ("scene", "delay", "wait_template", "wait_for_trigger", "event", "choose", "if", "repeat", "parallel", "sequence", "variables", "stop")
+
+def _collect_entities(node: Any, found: set[str]) -> set[str]:
+    """Collect every entity_id referenced anywhere in a trigger or action."""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "entity_id":
+                for eid in [value] if isinstance(value, str) else value if isinstance(value, list) else []:
+                    if isinstance(eid, str):
+                        found.add(eid.strip().lower())
+            else:
+                _collect_entities(value, found)
+    elif isinstance(node, list):
+        for item in node:
+            _collect_entities(item, found)
+    return found
+
+def _as_list(value: Any) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def _trigger_shape(trigger: Any) -> list:
+    if not isinstance(trigger, dict):
+        return [str(trigger), []]
+    kind = trigger.get("platform") or trigger.get("trigger") or "?"
+    return [str(kind), sorted(_collect_entities(trigger, set()))]
+
+def _action_shape(action: Any) -> list:
+    if not isinstance(action, dict):
+        return [str(action), []]
+    kind = action.get("service") or action.get("action")
+    if not kind:
+        kind = next((key for key in ACTION_KINDS if key in action), "?")
+    return [str(kind), sorted(_collect_entities(action, set()))]
+
+def automation_fingerprint(automation: dict) -> tuple[str, frozenset[str]]:
+    """Return a hash of an automation's trigger, entity and action shape, and its entities.
+
+    Aliases, descriptions, conditions and trigger/action values are ignored so that
+    rewordings of the same idea collide.
+    """
+    triggers = sorted(_trigger_shape(t) for t in _as_list(automation.get("trigger") or automation.get("triggers")))
+    actions = sorted(_action_shape(a) for a in _as_list(automation.get("action") or automation.get("actions")))
+    raw = json.dumps([triggers, actions], separators=(",", ":"))
+    entities = frozenset(eid for shape in triggers + actions for eid in shape[1])
+    return blake2b(raw.encode("utf-8"), digest_size=8).hexdigest(), entities
+
+def parse_suggestion_block(text: str) -> list[dict] | None:
+    """Parse a suggested YAML block into automations, or None if it isn't one."""
+    try:
+        parsed = yaml.load(text, Loader=YamlLoader)
+    except yaml.YAMLError:
+        return None
+    if isinstance(parsed, dict) and "automation" in parsed:
+        parsed = parsed["automation"]
+    automations = [item for item in _as_list(parsed) if isinstance(item, dict)]
+    if not any(key in automation for automation in automations for key in ("trigger", "triggers")):
+        # Scripts, scenes or plain snippets are passed through untouched.
+        return None
+    return automations
+
+class SuggestionIndex:
+    """Fingerprints of existing automations and past suggestions.
+
+    Suggestions whose fingerprint is already known are filtered out, and entities
+    that are referenced by enough known automations count as covered.
+    """
+    def __init__(self, hass: HomeAssistant, entry_id: str):
+        """Initialize the index; suggestions are read on first use."""
+        self._store: Store[dict[str, Any]] = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.suggestions")
+        self._suggested: OrderedDict[str, list[str]] | None = None
+        self._existing: dict[str, frozenset[str]] = {}
+        self._coverage: Counter[str] = Counter()
+        self._lock = asyncio.Lock()
+        self.duplicates = 0
+
+    async def async_load(self) -> None:
+        """Load past suggestion fingerprints from disk on first access."""
+        if self._suggested is None:
+            async with self._lock:
+                if self._suggested is None:
+                    data = await self._store.async_load() or {}
+                    self._suggested = OrderedDict(data.get("suggested", []))
+                    self._rebuild_coverage()
+                    _LOGGER.debug(f"Loaded {len(self._suggested)} suggestion fingerprints")
+
+    @callback
+    def async_sync_existing(self, existing: dict[str, frozenset[str]]) -> None:
+        """Use the fingerprints of automations.yaml, rebuilding coverage when they changed."""
+        if existing is self._existing:
+            return
+        self._existing = existing
+        self._rebuild_coverage()
+
+    def _rebuild_coverage(self) -> None:
+        self._coverage = Counter()
+        for entities in self._existing.values():
+            self._coverage.update(entities)
+        for entities in (self._suggested or {}).values():
+            self._coverage.update(entities)
+
+    def coverage(self, entity_id: str) -> int:
+        """Return how many known automations or suggestions reference an entity."""
+        return self._coverage.get(entity_id, 0)
+
+    def covered(self, entity_id: str) -> bool:
+        return self.coverage(entity_id) >= SUGGESTION_COVERAGE_LIMIT
+
+    @callback
+    def async_filter(self, blocks: Iterable[str], index: bool = True) -> tuple[list[str | None], int]:
+        """Drop already known automations from suggested YAML blocks and index the new ones.
+
+        Returns one entry per block: the block unchanged, a re-dumped block holding only
+        its new automations, or None when everything in it was a duplicate. With
+        index=False the blocks are only checked against the existing automations
+        and nothing is added, for responses that were filtered when first received.
+        """
+        if self._suggested is None:
+            return list(blocks), 0
+        result: list[str | None] = []
+        duplicates = added = 0
+        for block in blocks:
+            automations = parse_suggestion_block(block)
+            if automations is None:
+                result.append(block)
+                continue
+            kept = []
+            for automation in automations:
+                fingerprint, entities = automation_fingerprint(automation)
+                if fingerprint in self._existing or (index and fingerprint in self._suggested):
+                    duplicates += 1
+                    continue
+                if index:
+                    self._add(fingerprint, entities)
+                    added += 1
+                kept.append(automation)
+            if len(kept) == len(automations):
+                result.append(block)
+            elif kept:
+                result.append(yaml.safe_dump(kept, sort_keys=False, allow_unicode=True).strip())
+            else:
+                result.append(None)
+        if duplicates:
+            self.duplicates += duplicates
+            _LOGGER.info(f"Filtered {duplicates} duplicate suggested automation(s)")
+        if added:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+        return result, duplicates
+
+    def _add(self, fingerprint: str, entities: frozenset[str]) -> None:
+        self._suggested[fingerprint] = sorted(entities)
+        self._coverage.update(entities)
+        while len(self._suggested) > SUGGESTION_INDEX_MAX_ENTRIES:
+            _, evicted = self._suggested.popitem(last=False)
+            self._coverage.subtract(evicted)
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        return {"suggested": list((self._suggested or {}).items())}
+
+    def stats(self) -> dict:
+        """Return index sizes for diagnostics."""
+        return {
+            "existing_automations": len(self._existing),
+            "suggested": len(self._suggested or ()),
+            "covered_entities": sum(1 for count in self._coverage.values() if count >= SUGGESTION_COVERAGE_LIMIT),
+            "duplicates_filtered": self.duplicates,
+        }
+
+    async def async_remove(self) -> None:
+        """Delete the persisted fingerprints."""
+        await self._store.async_remove()
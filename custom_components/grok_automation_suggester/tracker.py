@@ -0,0 +1,171 @@
+from __future__ import annotations
+from collections.abc import Callable
+from dataclasses import dataclass, field
+import logging
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+
+_LOGGER = logging.getLogger(__name__)
+
+@dataclass
+class EntityDelta:
+    """Entities that appeared, changed or disappeared since the last run."""
+    new: set[str] = field(default_factory=set)
+    changed: set[str] = field(default_factory=set)
+    removed: set[str] = field(default_factory=set)
+
+    def __bool__(self) -> bool:
+        return bool(self.new or self.changed or self.removed)
+
+class EntityDeltaTracker:
+    """Keep a live index of entity changes from state and registry events.
+
+    One event subscription feeds a separate pending delta per consumer (config
+    entry), so each consumer pops and restores only its own changes.
+    """
+    def __init__(self, hass: HomeAssistant):
+        """Initialize the tracker."""
+        self.hass = hass
+        self._deltas: dict[str, EntityDelta] = {}
+        self._unsubs: list[CALLBACK_TYPE] = []
+        self._listeners: list[Callable[[str], None]] = []
+
+    @callback
+    def async_start(self) -> None:
+        """Subscribe to events."""
+        self._unsubs.append(self.hass.bus.async_listen(EVENT_STATE_CHANGED, self._handle_state_changed))
+        self._unsubs.append(
+            self.hass.bus.async_listen(er.EVENT_ENTITY_REGISTRY_UPDATED, self._handle_entity_registry_updated)
+        )
+
+    @callback
+    def async_stop(self) -> None:
+        """Unsubscribe from events."""
+        while self._unsubs:
+            self._unsubs.pop()()
+
+    @callback
+    def async_add_consumer(self, consumer_id: str) -> None:
+        """Start a pending delta for a consumer."""
+        # Nothing has been processed yet, so everything present is new.
+        self._deltas[consumer_id] = EntityDelta(new=set(self.hass.states.async_entity_ids()))
+
+    @callback
+    def async_remove_consumer(self, consumer_id: str) -> None:
+        """Forget a consumer's pending delta."""
+        self._deltas.pop(consumer_id, None)
+
+    @callback
+    def async_add_listener(self, listener: Callable[[str], None]) -> CALLBACK_TYPE:
+        """Call listener with the entity_id of every state or registry change."""
+        self._listeners.append(listener)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(listener)
+
+        return remove_listener
+
+    @callback
+    def _notify(self, eid: str) -> None:
+        for listener in self._listeners:
+            listener(eid)
+
+    @staticmethod
+    def _mark_new(delta: EntityDelta, eid: str) -> None:
+        delta.removed.discard(eid)
+        delta.changed.discard(eid)
+        delta.new.add(eid)
+
+    @staticmethod
+    def _mark_changed(delta: EntityDelta, eid: str) -> None:
+        if eid not in delta.new:
+            delta.changed.add(eid)
+
+    @staticmethod
+    def _mark_removed(delta: EntityDelta, eid: str) -> None:
+        delta.changed.discard(eid)
+        if eid in delta.new:
+            # Appeared and vanished between two runs: nobody needs to hear about it.
+            delta.new.discard(eid)
+        else:
+            delta.removed.add(eid)
+
+    @callback
+    def _mark_all(self, mark: Callable[[EntityDelta, str], None], eid: str) -> None:
+        for delta in self._deltas.values():
+            mark(delta, eid)
+
+    @callback
+    def _handle_state_changed(self, event: Event) -> None:
+        """Record a state machine change."""
+        eid = event.data["entity_id"]
+        self._notify(eid)
+        if event.data.get("new_state") is None:
+            self._mark_all(self._mark_removed, eid)
+        elif event.data.get("old_state") is None:
+            self._mark_all(self._mark_new, eid)
+        else:
+            self._mark_all(self._mark_changed, eid)
+
+    @callback
+    def _handle_entity_registry_updated(self, event: Event) -> None:
+        """Record renames and registry changes that don't touch the state machine."""
+        action = event.data.get("action")
+        eid = event.data.get("entity_id")
+        old_eid = event.data.get("old_entity_id")
+        for changed_eid in (eid, old_eid):
+            if changed_eid:
+                self._notify(changed_eid)
+        if action != "update" or not eid:
+            # Creations and removals are followed by a state_changed event.
+            return
+        if old_eid:
+            self._mark_all(self._mark_removed, old_eid)
+            self._mark_all(self._mark_new, eid)
+        else:
+            self._mark_all(self._mark_changed, eid)
+
+    @callback
+    def async_pop(self, consumer_id: str, domains: list[str] | None = None) -> EntityDelta:
+        """Return and clear a consumer's pending delta, limited to the given domains."""
+        if not domains:
+            delta, self._deltas[consumer_id] = self._deltas[consumer_id], EntityDelta()
+            return delta
+        wanted = set(domains)
+        delta = EntityDelta()
+        for name in ("new", "changed", "removed"):
+            pending: set[str] = getattr(self._deltas[consumer_id], name)
+            picked = {eid for eid in pending if eid.split(".")[0] in wanted}
+            pending -= picked
+            getattr(delta, name).update(picked)
+        return delta
+
+    @callback
+    def async_peek(self, consumer_id: str, domains: list[str] | None = None) -> EntityDelta:
+        """Return a copy of a consumer's pending delta, limited to the given domains, without clearing it."""
+        wanted = set(domains or ())
+        pending = self._deltas[consumer_id]
+        return EntityDelta(
+            *(
+                {eid for eid in getattr(pending, name) if not wanted or eid.split(".")[0] in wanted}
+                for name in ("new", "changed", "removed")
+            )
+        )
+
+    @callback
+    def async_restore(self, consumer_id: str, delta: EntityDelta) -> None:
+        """Put back a delta whose run did not complete."""
+        pending = self._deltas.get(consumer_id)
+        if pending is None:
+            return
+        for eid in delta.removed:
+            if eid not in pending.new:
+                pending.removed.add(eid)
+        for eid in delta.new:
+            if eid not in pending.removed:
+                self._mark_new(pending, eid)
+        for eid in delta.changed:
+            if eid not in pending.removed:
+                self._mark_changed(pending, eid)
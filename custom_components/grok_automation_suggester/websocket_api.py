@@ -0,0 +1,57 @@
+from __future__ import annotations
+import logging
+from typing import Any
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from .const import (
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_END,
+    ATTR_ENTITY_ID,
+    ATTR_LIMIT,
+    ATTR_OFFSET,
+    ATTR_START,
+    DOMAIN,
+    WS_TYPE_SUGGESTIONS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+@callback
+def async_register_websocket_commands(hass: HomeAssistant) -> None:
+    """Register the WebSocket commands of the integration."""
+    websocket_api.async_register_command(hass, websocket_get_suggestions)
+
+@websocket_api.websocket_command({
+    vol.Required("type"): WS_TYPE_SUGGESTIONS,
+    vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    vol.Optional(ATTR_START): cv.datetime,
+    vol.Optional(ATTR_END): cv.datetime,
+    vol.Optional(ATTR_ENTITY_ID): cv.entity_id,
+    vol.Optional(ATTR_OFFSET, default=0): vol.All(vol.Coerce(int), vol.Range(min=0)),
+    vol.Optional(ATTR_LIMIT, default=10): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+})
+@websocket_api.async_response
+async def websocket_get_suggestions(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Return one page of full suggestions, newest first, read from the history on demand."""
+    shared = hass.data.get(DOMAIN)
+    if shared is None:
+        raise ServiceValidationError("No Grok Automation Suggester entry is loaded")
+    coordinator = shared.async_get_coordinator(msg.get(ATTR_CONFIG_ENTRY_ID))
+    records, total = await coordinator.history.async_query(
+        start=msg.get(ATTR_START),
+        end=msg.get(ATTR_END),
+        entity_id=msg.get(ATTR_ENTITY_ID),
+        limit=msg[ATTR_LIMIT],
+        offset=msg[ATTR_OFFSET],
+    )
+    connection.send_result(msg["id"], {
+        ATTR_CONFIG_ENTRY_ID: coordinator.entry.entry_id,
+        "total": total,
+        ATTR_OFFSET: msg[ATTR_OFFSET],
+        "suggestions": records,
+    })